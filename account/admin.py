@@ -38,7 +38,7 @@ class UserAdmin(BaseUserAdmin):
     filter_horizontal = ()
 
 class ProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'borrow_limit', 'warning', 'address', 'phone')
+    list_display = ('user', 'borrow_limit', 'active_borrows', 'total_borrows', 'overdue_borrows', 'overdue_returns', 'warning', 'address', 'phone')
     search_fields = ('user__username', 'address')
     list_filter = ('borrow_limit', 'warning')
 
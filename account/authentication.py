@@ -0,0 +1,38 @@
+from django.core import signing
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from .tokens import ACCESS, is_current, read_token, token_user
+
+
+def get_bearer_token(request):
+    parts = get_authorization_header(request).split()
+    if len(parts) != 2 or parts[0].lower() != b'bearer':
+        return None
+    try:
+        return parts[1].decode()
+    except UnicodeError:
+        return None
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    احراز هویت با هدر Authorization: Bearer <access token>.
+    توکن معتبر بدون خواندن django_session و ردیف User پذیرفته می‌شود؛ request.auth همان payload است.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        token = get_bearer_token(request)
+        if token is None:
+            return None
+        try:
+            payload = read_token(token, ACCESS)
+        except signing.BadSignature:
+            raise AuthenticationFailed('توکن نامعتبر یا منقضی شده است')
+        if not is_current(payload):
+            raise AuthenticationFailed('توکن باطل شده است')
+        return token_user(payload), payload
+
+    def authenticate_header(self, request):
+        return self.keyword
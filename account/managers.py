@@ -1,5 +1,8 @@
 from django.contrib.auth.models import BaseUserManager
 from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
 
 
 class UserManager(BaseUserManager):
@@ -18,4 +21,52 @@ class UserManager(BaseUserManager):
         user.is_admin = True
         user.is_superuser = True
         user.save(using=self._db)
-        return user
\ No newline at end of file
+        return user
+    
+    def bump_token_version(self, user_id):
+        """ابطال همه توکن‌های کاربر با یک UPDATE (بدون سیگنال post_save)"""
+        return self.filter(pk=user_id).update(token_version=F('token_version') + 1)
+
+
+class ProfileManager(models.Manager):
+    def reserve_borrows(self, profile_id, count=1):
+        """
+        افزایش شرطی شمارنده امانت‌های فعال تا سقف borrow_limit در یک UPDATE.
+        خروجی True یعنی سهمیه رزرو شد.
+        """
+        return self.filter(
+            pk=profile_id,
+            active_borrows__lte=F('borrow_limit') - count
+        ).update(
+            active_borrows=F('active_borrows') + count,
+            total_borrows=F('total_borrows') + count
+        ) == 1
+    
+    def release_borrow(self, user_id, late=False, penalized=False):
+        """
+        کم کردن امانت فعال هنگام بازگشت؛ بازگشت با تاخیر شمارنده تاخیر را زیاد می‌کند
+        و اگر هشدار آن امانت قبلاً داده نشده باشد (penalized) یک هشدار هم اضافه می‌شود؛
+        امانتی که process_overdue ثبت کرده بود از شمارنده امانت‌های سررسیده کم می‌شود.
+        """
+        changes = {'active_borrows': Greatest(F('active_borrows') - 1, 0)}
+        if penalized:
+            changes['overdue_borrows'] = Greatest(F('overdue_borrows') - 1, 0)
+        if late:
+            changes['overdue_returns'] = F('overdue_returns') + 1
+            if not penalized:
+                changes['warning'] = F('warning') + 1
+        return self.filter(user_id=user_id).update(**changes)
+    
+    def add_overdue(self, overdue_by_user):
+        """
+        ثبت امانت‌های سررسیده چند کاربر: به ازای هر امانت یک هشدار و یکی به شمارنده
+        امانت‌های سررسیده؛ کاربرانی که تعداد یکسان دارند با یک UPDATE به‌روزرسانی می‌شوند.
+        """
+        groups = {}
+        for user_id, count in overdue_by_user.items():
+            groups.setdefault(count, []).append(user_id)
+        for count, user_ids in groups.items():
+            self.filter(user_id__in=user_ids).update(
+                warning=F('warning') + count,
+                overdue_borrows=F('overdue_borrows') + count
+            )
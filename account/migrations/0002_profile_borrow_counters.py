@@ -0,0 +1,44 @@
+# Generated by Django 5.1.5 on 2026-10-18 06:57
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    Profile = apps.get_model('account', 'Profile')
+    Borrow = apps.get_model('book', 'Borrow')
+    per_user = Borrow.objects.filter(user=OuterRef('user')).order_by().values('user')
+    Profile.objects.update(
+        total_borrows=Coalesce(Subquery(per_user.annotate(total=Count('id')).values('total')), 0),
+        active_borrows=Coalesce(Subquery(
+            per_user.annotate(total=Count('id', filter=Q(is_return=False))).values('total')
+        ), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+        ('book', '0004_book_fts_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='active_borrows',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='overdue_returns',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='total_borrows',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
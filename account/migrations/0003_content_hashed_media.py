@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:23
+
+import shopweb.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_profile_borrow_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='avatar',
+            field=shopweb.fields.ContentHashedImageField(blank=True, null=True, upload_to='avatars/'),
+        ),
+    ]
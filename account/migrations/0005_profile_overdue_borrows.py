@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-18 08:06
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_overdue_borrows(apps, schema_editor):
+    Profile = apps.get_model('account', 'Profile')
+    Borrow = apps.get_model('book', 'Borrow')
+    per_user = (
+        Borrow.objects.filter(user=OuterRef('user'), is_return=False, penalized=True)
+        .order_by().values('user')
+    )
+    Profile.objects.update(
+        overdue_borrows=Coalesce(Subquery(per_user.annotate(total=Count('id')).values('total')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_user_token_version'),
+        ('book', '0006_borrow_penalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='overdue_borrows',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_overdue_borrows, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser,PermissionsMixin
-from. managers import UserManager
+from. managers import UserManager, ProfileManager
+from shopweb.fields import ContentHashedImageField
 
 # Create your models here.
 class User(AbstractBaseUser,PermissionsMixin):
@@ -9,6 +10,8 @@ class User(AbstractBaseUser,PermissionsMixin):
     
     is_active = models.BooleanField(default=True)
     is_admin = models.BooleanField(default=False)
+    # با هر افزایش، همه توکن‌های صادرشده برای کاربر باطل می‌شوند (account/tokens.py)
+    token_version = models.PositiveIntegerField(default=0)
     
     objects = UserManager()
     
@@ -33,4 +36,13 @@ class Profile(models.Model):
     warning = models.PositiveIntegerField(default=0)
     address = models.TextField()
     phone = models.PositiveIntegerField()
-    avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
\ No newline at end of file
+    avatar = ContentHashedImageField(upload_to='avatars/', blank=True, null=True)
+    
+    # شمارنده‌های امانت؛ در مسیر امانت/بازگشت به‌روز و با reconcile_profile_counters بازسازی می‌شوند
+    active_borrows = models.PositiveIntegerField(default=0)
+    total_borrows = models.PositiveIntegerField(default=0)
+    overdue_returns = models.PositiveIntegerField(default=0)
+    # امانت‌های باز سررسیده‌ای که process_overdue برایشان هشدار ثبت کرده است
+    overdue_borrows = models.PositiveIntegerField(default=0)
+    
+    objects = ProfileManager()
\ No newline at end of file
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from . models import *
+from book.thumbnails import get_srcset
 
 class UserRegisterSerializer(serializers.ModelSerializer):
     password2 = serializers.CharField(required = True,write_only = True)
@@ -16,6 +17,11 @@ class UserRegisterSerializer(serializers.ModelSerializer):
 class UserLoginSerializer(serializers.Serializer):
     username = serializers.CharField(max_length = 250,required = True)
     password = serializers.CharField(required = True)
+    # فقط توکن صادر شود و session ساخته نشود
+    stateless = serializers.BooleanField(required = False, default = False)
+
+class TokenRefreshSerializer(serializers.Serializer):
+    refresh = serializers.CharField(required = True)
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -30,11 +36,15 @@ class UserCreateSerializer(serializers.ModelSerializer):
 
 class ProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    avatar_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Profile
         fields = '__all__'
         read_only_fields = ['user']
+    
+    def get_avatar_srcset(self, obj):
+        return get_srcset(obj.avatar, self.context.get('request'))
 
 
 class ProfileUpdateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,15 @@
+from django.db.models.signals import post_save, post_delete
+
+from .models import User
+from .tokens import forget_token_state
+
+
+def forget_user_token_state(sender, instance, update_fields=None, **kwargs):
+    # ذخیره last_login در هر ورود وضعیت توکن را عوض نمی‌کند
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    forget_token_state(instance.pk)
+
+
+post_save.connect(forget_user_token_state, sender=User, dispatch_uid='token_state_save_user')
+post_delete.connect(forget_user_token_state, sender=User, dispatch_uid='token_state_delete_user')
@@ -1,3 +1,163 @@
+import time
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from book.models import Book, Borrow
+from .models import User, Profile
+
+
+class ProfileCounterTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password123')
+        self.profile = Profile.objects.create(user=self.user, borrow_limit=2, warning=0, address='', phone=0)
+        self.books = [
+            Book.objects.create(name=f'Book {i}', isbn=f'isbn-{i}', date=date(2020, 1, 1), available_copy=2)
+            for i in range(3)
+        ]
+        self.client.force_login(self.user)
+
+    def borrow(self, book, days=7):
+        return self.client.post(reverse('allbook:borrow-create'), {
+            'book_id': book.id,
+            'return_date': (timezone.now() + timedelta(days=days)).isoformat(),
+        })
+
+    def test_borrow_and_return_maintain_counters(self):
+        self.assertEqual(self.borrow(self.books[0]).status_code, 201)
+        self.assertEqual(self.borrow(self.books[1], days=-1).status_code, 201)
+        # سقف امانت از شمارنده پروفایل خوانده می‌شود
+        self.assertEqual(self.borrow(self.books[2]).status_code, 400)
+        self.profile.refresh_from_db()
+        self.assertEqual((self.profile.active_borrows, self.profile.total_borrows), (2, 2))
+
+        late = Borrow.objects.get(book=self.books[1])
+        self.client.post(reverse('allbook:borrow-return', args=[late.id]))
+        self.profile.refresh_from_db()
+        self.assertEqual(
+            (self.profile.active_borrows, self.profile.total_borrows, self.profile.overdue_returns, self.profile.warning),
+            (1, 2, 1, 1)
+        )
+
+    def test_stats_endpoints_read_profile_row(self):
+        self.borrow(self.books[0])
+        # session، کاربر و پروفایل؛ شمارش امانت‌های سررسیده هم از پروفایل خوانده می‌شود
+        with self.assertNumQueries(3):
+            body = self.client.get(reverse('allbook:user-stats')).json()
+        self.assertEqual((body['active_borrows'], body['total_borrows'], body['remaining_borrow_limit']), (1, 1, 1))
+        body = self.client.get(reverse('account:profile')).json()
+        self.assertEqual(body['active_borrows'], 1)
+
+    def test_reconcile_command(self):
+        now = timezone.now()
+        Borrow.objects.create(user=self.user, book=self.books[0], borrow_date=now, return_date=now, is_return=False,
+                              penalized=True)
+        Borrow.objects.create(user=self.user, book=self.books[1], borrow_date=now, return_date=now, is_return=True,
+                              returned_at=now + timedelta(days=1))
+        Borrow.objects.create(user=self.user, book=self.books[2], borrow_date=now, return_date=now, is_return=True,
+                              returned_at=now - timedelta(days=1))
+        Profile.objects.filter(pk=self.profile.pk).update(
+            active_borrows=5, total_borrows=0, overdue_borrows=0, overdue_returns=4
+        )
+        call_command('reconcile_profile_counters', batch_size=1, stdout=StringIO())
+        self.profile.refresh_from_db()
+        self.assertEqual(
+            (self.profile.active_borrows, self.profile.total_borrows,
+             self.profile.overdue_borrows, self.profile.overdue_returns),
+            (1, 3, 1, 1)
+        )
+
+
+class TokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', 'reader@example.com', 'password123')
+        Profile.objects.create(user=self.user, borrow_limit=2, warning=0, address='', phone=0)
+
+    def login(self):
+        response = self.client.post(reverse('account:login'), {
+            'username': 'reader', 'password': 'password123', 'stateless': True
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.json()['tokens']
+
+    def bearer(self, token):
+        return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def assertTokenRejected(self, response):
+        # 401 با WWW-Authenticate تا کلاینت access token را با refresh تازه کند
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer')
+
+    def test_stateless_login_needs_no_auth_queries(self):
+        tokens = self.login()
+        self.assertFalse(Session.objects.exists())
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+        url = reverse('allbook:user-stats')
+        self.assertEqual(self.client.get(url, **self.bearer(tokens['access'])).status_code, 200)
+        # فقط کوئری پروفایل؛ نه django_session و نه User
+        with self.assertNumQueries(1):
+            response = self.client.get(url, **self.bearer(tokens['access']))
+        self.assertEqual(response.json()['borrow_limit'], 2)
+        body = self.client.get(reverse('account:user-detail'), **self.bearer(tokens['access'])).json()
+        self.assertEqual(body['data']['username'], 'reader')
+
+    def test_invalid_and_expired_tokens(self):
+        tokens = self.login()
+        url = reverse('allbook:user-stats')
+        self.assertTokenRejected(self.client.get(url, **self.bearer(tokens['access'] + 'x')))
+        # refresh token به جای access پذیرفته نمی‌شود
+        self.assertTokenRejected(self.client.get(url, **self.bearer(tokens['refresh'])))
+        with mock.patch('django.core.signing.time.time', return_value=timezone.now().timestamp() + 301):
+            self.assertTokenRejected(self.client.get(url, **self.bearer(tokens['access'])))
+
+    def test_session_login_issues_no_tokens(self):
+        response = self.client.post(reverse('account:login'), {'username': 'reader', 'password': 'password123'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('tokens', response.json())
+        self.assertTrue(Session.objects.exists())
+
+    def test_refresh_and_revoke_on_logout(self):
+        tokens = self.login()
+        response = self.client.post(reverse('account:token-refresh'), {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        access = response.json()['tokens']['access']
+        self.assertEqual(self.client.get(reverse('allbook:user-stats'), **self.bearer(access)).status_code, 200)
+
+        self.assertEqual(self.client.post(reverse('account:logout'), **self.bearer(access)).status_code, 200)
+        self.assertTokenRejected(self.client.get(reverse('allbook:user-stats'), **self.bearer(access)))
+        response = self.client.post(reverse('account:token-refresh'), {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_admin_flag_change_invalidates_access_token(self):
+        tokens = self.login()
+        url = reverse('allbook:user-stats')
+        self.assertEqual(self.client.get(url, **self.bearer(tokens['access'])).status_code, 200)
+        self.user.is_admin = True
+        self.user.save()
+        self.assertTokenRejected(self.client.get(url, **self.bearer(tokens['access'])))
+        # با refresh توکن جدید با is_admin فعلی صادر می‌شود
+        response = self.client.post(reverse('account:token-refresh'), {'refresh': tokens['refresh']})
+        access = response.json()['tokens']['access']
+        self.assertEqual(self.client.get(url, **self.bearer(access)).status_code, 200)
 
-# Create your tests here.
+    def test_token_state_cache_expires(self):
+        tokens = self.login()
+        url = reverse('allbook:user-stats')
+        self.assertEqual(self.client.get(url, **self.bearer(tokens['access'])).status_code, 200)
+        # ابطال در worker دیگر: کش این worker پاک نمی‌شود
+        User.objects.bump_token_version(self.user.pk)
+        self.assertEqual(self.client.get(url, **self.bearer(tokens['access'])).status_code, 200)
+        with mock.patch('time.time', return_value=time.time() + 31):
+            self.assertTokenRejected(self.client.get(url, **self.bearer(tokens['access'])))
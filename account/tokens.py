@@ -0,0 +1,113 @@
+"""
+توکن‌های امضاشده بدون state برای API: access کوتاه‌مدت و refresh بلندمدت.
+هر توکن شناسه کاربر، is_admin و token_version او را با امضای HMAC (django.core.signing و SECRET_KEY)
+و زمان صدور دارد، پس برای بررسی آن نه django_session لازم است نه ردیف User.
+
+ابطال: افزایش User.token_version همه توکن‌های قبلی کاربر را باطل می‌کند. وضعیت فعلی کاربر
+(token_version، is_active، is_admin) در کش نگه داشته می‌شود تا access token معتبر بدون هیچ کوئری
+پذیرفته شود؛ refresh token همیشه با خود دیتابیس مقایسه می‌شود.
+
+ابطال کلید کش را فقط در کش همان worker پاک می‌کند. با کش مشترک (Redis/Memcached) اثرش فوری است و با
+LocMemCache پیش‌فرض در workerهای دیگر حداکثر بعد از TOKEN_STATE_CACHE_TIMEOUT ثانیه، چون وضعیت
+کش‌شده بیشتر از آن (و هرگز بیشتر از عمر access token) نگه داشته نمی‌شود.
+"""
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+
+from shopweb.db_router import PRIMARY
+from .models import User
+
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+
+def get_token_lifetime(kind):
+    if kind == ACCESS:
+        return getattr(settings, 'ACCESS_TOKEN_LIFETIME', 300)
+    return getattr(settings, 'REFRESH_TOKEN_LIFETIME', 7 * 24 * 3600)
+
+
+def _salt(kind):
+    # salt جدا برای هر نوع تا refresh token به جای access پذیرفته نشود (و برعکس)
+    return f'account.tokens.{kind}'
+
+
+def issue_token(user, kind):
+    payload = {'uid': user.pk, 'adm': user.is_admin, 'v': user.token_version}
+    return signing.dumps(payload, salt=_salt(kind))
+
+
+def issue_tokens(user):
+    return {
+        'access': issue_token(user, ACCESS),
+        'refresh': issue_token(user, REFRESH),
+        'expires_in': get_token_lifetime(ACCESS),
+    }
+
+
+def read_token(token, kind):
+    """payload توکن؛ امضای نادرست یا توکن منقضی‌شده signing.BadSignature می‌دهد"""
+    return signing.loads(token, salt=_salt(kind), max_age=get_token_lifetime(kind))
+
+
+def get_state_timeout():
+    timeout = getattr(settings, 'TOKEN_STATE_CACHE_TIMEOUT', 30)
+    return min(timeout, get_token_lifetime(ACCESS))
+
+
+def _state_key(user_id):
+    return f'user:{user_id}:token_state'
+
+
+def get_token_state(user_id):
+    """(token_version، is_active، is_admin) کاربر از کش؛ None یعنی کاربر وجود ندارد"""
+    key = _state_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        row = User.objects.filter(pk=user_id).values_list('token_version', 'is_active', 'is_admin').first()
+        if row is None:
+            return None
+        # add به جای set تا مقدار قدیمی خوانده‌شده روی پاک‌شدن همزمان (ابطال) ننشیند
+        cache.add(key, tuple(row), get_state_timeout())
+        state = tuple(row)
+    return state
+
+
+def forget_token_state(user_id):
+    key = _state_key(user_id)
+    cache.delete(key)
+    # دوباره بعد از commit، اگر درخواست همزمان مقدار قبل از commit را در کش نوشته باشد
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def is_current(payload):
+    """توکن با وضعیت فعلی کاربر می‌خواند (باطل نشده، کاربر فعال و is_admin تغییر نکرده)"""
+    return get_token_state(payload['uid']) == (payload['v'], True, payload['adm'])
+
+
+def revoke_tokens(user):
+    User.objects.bump_token_version(user.pk)
+    forget_token_state(user.pk)
+
+
+def token_user(payload):
+    """
+    کاربر ساخته‌شده از payload بدون کوئری. بقیه فیلدها deferred هستند و در صورت نیاز
+    (مثلاً username) با اولین دسترسی از دیتابیس خوانده می‌شوند.
+    """
+    return User.from_db(
+        PRIMARY,
+        ['id', 'is_active', 'is_admin', 'token_version'],
+        [payload['uid'], True, payload['adm'], payload['v']],
+    )
+
+
+def load_user(user):
+    """خواندن همه فیلدهای deferred کاربر در یک کوئری (به جای یک کوئری برای هر فیلد)"""
+    deferred = user.get_deferred_fields()
+    if deferred:
+        user.refresh_from_db(fields=list(deferred))
+    return user
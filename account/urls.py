@@ -3,6 +3,7 @@ from .views import (
     UserRegisterView,
     UserLoginView,
     UserLogoutView,
+    TokenRefreshView,
     UserDetailView,
     ProfileView,
     ProfileUpdateView,
@@ -15,6 +16,7 @@ urlpatterns = [
     path('register/', UserRegisterView.as_view(), name='register'),
     path('login/', UserLoginView.as_view(), name='login'),
     path('logout/', UserLogoutView.as_view(), name='logout'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
     
     # User
     path('me/', UserDetailView.as_view(), name='user-detail'),
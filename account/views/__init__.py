@@ -1,7 +1,8 @@
 from .auth_views import (
     UserRegisterView,
     UserLoginView,
-    UserLogoutView
+    UserLogoutView,
+    TokenRefreshView
 )
 from .profile_views import (
     ProfileView,
@@ -13,6 +14,7 @@ __all__ = [
     'UserRegisterView',
     'UserLoginView',
     'UserLogoutView',
+    'TokenRefreshView',
     'ProfileView',
     'ProfileUpdateView',
     'UserDetailView',
@@ -1,10 +1,12 @@
-from django.contrib.auth import login, logout, authenticate
+from django.contrib.auth import login, logout, authenticate, user_logged_in
+from django.core import signing
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from ..serializers import *
 from ..models import User, Profile
+from ..tokens import REFRESH, issue_tokens, read_token, revoke_tokens
 
 
 class UserRegisterView(APIView):
@@ -60,11 +62,18 @@ class UserLoginView(APIView):
             
             user = authenticate(request, username=username, password=data['password'])
             if user is not None:
-                login(request, user)
-                return Response({
+                response_data = {
                     'message': 'ورود با موفقیت انجام شد',
                     'data': UserSerializer(user).data
-                }, status=status.HTTP_200_OK)
+                }
+                if data['stateless']:
+                    # بدون session؛ last_login مثل login() به‌روز می‌شود
+                    user_logged_in.send(sender=user.__class__, request=request, user=user)
+                    response_data['tokens'] = issue_tokens(user)
+                else:
+                    # ورود با session توکن نمی‌گیرد تا خروج session توکن معتبری باقی نگذارد
+                    login(request, user)
+                return Response(response_data, status=status.HTTP_200_OK)
             else:
                 return Response({
                     'message': 'نام کاربری یا رمز عبور اشتباه است'
@@ -81,6 +90,9 @@ class UserLogoutView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
+        if isinstance(request.auth, dict):
+            # خروج با توکن همه توکن‌های کاربر را باطل می‌کند
+            revoke_tokens(request.user)
         logout(request)
         return Response({
             'message': 'خروج با موفقیت انجام شد'
@@ -89,3 +101,34 @@ class UserLogoutView(APIView):
     def get(self, request):
         return self.post(request)
 
+
+
+class TokenRefreshView(APIView):
+    """صدور توکن جدید با refresh token"""
+    authentication_classes = []
+    
+    def post(self, request):
+        ser_data = TokenRefreshSerializer(data=request.data)
+        if not ser_data.is_valid():
+            return Response({
+                'message': 'خطا در اعتبارسنجی',
+                'errors': ser_data.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            payload = read_token(ser_data.validated_data['refresh'], REFRESH)
+        except signing.BadSignature:
+            payload = None
+        # refresh token برخلاف access با خود ردیف کاربر مقایسه می‌شود
+        user = None
+        if payload is not None:
+            user = User.objects.filter(pk=payload['uid'], is_active=True).first()
+        if user is None or user.token_version != payload['v']:
+            return Response({
+                'message': 'توکن نامعتبر، منقضی یا باطل شده است'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+        
+        return Response({
+            'message': 'توکن با موفقیت تمدید شد',
+            'tokens': issue_tokens(user)
+        }, status=status.HTTP_200_OK)
@@ -4,6 +4,7 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from ..serializers import ProfileSerializer, ProfileUpdateSerializer, UserSerializer
 from ..models import Profile
+from ..tokens import load_user
 
 
 class ProfileView(APIView):
@@ -14,12 +15,8 @@ class ProfileView(APIView):
         profile, created = Profile.objects.get_or_create(user=request.user)
         serializer = ProfileSerializer(profile)
         
-        # تعداد امانت‌های فعال
-        from book.models import Borrow
-        active_borrows = Borrow.objects.filter(
-            user=request.user,
-            is_return=False
-        ).count()
+        # تعداد امانت‌های فعال (شمارنده پروفایل)
+        active_borrows = profile.active_borrows
         
         return Response({
             'data': serializer.data,
@@ -55,7 +52,7 @@ class UserDetailView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        serializer = UserSerializer(request.user)
+        serializer = UserSerializer(load_user(request.user))
         return Response({
             'data': serializer.data
         }, status=status.HTTP_200_OK)
@@ -1,14 +1,15 @@
 from django.contrib import admin
-from .models import Category, Book, Borrow, Banner
+from .models import Category, Book, Borrow, Banner, Purchase
+from .search import get_search_backend
 
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('id', 'name')
     search_fields = ('name',)
 
 class BookAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'price', 'date', 'isbn', 'available_copy', 'sell', 'cover_image_preview')
+    list_display = ('id', 'name', 'price', 'date', 'isbn', 'available_copy', 'borrow_count', 'sell', 'cover_image_preview')
     list_filter = ('date', 'category', 'sell')
-    search_fields = ('name', 'isbn', 'description')
+    search_fields = ('name', 'author', 'isbn', 'description')
     filter_horizontal = ('category',)
     readonly_fields = ('cover_image_preview',)
     fieldsets = (
@@ -26,6 +27,12 @@ class BookAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_search_results(self, request, queryset, search_term):
+        # استفاده از ایندکس متن کامل به جای LIKE روی هر فیلد
+        if not search_term:
+            return queryset, False
+        return get_search_backend().search(queryset, search_term, ordered=False), False
+    
     def cover_image_preview(self, obj):
         if obj.cover_image:
             return f'<img src="{obj.cover_image.url}" style="max-height: 200px; max-width: 200px;" />'
@@ -34,11 +41,17 @@ class BookAdmin(admin.ModelAdmin):
     cover_image_preview.short_description = 'Cover Image Preview'
 
 class BorrowAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'book', 'borrow_date', 'return_date', 'is_return')
+    list_display = ('id', 'user', 'book', 'borrow_date', 'return_date', 'is_return', 'returned_at')
     list_filter = ('is_return', 'borrow_date')
     search_fields = ('user__username', 'book__name')
 
+class PurchaseAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'book', 'price', 'created_at')
+    list_filter = ('created_at',)
+    search_fields = ('user__username', 'book__name')
+
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Book, BookAdmin)
 admin.site.register(Borrow, BorrowAdmin)
+admin.site.register(Purchase, PurchaseAdmin)
 admin.site.register(Banner)
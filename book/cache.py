@@ -0,0 +1,154 @@
+"""کش داده‌های صفحه اصلی (با ابطال از طریق سیگنال‌ها) و snapshotهای آماری"""
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from shopweb.db_router import use_primary
+
+
+HOME_VERSION_KEY = 'home:version'
+HOME_HITS_KEY = 'home:stats:hits'
+HOME_MISSES_KEY = 'home:stats:misses'
+
+
+def get_home_timeout():
+    return getattr(settings, 'HOME_CACHE_TIMEOUT', 300)
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def get_home_version():
+    version = cache.get(HOME_VERSION_KEY)
+    if version is None:
+        # مقدار اولیه یکتا تا کلیدهای قدیمی بعد از حذف نسخه دوباره استفاده نشوند
+        version = time.time_ns()
+        cache.add(HOME_VERSION_KEY, version, None)
+        version = cache.get(HOME_VERSION_KEY, version)
+    return version
+
+
+def _bump_home_version():
+    try:
+        cache.incr(HOME_VERSION_KEY)
+    except ValueError:
+        cache.set(HOME_VERSION_KEY, time.time_ns(), None)
+
+
+def invalidate_home():
+    """
+    باطل کردن تمام بخش‌های کش شده صفحه اصلی، بعد از commit تراکنش جاری.
+    اگر نسخه زودتر عوض شود، درخواستی که همان لحظه برسد بخش را از داده قبل از commit
+    با کلید نسخه جدید می‌سازد و تا HOME_CACHE_TIMEOUT همان داده کهنه برگردانده می‌شود.
+    بیرون از تراکنش بلافاصله اجرا می‌شود.
+    """
+    transaction.on_commit(_bump_home_version)
+
+
+def get_home_fragment(fragment, builder):
+    """خواندن یک بخش از کش یا ساختن و ذخیره آن"""
+    key = f'home:{get_home_version()}:{fragment}'
+    data = cache.get(key)
+    if data is not None:
+        _incr(HOME_HITS_KEY)
+        return data
+
+    _incr(HOME_MISSES_KEY)
+    # داده‌ای که برای همه کاربران کش می‌شود از primary ساخته می‌شود، نه از replica عقب‌مانده
+    with use_primary():
+        data = builder()
+    cache.set(key, data, get_home_timeout())
+    return data
+
+
+async def aget_home_fragment(fragment, builder):
+    """نسخه async همان get_home_fragment؛ builder یک coroutine function است"""
+    key = f'home:{get_home_version()}:{fragment}'
+    data = cache.get(key)
+    if data is not None:
+        _incr(HOME_HITS_KEY)
+        return data
+
+    _incr(HOME_MISSES_KEY)
+    with use_primary():
+        data = await builder()
+    cache.set(key, data, get_home_timeout())
+    return data
+
+
+def get_home_cache_stats():
+    counters = cache.get_many([HOME_HITS_KEY, HOME_MISSES_KEY])
+    hits = counters.get(HOME_HITS_KEY, 0)
+    misses = counters.get(HOME_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+    }
+
+
+def _start_background(target, *args):
+    threading.Thread(target=target, args=args, daemon=True).start()
+
+
+def _build_snapshot(key, builder, timeout):
+    data = builder()
+    cache.set(key, {'data': data, 'created_at': time.time()}, timeout)
+    return data
+
+
+def _build_snapshot_in_background(key, builder, timeout):
+    try:
+        _build_snapshot(key, builder, timeout)
+    finally:
+        cache.delete(f'{key}:refreshing')
+        # اتصال‌های دیتابیس این thread بسته شوند
+        connections.close_all()
+
+
+def get_snapshot(key, builder, ttl, stale_ttl):
+    """
+    snapshot با TTL و stale-while-revalidate. خروجی: (داده، سن snapshot به ثانیه)
+
+    - تازه‌تر از ttl: همان داده برگردانده می‌شود
+    - کهنه ولی در پنجره stale_ttl: داده قبلی برگردانده و فقط یک بازسازی در پس‌زمینه شروع می‌شود
+    - قدیمی‌تر یا ناموجود: داده همان لحظه ساخته می‌شود
+    """
+    cached = _get_cached_snapshot(key, builder, ttl, stale_ttl)
+    if cached is not None:
+        return cached
+    return _build_snapshot(key, builder, ttl + stale_ttl), 0.0
+
+
+async def aget_snapshot(key, builder, ttl, stale_ttl):
+    """نسخه async همان get_snapshot؛ builder یک coroutine function است"""
+    # بازسازی پس‌زمینه در thread جدا با event loop خودش اجرا می‌شود
+    cached = _get_cached_snapshot(key, lambda: asyncio.run(builder()), ttl, stale_ttl)
+    if cached is not None:
+        return cached
+    data = await builder()
+    cache.set(key, {'data': data, 'created_at': time.time()}, ttl + stale_ttl)
+    return data, 0.0
+
+
+def _get_cached_snapshot(key, builder, ttl, stale_ttl):
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    age = time.time() - entry['created_at']
+    if age < ttl:
+        return entry['data'], age
+    if age < ttl + stale_ttl:
+        if cache.add(f'{key}:refreshing', 1, max(ttl, 30)):
+            _start_background(_build_snapshot_in_background, key, builder, ttl + stale_ttl)
+        return entry['data'], age
+    return None
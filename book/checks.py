@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+# کش‌هایی که هر پروسه نسخه جدای خودش را دارد
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    errors = []
+    aliases = {'default', getattr(settings, 'VERSIONS_CACHE', 'default')}
+    for alias in sorted(aliases):
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend in PROCESS_LOCAL_CACHES:
+            errors.append(Error(
+                f"CACHES['{alias}'] uses {backend.rsplit('.', 1)[-1]}, which is not shared between workers.",
+                hint=(
+                    'ETag table versions, the home cache version and token state must be visible to every '
+                    'worker; use Redis or Memcached (or point VERSIONS_CACHE at one).'
+                ),
+                id='book.E001',
+            ))
+    return errors
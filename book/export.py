@@ -0,0 +1,77 @@
+"""خروجی جریانی (streaming) CSV و NDJSON با فشرده‌سازی gzip اختیاری"""
+import csv
+import io
+import json
+import zlib
+
+from django.http import StreamingHttpResponse
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+# تعداد ردیف‌هایی که قبل از ارسال هر تکه جمع می‌شوند
+ROWS_PER_CHUNK = 500
+
+
+def _csv_chunks(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    for index, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if index % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_chunks(rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row, ensure_ascii=False, default=str))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def _encode(chunks):
+    for chunk in chunks:
+        if chunk:
+            yield chunk.encode('utf-8')
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(rows, columns, export_format, filename, compress=False):
+    """
+    ساخت StreamingHttpResponse از یک iterator ردیف‌ها (dict).
+    ردیف‌ها در حافظه جمع نمی‌شوند؛ هر تکه بلافاصله ارسال می‌شود.
+    """
+    if export_format == 'csv':
+        chunks = _encode(_csv_chunks(rows, columns))
+    else:
+        chunks = _encode(_ndjson_chunks(rows))
+
+    filename = f'{filename}.{export_format}'
+    content_type = EXPORT_FORMATS[export_format]
+    if compress:
+        chunks = _gzip(chunks)
+        filename += '.gz'
+        content_type = 'application/gzip'
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,41 @@
+"""فیلترهای مشترک لیست کتاب‌ها و امانت‌ها (برای API لیست و خروجی گرفتن)"""
+from .search import get_search_backend
+
+
+def filter_books(books, params):
+    # جستجوی متن کامل (نام، نویسنده، توضیحات، ISBN) به ترتیب امتیاز
+    search = params.get('search', None)
+    if search:
+        books = get_search_backend().search(books, search)
+    
+    # فیلتر بر اساس دسته‌بندی
+    category_id = params.get('category', None)
+    if category_id:
+        books = books.filter(category__id=category_id)
+    
+    # فیلتر بر اساس قابل فروش بودن
+    sell = params.get('sell', None)
+    if sell is not None:
+        sell_bool = sell.lower() == 'true'
+        books = books.filter(sell=sell_bool)
+    
+    # فیلتر بر اساس موجود بودن
+    available = params.get('available', None)
+    if available is not None:
+        available_bool = available.lower() == 'true'
+        if available_bool:
+            books = books.filter(available_copy__gt=0)
+        else:
+            books = books.filter(available_copy=0)
+    
+    return books
+
+
+def filter_borrows(borrows, params):
+    # فیلتر بر اساس وضعیت بازگشت
+    is_return = params.get('is_return', None)
+    if is_return is not None:
+        is_return_bool = is_return.lower() == 'true'
+        borrows = borrows.filter(is_return=is_return_bool)
+    
+    return borrows
@@ -0,0 +1,30 @@
+"""تغییر موجودی کتاب‌ها با UPDATE شرطی تک‌دستوری (بدون خواندن و نوشتن در پایتون)"""
+from django.db.models import F
+
+from .cache import invalidate_home
+from .models import Book
+from .versions import bump_versions
+
+
+def take_copy(book_id, borrowed=False):
+    """
+    کم کردن یک نسخه از موجودی در صورت وجود.
+    معادل UPDATE ... SET available_copy = available_copy - 1 WHERE available_copy > 0
+    خروجی True یعنی نسخه‌ای رزرو شد.
+    """
+    changes = {'available_copy': F('available_copy') - 1}
+    if borrowed:
+        changes['borrow_count'] = F('borrow_count') + 1
+    taken = Book.objects.filter(pk=book_id, available_copy__gt=0).update(**changes) == 1
+    if taken:
+        # update() سیگنال post_save نمی‌فرستد
+        invalidate_home()
+        bump_versions('book')
+    return taken
+
+
+def release_copy(book_id):
+    """برگرداندن یک نسخه به موجودی"""
+    Book.objects.filter(pk=book_id).update(available_copy=F('available_copy') + 1)
+    invalidate_home()
+    bump_versions('book')
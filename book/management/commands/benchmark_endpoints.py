@@ -0,0 +1,430 @@
+import json
+import platform
+import statistics
+import subprocess
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from io import StringIO
+
+import django
+import requests
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+
+from account.models import Profile, User
+from account.tokens import ACCESS, REFRESH, issue_token
+from book.models import Book, Borrow, Category
+from shopweb.middleware import QueryTracker, track_queries
+
+
+NAMESPACES = ('allbook', 'account')
+PERCENTILES = (50, 95, 99)
+BENCHMARK_PASSWORD = 'password123'
+
+
+class LiveClient:
+    """
+    همان رابط Client (get و force_login) با درخواست HTTP واقعی به سرور در حال اجرا،
+    مثلاً uvicorn shopweb.asgi:application یا runserver، برای مقایسه ASGI و WSGI.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.defaults = {}
+
+    def force_login(self, user):
+        response = self.session.post(
+            f'{self.base_url}{reverse("account:login")}',
+            json={'username': user.username, 'password': BENCHMARK_PASSWORD}
+        )
+        if response.status_code != 200:
+            raise CommandError(f'Could not log in as {user.username} on {self.base_url}')
+
+    def get(self, path, data=None, **extra):
+        # HTTP_IF_NONE_MATCH -> If-None-Match
+        headers = {
+            key[5:].replace('_', '-').title(): value
+            for key, value in {**self.defaults, **extra}.items() if key.startswith('HTTP_')
+        }
+        return self.session.get(f'{self.base_url}{path}', params=data, headers=headers)
+
+
+class Endpoint:
+    """
+    یک درخواست قابل تکرار. درخواست‌های تغییردهنده (mutates) در تراکنشی اجرا و سپس rollback
+    می‌شوند تا هر تکرار روی همان داده‌ها اجرا شود.
+    با revalidate درخواست با If-None-Match (ETag پاسخ اول) فرستاده می‌شود تا هزینه پاسخ 304 سنجیده شود.
+    با token کاربر به جای session با access token (هدر Authorization) شناخته می‌شود.
+    """
+
+    def __init__(self, label, name, method='get', args=(), data=None, user=None, mutates=False, before=None,
+                 revalidate=False, token=False):
+        self.label = label
+        self.name = name
+        self.method = method
+        self.args = args
+        self.data = data
+        self.user = user
+        self.mutates = mutates
+        self.before = before
+        self.revalidate = revalidate
+        self.token = token
+        self.etag = None
+
+    @property
+    def path(self):
+        return reverse(self.name, args=self.args)
+
+    def client(self, base_url=None):
+        client = LiveClient(base_url) if base_url else Client()
+        if self.user is not None and self.token:
+            client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {issue_token(self.user, ACCESS)}'
+        elif self.user is not None:
+            client.force_login(self.user)
+        return client
+
+    def call(self, client):
+        if self.before:
+            self.before(self, client)
+        if not self.mutates:
+            return self.send(client)
+        with transaction.atomic():
+            response = self.send(client)
+            transaction.set_rollback(True)
+        return response
+
+    def send(self, client):
+        if self.method == 'get':
+            if self.revalidate:
+                if self.etag is None:
+                    self.etag = client.get(self.path, self.data).headers['ETag']
+                response = client.get(self.path, self.data, HTTP_IF_NONE_MATCH=self.etag)
+            else:
+                response = client.get(self.path, self.data)
+        else:
+            response = getattr(client, self.method)(self.path, self.data or {}, content_type='application/json')
+        if getattr(response, 'streaming', False):
+            # بدنه StreamingHttpResponse (خروجی‌ها) هنگام خواندن ساخته می‌شود؛ بدون مصرف آن فقط آماده‌سازی view
+            # سنجیده می‌شد. همین‌جا مصرف می‌شود تا در زمان‌سنجی و شمارش کوئری بیاید.
+            for _ in response.streaming_content:
+                pass
+        return response
+
+
+def percentile(timings, pct):
+    if len(timings) == 1:
+        return timings[0]
+    return statistics.quantiles(timings, n=100, method='inclusive')[pct - 1]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every book/account endpoint through the test client on a throwaway database '
+        'and report throughput, p50/p95/p99 latency, SQL queries and peak memory as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=2000, help='Synthetic books in the benchmark database')
+        parser.add_argument('--borrows', type=int, help='Synthetic borrows (default: 10 * books)')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=1, help='Client threads for read-only endpoints')
+        parser.add_argument('--only', action='append', default=[], help='Run only endpoints whose label contains this text')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='Print the difference against an earlier JSON report')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the benchmark database between runs')
+        parser.add_argument('--use-current-db', action='store_true', help='Run against the configured database without seeding it')
+        parser.add_argument(
+            '--base-url',
+            help='Send real HTTP requests to a running server (e.g. uvicorn shopweb.asgi:application) that uses the '
+                 'configured database; only read-only endpoints without setup hooks are run and queries are not counted'
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--iterations and --concurrency must be at least 1')
+
+        # ALLOWED_HOSTS و تنظیمات دیگر test client؛ داخل اجرای تست‌ها از قبل فعال است
+        try:
+            setup_test_environment()
+            test_environment = True
+        except RuntimeError:
+            test_environment = False
+        old_name = None
+        try:
+            if not options['use_current_db'] and not options['base_url']:
+                # دیتابیس جدا (مثل تست‌ها) تا دیتابیس اصلی دست نخورد
+                old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+                if not Book.objects.exists():
+                    call_command(
+                        'seed_data', synthetic=options['books'], borrows=options['borrows'],
+                        covers=0, seed=1, stdout=StringIO()
+                    )
+                    self.stdout.write(f'Seeded benchmark database with {Book.objects.count()} books')
+            report = self.run(options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            if test_environment:
+                teardown_test_environment()
+
+        payload = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(payload)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                self.compare(json.load(f), report)
+        if not options['output']:
+            self.stdout.write(payload)
+
+    def run(self, options):
+        endpoints = self.build_endpoints()
+        self.check_coverage(endpoints)
+        if options['only']:
+            endpoints = [e for e in endpoints if any(text in e.label for text in options['only'])]
+        if options['base_url']:
+            # rollback و پاک کردن کش سرور از این پروسه ممکن نیست
+            endpoints = [e for e in endpoints if not e.mutates and not e.before]
+
+        results = {}
+        for endpoint in endpoints:
+            result = self.measure(endpoint, options)
+            results[endpoint.label] = result
+            self.stdout.write(
+                f"{endpoint.label:<28} {result['status']:>3} "
+                f"p50={result['p50_ms']:8.2f}ms p99={result['p99_ms']:8.2f}ms cpu={result['cpu_ms']:7.2f}ms "
+                f"{result['throughput_rps']:8.1f} req/s queries={result['queries'] if result['queries'] is not None else '-':<3} "
+                f"peak={result['peak_memory_kib']:.0f}KiB"
+            )
+
+        return {
+            'meta': {
+                'revision': git_revision(),
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'books': Book.objects.count(),
+                'borrows': Borrow.objects.count(),
+                'iterations': options['iterations'],
+                'concurrency': options['concurrency'],
+                'base_url': options['base_url'],
+            },
+            'endpoints': results,
+        }
+
+    def build_endpoints(self):
+        admin = User.objects.filter(username='benchmark_admin').first()
+        if admin is None:
+            admin = User.objects.create_user('benchmark_admin', 'benchmark_admin@example.com', BENCHMARK_PASSWORD)
+            admin.is_admin = True
+            admin.save()
+            Profile.objects.create(user=admin, borrow_limit=5, warning=0, address='', phone=0)
+        reader = User.objects.filter(username='benchmark_reader').first()
+        if reader is None:
+            reader = User.objects.create_user('benchmark_reader', 'benchmark_reader@example.com', BENCHMARK_PASSWORD)
+            Profile.objects.create(user=reader, borrow_limit=1000, warning=0, address='', phone=0)
+
+        books = list(Book.objects.filter(available_copy__gt=0, sell=True).order_by('id')[:2])
+        if len(books) < 2:
+            raise CommandError('The benchmark database needs at least two books for sale that are in stock')
+        book, other_book = books
+        category = Category.objects.order_by('id').first()
+        # حذف دسته‌بندی دارای کتاب مجاز نیست؛ یک دسته خالی برای endpoint حذف
+        empty_category, created = Category.objects.get_or_create(name='Benchmark empty category')
+        now = timezone.now()
+        borrow = Borrow.objects.filter(user=reader, book=book, is_return=False).first()
+        if borrow is None:
+            borrow = Borrow.objects.create(
+                user=reader, book=book, borrow_date=now, return_date=now + timedelta(days=7)
+            )
+            Profile.objects.filter(user=reader).update(active_borrows=1, total_borrows=1)
+        return_date = (now + timedelta(days=7)).isoformat()
+
+        def clear_cache(endpoint, client):
+            cache.clear()
+
+        def login_again(endpoint, client):
+            client.force_login(endpoint.user)
+
+        return [
+            Endpoint('home', 'allbook:home'),
+            Endpoint('home (cold cache)', 'allbook:home', before=clear_cache),
+            Endpoint('home (user)', 'allbook:home', user=reader),
+            Endpoint('home (304)', 'allbook:home', user=reader, revalidate=True),
+            Endpoint('home (token)', 'allbook:home', user=reader, token=True),
+            Endpoint('home (async)', 'allbook:home-async'),
+            Endpoint('home (async, cold cache)', 'allbook:home-async', before=clear_cache),
+            Endpoint('home (async, user)', 'allbook:home-async', user=reader),
+            Endpoint('book-list', 'allbook:book-list'),
+            Endpoint('book-list (filters)', 'allbook:book-list', data={'available': 'true', 'sell': 'true', 'order_by': 'date'}),
+            Endpoint('book-list (search)', 'allbook:book-list', data={'search': 'Synthetic Book 1'}),
+            Endpoint('book-list (cursor)', 'allbook:book-list', data={'cursor': ''}),
+            Endpoint('book-list (304)', 'allbook:book-list', revalidate=True),
+            Endpoint('book-detail', 'allbook:book-detail', args=[book.id]),
+            Endpoint('book-detail (304)', 'allbook:book-detail', args=[book.id], revalidate=True),
+            Endpoint('book-create', 'allbook:book-create', 'post', user=admin, mutates=True, data={
+                'name': 'Benchmark', 'isbn': 'benchmark-isbn', 'date': '2020-01-01', 'category_ids': [category.id]
+            }),
+            Endpoint('book-update', 'allbook:book-update', 'patch', args=[book.id], user=admin, mutates=True, data={'price': 1000}),
+            Endpoint('book-delete', 'allbook:book-delete', 'delete', args=[other_book.id], user=admin, mutates=True),
+            Endpoint('book-purchase', 'allbook:book-purchase', 'post', args=[other_book.id], user=reader, mutates=True),
+            Endpoint('book-export', 'allbook:book-export', user=admin),
+            Endpoint('borrow-list', 'allbook:borrow-list', user=reader),
+            Endpoint('borrow-list (token)', 'allbook:borrow-list', user=reader, token=True),
+            Endpoint('borrow-list (admin)', 'allbook:borrow-list', user=admin),
+            Endpoint('borrow-detail', 'allbook:borrow-detail', args=[borrow.id], user=reader),
+            Endpoint('borrow-create', 'allbook:borrow-create', 'post', user=reader, mutates=True,
+                     data={'book_id': other_book.id, 'return_date': return_date}),
+            Endpoint('borrow-batch-create', 'allbook:borrow-batch-create', 'post', user=reader, mutates=True,
+                     data={'items': [{'book_id': other_book.id, 'return_date': return_date}]}),
+            Endpoint('borrow-return', 'allbook:borrow-return', 'post', args=[borrow.id], user=reader, mutates=True),
+            Endpoint('my-active-borrows', 'allbook:my-active-borrows', user=reader),
+            Endpoint('borrow-export', 'allbook:borrow-export', user=admin),
+            Endpoint('category-list', 'allbook:category-list'),
+            Endpoint('category-list (304)', 'allbook:category-list', revalidate=True),
+            Endpoint('category-detail', 'allbook:category-detail', args=[category.id]),
+            Endpoint('category-create', 'allbook:category-create', 'post', user=admin, mutates=True, data={'name': 'Benchmark'}),
+            Endpoint('category-update', 'allbook:category-update', 'patch', args=[category.id], user=admin, mutates=True,
+                     data={'name': 'Benchmark'}),
+            Endpoint('category-delete', 'allbook:category-delete', 'delete', args=[empty_category.id], user=admin, mutates=True),
+            Endpoint('category-books', 'allbook:category-books', args=[category.id]),
+            Endpoint('user-stats', 'allbook:user-stats', user=reader),
+            Endpoint('user-stats (token)', 'allbook:user-stats', user=reader, token=True),
+            Endpoint('library-stats', 'allbook:library-stats', user=admin),
+            Endpoint('library-stats (cold)', 'allbook:library-stats', user=admin, before=clear_cache),
+            Endpoint('library-stats (async)', 'allbook:library-stats-async', user=admin),
+            Endpoint('library-stats (async, cold)', 'allbook:library-stats-async', user=admin, before=clear_cache),
+            Endpoint('library-timeseries', 'allbook:library-timeseries', user=admin),
+            Endpoint('register', 'account:register', 'post', mutates=True, data={
+                'username': 'benchmark_new', 'email': 'benchmark_new@example.com',
+                'password': 'password123', 'password2': 'password123'
+            }),
+            Endpoint('login', 'account:login', 'post', mutates=True,
+                     data={'username': 'benchmark_reader', 'password': BENCHMARK_PASSWORD}),
+            Endpoint('login (stateless)', 'account:login', 'post', mutates=True,
+                     data={'username': 'benchmark_reader', 'password': BENCHMARK_PASSWORD, 'stateless': True}),
+            Endpoint('logout', 'account:logout', 'post', user=reader, mutates=True, before=login_again),
+            Endpoint('token-refresh', 'account:token-refresh', 'post', mutates=True,
+                     data={'refresh': issue_token(reader, REFRESH)}),
+            Endpoint('user-detail', 'account:user-detail', user=reader),
+            Endpoint('profile', 'account:profile', user=reader),
+            Endpoint('profile (token)', 'account:profile', user=reader, token=True),
+            Endpoint('profile-update', 'account:profile-update', 'patch', user=reader, mutates=True, data={'address': 'Benchmark'}),
+        ]
+
+    def check_coverage(self, endpoints):
+        covered = {endpoint.name for endpoint in endpoints}
+        resolver = get_resolver()
+        for namespace in NAMESPACES:
+            prefix, sub_resolver = resolver.namespace_dict[namespace]
+            for pattern in sub_resolver.url_patterns:
+                name = f'{namespace}:{pattern.name}'
+                if name not in covered:
+                    self.stderr.write(self.style.WARNING(f'No benchmark for {name}'))
+
+    def measure(self, endpoint, options):
+        client = endpoint.client(options['base_url'])
+        for _ in range(options['warmup']):
+            endpoint.call(client)
+
+        # یک اجرای جدا برای شمارش کوئری و یکی برای حافظه تا در زمان‌سنجی اثری نگذارند؛
+        # شمارش همین‌جا خوانده می‌شود چون درخواست‌های بعدی لاگ کوئری‌ها را پاک می‌کنند
+        # track_queries کوئری‌های threadهای sync_to_async (بخش‌های viewهای async) را هم می‌شمارد،
+        # برخلاف CaptureQueriesContext که فقط اتصال همین thread را می‌بیند
+        with track_queries(QueryTracker()) as tracker:
+            response = endpoint.call(client)
+        queries = None if options['base_url'] else tracker.queries
+        tracemalloc.start()
+        endpoint.call(client)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        iterations = options['iterations']
+        concurrency = 1 if endpoint.mutates else options['concurrency']
+        timings = []
+        started = time.perf_counter()
+        # زمان CPU کل پروسه (همه threadها)، به ازای هر درخواست
+        cpu_started = time.process_time()
+        if concurrency == 1:
+            timings = self.timed_calls(endpoint, client, iterations)
+        else:
+            timings = self.timed_calls_concurrently(endpoint, iterations, concurrency, options['base_url'])
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+
+        return {
+            'method': endpoint.method.upper(),
+            'path': endpoint.path,
+            'status': response.status_code,
+            'iterations': len(timings),
+            'concurrency': concurrency,
+            'throughput_rps': round(len(timings) / elapsed, 2),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'cpu_ms': round(cpu * 1000 / len(timings), 3),
+            **{f'p{pct}_ms': round(percentile(timings, pct), 3) for pct in PERCENTILES},
+            'queries': queries,
+            'peak_memory_kib': round(peak / 1024, 1),
+        }
+
+    def timed_calls(self, endpoint, client, iterations):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            endpoint.call(client)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def timed_calls_concurrently(self, endpoint, iterations, concurrency, base_url=None):
+        timings = []
+        lock = threading.Lock()
+
+        def worker(count):
+            try:
+                local = self.timed_calls(endpoint, endpoint.client(base_url), count)
+                with lock:
+                    timings.extend(local)
+            finally:
+                # هر thread اتصال دیتابیس خودش را دارد
+                connection.close()
+
+        counts = [iterations // concurrency + (1 if i < iterations % concurrency else 0) for i in range(concurrency)]
+        threads = [threading.Thread(target=worker, args=(count,)) for count in counts if count]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return timings
+
+    def compare(self, baseline, report):
+        self.stdout.write(f"Compared with {baseline['meta'].get('revision') or 'baseline'}:")
+        for label, result in report['endpoints'].items():
+            before = baseline['endpoints'].get(label)
+            if not before:
+                continue
+            p50 = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+            p99 = (result['p99_ms'] - before['p99_ms']) / before['p99_ms'] * 100 if before['p99_ms'] else 0
+            if result['queries'] is None or before['queries'] is None:
+                queries = 'n/a'
+            else:
+                queries = f"{result['queries'] - before['queries']:+d}"
+            self.stdout.write(f'{label:<28} p50 {p50:+6.1f}%  p99 {p99:+6.1f}%  queries {queries}')
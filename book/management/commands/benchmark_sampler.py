@@ -0,0 +1,66 @@
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from book.models import Book
+from book.sampling import BookSampler
+
+
+class Command(BaseCommand):
+    help = 'Compare ORDER BY RANDOM() with BookSampler on a synthetic catalog (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=100000, help='Number of synthetic books to insert')
+        parser.add_argument('--count', type=int, default=5, help='Books drawn per sample')
+        parser.add_argument('--repeat', type=int, default=20, help='Samples per strategy')
+        parser.add_argument('--seed', type=int, default=None, help='Seed for the sampler')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.populate(options['books'])
+            total = Book.objects.count()
+            self.stdout.write(f'Catalog size: {total} books')
+
+            count = options['count']
+            random_query = lambda: list(Book.objects.filter(available_copy__gt=0).order_by('?')[:count])
+            sampler = BookSampler(seed=options['seed'])
+
+            self.report('order_by(?)', self.measure(random_query, options['repeat']))
+            self.report('BookSampler', self.measure(lambda: sampler.sample(count), options['repeat']))
+
+            # داده‌های مصنوعی نباید در دیتابیس باقی بمانند
+            transaction.set_rollback(True)
+
+    def populate(self, books):
+        batch_size = 5000
+        started = time.perf_counter()
+        for offset in range(0, books, batch_size):
+            Book.objects.bulk_create([
+                Book(
+                    name=f'Benchmark Book {i}',
+                    isbn=f'bench-{i}',
+                    date=date(2000 + i % 25, 1 + i % 12, 1 + i % 28),
+                    available_copy=i % 4,
+                )
+                for i in range(offset, min(offset + batch_size, books))
+            ])
+        self.stdout.write(f'Inserted {books} books in {time.perf_counter() - started:.2f}s')
+
+    def measure(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        self.stdout.write(self.style.SUCCESS(
+            f'{label:<12} mean={statistics.mean(timings):.2f}ms '
+            f'p50={statistics.median(timings):.2f}ms p95={p95:.2f}ms'
+        ))
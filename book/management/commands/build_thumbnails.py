@@ -0,0 +1,63 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+
+from account.models import Profile
+from book.models import Banner, Book
+from book.thumbnails import generate_variants
+
+
+IMAGE_SOURCES = [
+    (Book, 'cover_image'),
+    (Banner, 'image'),
+    (Profile, 'avatar'),
+]
+
+
+def build(name, force):
+    # در پروسه فرزند اجرا می‌شود؛ خطای یک تصویر کل اجرا را متوقف نمی‌کند
+    try:
+        return name, generate_variants(name, force=force), None
+    except Exception as e:
+        return name, 0, str(e)
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG variants for existing covers, banners and avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+        parser.add_argument('--force', action='store_true', help='Regenerate variants that already exist')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        names = set()
+        for model, field in IMAGE_SOURCES:
+            names.update(
+                model.objects.exclude(**{f'{field}__isnull': True})
+                .exclude(**{field: ''})
+                .values_list(field, flat=True)
+            )
+        names = sorted(names)
+
+        built = 0
+        files = 0
+        failed = 0
+        # پروسه‌های فرزند فقط با storage کار می‌کنند و به دیتابیس کوئری نمی‌زنند
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as executor:
+            results = executor.map(build, names, [options['force']] * len(names), chunksize=8)
+            for name, written, error in results:
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                elif written:
+                    built += 1
+                    files += written
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {len(names)} images, built variants for {built} ({files} files, {failed} failed) in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,190 @@
+import csv
+import json
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from book.cache import invalidate_home
+from book.versions import bump_versions
+from book.models import Book, Category
+from book.search import get_search_backend
+
+
+# available_copy فقط هنگام درج نوشته می‌شود؛ برای کتاب موجود موجودی زنده (با نسخه‌های امانت‌رفته) را بازنویسی نمی‌کند
+UPDATE_FIELDS = ['name', 'author', 'sell', 'price', 'date', 'description']
+
+
+class RowError(ValueError):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Stream books from a CSV or JSONL file and upsert them on isbn in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or JSONL file to import')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: from extension)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per transaction')
+        parser.add_argument('--errors', help='Write rejected lines to this JSONL file')
+        parser.add_argument('--create-categories', action='store_true', help='Create unknown categories instead of rejecting the row')
+        parser.add_argument('--category-separator', default='|', help='Separator of category names in CSV')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        self.batch_size = options['batch_size']
+        self.create_categories = options['create_categories']
+        self.separator = options['category_separator']
+        self.categories = dict(Category.objects.values_list('name', 'id'))
+        self.search_backend = get_search_backend()
+
+        self.imported = 0
+        self.rejected = 0
+        self.started = time.perf_counter()
+        errors_file = open(options['errors'], 'w', encoding='utf-8') if options['errors'] else None
+
+        try:
+            with open(path, newline='', encoding='utf-8') as source:
+                rows = self.read_csv(source) if input_format == 'csv' else self.read_jsonl(source)
+                batch = {}
+                for line_number, row, error in rows:
+                    try:
+                        if error:
+                            raise RowError(error)
+                        book, category_ids = self.parse_row(row)
+                    except RowError as e:
+                        self.rejected += 1
+                        if errors_file:
+                            errors_file.write(json.dumps(
+                                {'line': line_number, 'error': str(e), 'row': row}, ensure_ascii=False
+                            ) + '\n')
+                        continue
+                    # isbn تکراری در یک batch: آخرین ردیف معتبر است
+                    batch[book.isbn] = (book, category_ids)
+                    if len(batch) >= self.batch_size:
+                        self.flush(batch)
+                        batch = {}
+                self.flush(batch)
+        except OSError as e:
+            raise CommandError(str(e))
+        finally:
+            if errors_file:
+                errors_file.close()
+
+        invalidate_home()
+        bump_versions('book', 'category')
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.imported} books, rejected {self.rejected} rows in {elapsed:.2f}s '
+            f'({self.imported / elapsed if elapsed else 0:.0f} rows/s)'
+        ))
+
+    def read_csv(self, source):
+        for line_number, row in enumerate(csv.DictReader(source), start=2):
+            # ستون categories نبودن یا خالی بودن یعنی دسته‌های فعلی کتاب دست نخورند
+            categories = row.pop('categories', None) or ''
+            names = [name.strip() for name in categories.split(self.separator) if name.strip()]
+            if names:
+                row['categories'] = names
+            yield line_number, row, None
+
+    def read_jsonl(self, source):
+        for line_number, line in enumerate(source, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            # خطای parse جدا از داده برمی‌گردد؛ ردیف خام در گزارش خطا نوشته می‌شود
+            try:
+                yield line_number, json.loads(line), None
+            except json.JSONDecodeError as e:
+                yield line_number, line, f'invalid JSON: {e}'
+
+    def parse_row(self, row):
+        # خط JSON معتبر مثل 123 یا null هم باید به گزارش خطا برود
+        if not isinstance(row, dict):
+            raise RowError('row must be an object')
+
+        isbn = str(row.get('isbn') or '').strip()
+        name = str(row.get('name') or '').strip()
+        if not isbn:
+            raise RowError('isbn is required')
+        if not name:
+            raise RowError('name is required')
+
+        try:
+            published = date.fromisoformat(str(row.get('date') or '').strip())
+        except ValueError:
+            raise RowError(f'invalid date: {row.get("date")!r}')
+
+        available_copy = row.get('available_copy')
+        try:
+            price = int(row.get('price') or 0)
+            available_copy = int(available_copy) if available_copy not in (None, '') else 1
+        except (TypeError, ValueError):
+            raise RowError('price and available_copy must be integers')
+        if price < 0:
+            raise RowError('price must not be negative')
+
+        sell = row.get('sell', False)
+        if isinstance(sell, str):
+            sell = sell.strip().lower() in ('1', 'true', 'yes')
+
+        # None یعنی ردیف categories ندارد و پیوندهای فعلی کتاب حفظ می‌شوند
+        category_names = row.get('categories')
+        if category_names is not None and not isinstance(category_names, list):
+            raise RowError('categories must be a list')
+        category_ids = None if category_names is None else []
+        for category_name in category_names or []:
+            category_id = self.categories.get(category_name)
+            if category_id is None:
+                if not self.create_categories:
+                    raise RowError(f'unknown category: {category_name}')
+                category_id = Category.objects.create(name=category_name).id
+                self.categories[category_name] = category_id
+            category_ids.append(category_id)
+
+        book = Book(
+            name=name[:250],
+            author=str(row.get('author') or '').strip()[:250],
+            isbn=isbn[:250],
+            sell=bool(sell),
+            price=price,
+            date=published,
+            available_copy=available_copy,
+            description=row.get('description') or '',
+        )
+        return book, category_ids
+
+    def flush(self, batch):
+        if not batch:
+            return
+        books = [book for book, _ in batch.values()]
+        through = Book.category.through
+
+        with transaction.atomic():
+            Book.objects.bulk_create(
+                books,
+                update_conflicts=True,
+                unique_fields=['isbn'],
+                update_fields=UPDATE_FIELDS,
+            )
+            ids = dict(Book.objects.filter(isbn__in=batch.keys()).values_list('isbn', 'id'))
+            for book in books:
+                book.id = ids[book.isbn]
+
+            # دسته‌ها فقط برای ردیف‌هایی که categories دارند جایگزین می‌شوند
+            replaced = {isbn: category_ids for isbn, (_, category_ids) in batch.items() if category_ids is not None}
+            through.objects.filter(book_id__in=[ids[isbn] for isbn in replaced]).delete()
+            through.objects.bulk_create([
+                through(book_id=ids[isbn], category_id=category_id)
+                for isbn, category_ids in replaced.items()
+                for category_id in set(category_ids)
+            ])
+            # bulk_create سیگنال نمی‌فرستد؛ ایندکس جستجو دستی به‌روز می‌شود
+            self.search_backend.index_books(books)
+
+        self.imported += len(books)
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f'{self.imported} rows imported ({self.imported / elapsed:.0f} rows/s)')
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from account.models import Profile
+from book.models import Borrow
+
+
+class Command(BaseCommand):
+    help = 'Add a warning for every open borrow past its return date that has not been penalized yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Borrows processed per transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+        now = timezone.now()
+        # امانت‌های باز سررسیده روی ایندکس (is_return, return_date) با keyset پیمایش می‌شوند؛
+        # is_return=False روی SQLite به NOT is_return ترجمه می‌شود و از ایندکس استفاده نمی‌کند
+        overdue = Borrow.objects.filter(is_return__in=[False], return_date__lt=now, penalized=False)
+        cursor = None
+        scanned = 0
+        penalized = 0
+        users = set()
+
+        while True:
+            page = overdue
+            if cursor:
+                last_id, last_date = cursor
+                page = page.filter(Q(return_date__gt=last_date) | Q(return_date=last_date, id__gt=last_id))
+            batch = list(page.order_by('return_date', 'id').values_list('id', 'return_date')[:batch_size])
+            if not batch:
+                break
+            cursor = batch[-1]
+            scanned += len(batch)
+
+            with transaction.atomic():
+                # ردیف‌هایی که در این فاصله بازگردانده شده‌اند کنار گذاشته می‌شوند
+                rows = list(
+                    overdue.select_for_update()
+                    .filter(id__in=[borrow_id for borrow_id, _ in batch])
+                    .values_list('id', 'user_id')
+                )
+                if not rows:
+                    continue
+                Borrow.objects.filter(id__in=[borrow_id for borrow_id, _ in rows]).update(penalized=True)
+
+                warnings = {}
+                for _, user_id in rows:
+                    warnings[user_id] = warnings.get(user_id, 0) + 1
+                Profile.objects.add_overdue(warnings)
+
+            penalized += len(rows)
+            users.update(warnings)
+
+        elapsed = time.perf_counter() - started
+        rate = scanned / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {scanned} overdue borrows, penalized {penalized} for {len(users)} users '
+            f'in {elapsed:.2f}s ({rate:.0f} borrows/s)'
+        ))
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from book.cache import invalidate_home
+from book.versions import bump_versions
+from book.models import Book, Borrow
+
+
+class Command(BaseCommand):
+    help = 'Recompute Book.borrow_count from the Borrow table in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Books processed per transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+        last_id = 0
+        scanned = 0
+        updated = 0
+
+        while True:
+            batch = list(
+                Book.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'borrow_count')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            scanned += len(batch)
+
+            book_ids = [book_id for book_id, _ in batch]
+            counts = dict(
+                Borrow.objects.filter(book_id__in=book_ids)
+                .order_by()
+                .values('book_id')
+                .annotate(total=Count('id'))
+                .values_list('book_id', 'total')
+            )
+            changed = [
+                Book(id=book_id, borrow_count=counts.get(book_id, 0))
+                for book_id, current in batch
+                if counts.get(book_id, 0) != current
+            ]
+            if changed:
+                with transaction.atomic():
+                    Book.objects.bulk_update(changed, ['borrow_count'])
+                updated += len(changed)
+
+        if updated:
+            invalidate_home()
+            bump_versions('book')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {scanned} books, updated {updated} in {elapsed:.2f}s'
+        ))
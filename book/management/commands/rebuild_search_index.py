@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from book.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for books'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Books indexed per batch')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        started = time.perf_counter()
+        count = backend.rebuild(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {count} books with {backend.__class__.__name__} in {elapsed:.2f}s'
+        ))
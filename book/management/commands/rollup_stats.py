@@ -0,0 +1,144 @@
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from book.models import Borrow, BorrowDailyStats, Purchase, PurchaseDailyStats, RollupWatermark
+
+
+WATERMARK_NAME = 'daily_stats'
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def to_local_date(value):
+    return timezone.localtime(value).date() if value else None
+
+
+class Command(BaseCommand):
+    help = 'Roll up borrows, returns and purchases into daily tables, starting after the last watermark'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='Recompute from this day (YYYY-MM-DD), ignoring the watermark')
+        parser.add_argument('--include-today', action='store_true', help='Also roll up today (the watermark stays at yesterday)')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Days aggregated per transaction')
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be at least 1')
+
+        started = time.perf_counter()
+        yesterday = timezone.localdate() - timedelta(days=1)
+        end = yesterday + timedelta(days=1) if options['include_today'] else yesterday
+        start = options['since'] or self.get_start()
+        if start is None or start > end:
+            self.stdout.write('Nothing to roll up')
+            return
+
+        days = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + timedelta(days=options['chunk_days'] - 1), end)
+            with transaction.atomic():
+                self.rollup(chunk_start, chunk_end)
+                # روز جاری هنوز کامل نشده؛ watermark فقط تا دیروز جلو می‌رود
+                if chunk_start <= yesterday:
+                    RollupWatermark.objects.update_or_create(
+                        name=WATERMARK_NAME,
+                        defaults={'last_date': min(chunk_end, yesterday)}
+                    )
+            days += (chunk_end - chunk_start).days + 1
+            chunk_start = chunk_end + timedelta(days=1)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {days} days ({start} to {end}) in {elapsed:.2f}s'
+        ))
+
+    def get_start(self):
+        watermark = RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list('last_date', flat=True).first()
+        if watermark:
+            return watermark + timedelta(days=1)
+
+        # اولین اجرا: از قدیمی‌ترین رویداد ثبت‌شده
+        borrows = Borrow.objects.aggregate(first_borrow=Min('borrow_date'), first_return=Min('returned_at'))
+        first_purchase = Purchase.objects.aggregate(first=Min('created_at'))['first']
+        candidates = [
+            to_local_date(value)
+            for value in (borrows['first_borrow'], borrows['first_return'], first_purchase)
+            if value
+        ]
+        return min(candidates) if candidates else None
+
+    def rollup(self, start, end):
+        """بازسازی ردیف‌های روزانه بازه [start, end]؛ اجرای دوباره همان نتیجه را می‌دهد"""
+        range_start = day_start(start)
+        range_end = day_start(end + timedelta(days=1))
+
+        borrows = dict(
+            Borrow.objects.filter(borrow_date__gte=range_start, borrow_date__lt=range_end)
+            .annotate(day=TruncDate('borrow_date'))
+            .order_by()
+            .values('day')
+            .annotate(total=Count('id'))
+            .values_list('day', 'total')
+        )
+        returns = {
+            row['day']: row
+            for row in Borrow.objects.filter(returned_at__gte=range_start, returned_at__lt=range_end)
+            .annotate(day=TruncDate('returned_at'))
+            .order_by()
+            .values('day')
+            .annotate(total=Count('id'), late=Count('id', filter=Q(returned_at__gt=F('return_date'))))
+        }
+        purchase_totals = {
+            row['day']: row
+            for row in Purchase.objects.filter(created_at__gte=range_start, created_at__lt=range_end)
+            .annotate(day=TruncDate('created_at'))
+            .order_by()
+            .values('day')
+            .annotate(total=Count('id'), revenue=Sum('price'))
+        }
+        # کتاب چنددسته‌ای در هر دسته‌اش شمرده می‌شود؛ کتاب بدون دسته با category=None
+        purchases = (
+            Purchase.objects.filter(created_at__gte=range_start, created_at__lt=range_end)
+            .annotate(day=TruncDate('created_at'))
+            .order_by()
+            .values('day', 'book__category')
+            .annotate(total=Count('id'), revenue=Sum('price'))
+        )
+
+        daily_rows = []
+        day = start
+        while day <= end:
+            returned = returns.get(day, {})
+            purchased = purchase_totals.get(day, {})
+            daily_rows.append(BorrowDailyStats(
+                date=day,
+                borrows=borrows.get(day, 0),
+                returns=returned.get('total', 0),
+                overdue_returns=returned.get('late', 0),
+                purchases=purchased.get('total', 0),
+                revenue=purchased.get('revenue') or 0
+            ))
+            day += timedelta(days=1)
+
+        BorrowDailyStats.objects.filter(date__range=(start, end)).delete()
+        BorrowDailyStats.objects.bulk_create(daily_rows)
+
+        PurchaseDailyStats.objects.filter(date__range=(start, end)).delete()
+        PurchaseDailyStats.objects.bulk_create([
+            PurchaseDailyStats(
+                date=row['day'],
+                category_id=row['book__category'],
+                purchases=row['total'],
+                revenue=row['revenue'] or 0
+            )
+            for row in purchases
+        ])
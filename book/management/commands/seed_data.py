@@ -1,38 +1,91 @@
-import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from io import BytesIO
+
 import requests
-from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from django.utils import timezone
-from datetime import timedelta
+from PIL import Image, ImageDraw, ImageFont
+from requests.adapters import HTTPAdapter
+
+from book.cache import invalidate_home
+from book.versions import bump_versions
 from book.models import Book, Category, Borrow
+from book.search import get_search_backend
+from book.thumbnails import generate_variants
 from account.models import User, Profile
 
+
+CATEGORY_NAMES = [
+    'Science', 'Arts', 'Commerce', 'Design', 'Cooking',
+    'Fiction', 'Non-Fiction', 'Biography', 'Technology', 'Philosophy',
+]
+
+
+def download(session, url):
+    response = session.get(url, timeout=10)
+    response.raise_for_status()
+    return response.content
+
+
+def draw_cover(index, size=(400, 600)):
+    """جلد جایگزین ساده با رنگ و عنوان متفاوت برای حالت synthetic"""
+    rng = random.Random(index)
+    background = tuple(rng.randint(40, 200) for _ in range(3))
+    image = Image.new('RGB', size, background)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((20, 20, size[0] - 20, size[1] - 20), outline=(255, 255, 255), width=4)
+    draw.rectangle((20, size[1] // 2 - 40, size[0] - 20, size[1] // 2 + 40), fill=(255, 255, 255))
+    draw.text((40, size[1] // 2 - 8), f'Synthetic cover {index}', fill=background, font=ImageFont.load_default())
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=80)
+    return buffer.getvalue()
+
+
 class Command(BaseCommand):
     help = 'Seed database with sample data and download images'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Parallel image downloads')
+        parser.add_argument('--synthetic', type=int, metavar='N', help='Generate N books offline instead of the sample catalog')
+        parser.add_argument('--users', type=int, help='Synthetic users (default: N / 20, at least 10)')
+        parser.add_argument('--borrows', type=int, help='Synthetic borrows (default: 10 * N)')
+        parser.add_argument('--covers', type=int, default=64, help='Distinct placeholder covers shared by synthetic books (0 = none)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows inserted per transaction in synthetic mode')
+        parser.add_argument('--seed', type=int, help='Random seed for synthetic data')
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('Starting to seed database...'))
+        categories = self.create_categories()
         
-        # Create categories
-        categories_data = [
-            {'name': 'Science'},
-            {'name': 'Arts'},
-            {'name': 'Commerce'},
-            {'name': 'Design'},
-            {'name': 'Cooking'},
-            {'name': 'Fiction'},
-            {'name': 'Non-Fiction'},
-            {'name': 'Biography'},
-            {'name': 'Technology'},
-            {'name': 'Philosophy'},
-        ]
+        if options['synthetic'] is not None:
+            self.seed_synthetic(categories, options)
+            return
         
-        categories = {}
-        for cat_data in categories_data:
-            category, created = Category.objects.get_or_create(name=cat_data['name'])
-            categories[cat_data['name']] = category
-            if created:
-                self.stdout.write(self.style.SUCCESS(f'Created category: {category.name}'))
+        self.seed_sample_catalog(categories, options['workers'])
+        self.create_sample_users()
         
+        self.stdout.write(self.style.SUCCESS('\nDatabase seeded successfully!'))
+        self.stdout.write(self.style.SUCCESS(f'Created {Category.objects.count()} categories'))
+        self.stdout.write(self.style.SUCCESS(f'Created {Book.objects.count()} books'))
+        self.stdout.write(self.style.SUCCESS(f'Created {User.objects.count()} users'))
+
+    def create_categories(self):
+        categories = dict(Category.objects.filter(name__in=CATEGORY_NAMES).values_list('name', 'id'))
+        missing = [Category(name=name) for name in CATEGORY_NAMES if name not in categories]
+        for category in Category.objects.bulk_create(missing):
+            categories[category.name] = category.id
+            self.stdout.write(self.style.SUCCESS(f'Created category: {category.name}'))
+        return categories
+
+    def seed_sample_catalog(self, categories, workers):
         # Sample books data with real book information
         books_data = [
             {
@@ -257,56 +310,66 @@ class Command(BaseCommand):
             },
         ]
         
-        # Download and create books
-        from django.conf import settings
-        media_path = os.path.join(settings.BASE_DIR, 'media', 'book_covers')
-        os.makedirs(media_path, exist_ok=True)
+        existing = set(Book.objects.filter(isbn__in=[b['isbn'] for b in books_data]).values_list('isbn', flat=True))
+        new_data = [book_data for book_data in books_data if book_data['isbn'] not in existing]
         
-        for book_data in books_data:
-            book, created = Book.objects.get_or_create(
-                isbn=book_data['isbn'],
-                defaults={
-                    'name': book_data['name'],
-                    'price': book_data['price'],
-                    'sell': book_data['sell'],
-                    'available_copy': book_data['available_copy'],
-                    'date': book_data['date'],
-                    'description': book_data.get('description', ''),
-                }
-            )
-            
-            if created:
-                # Add categories
-                for cat_name in book_data['categories']:
-                    if cat_name in categories:
-                        book.category.add(categories[cat_name])
-                
-                # Download image
+        with transaction.atomic():
+            books = Book.objects.bulk_create([
+                Book(
+                    isbn=book_data['isbn'],
+                    name=book_data['name'],
+                    price=book_data['price'],
+                    sell=book_data['sell'],
+                    available_copy=book_data['available_copy'],
+                    date=book_data['date'],
+                    description=book_data.get('description', ''),
+                )
+                for book_data in new_data
+            ])
+            Book.category.through.objects.bulk_create([
+                Book.category.through(book_id=book.id, category_id=categories[cat_name])
+                for book, book_data in zip(books, new_data)
+                for cat_name in book_data['categories']
+                if cat_name in categories
+            ])
+        # bulk_create سیگنال ندارد؛ ایندکس جستجو و کش صفحه اصلی دستی به‌روز می‌شوند
+        get_search_backend().index_books(books)
+        invalidate_home()
+        bump_versions('book', 'category')
+        for book in books:
+            self.stdout.write(self.style.SUCCESS(f'Created book: {book.name}'))
+        
+        # دانلود موازی جلدها با یک Session (اتصال‌های تکراری به یک host دوباره استفاده می‌شوند)
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        
+        with session, ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(download, session, book_data['image_url']): book
+                for book, book_data in zip(books, new_data)
+                if book_data.get('image_url')
+            }
+            for future in as_completed(futures):
+                book = futures[future]
                 try:
-                    image_url = book_data.get('image_url', '')
-                    if image_url:
-                        response = requests.get(image_url, timeout=10)
-                        if response.status_code == 200:
-                            # Generate safe filename
-                            safe_name = "".join(c for c in book.name if c.isalnum() or c in (' ', '-', '_')).rstrip()
-                            safe_name = safe_name.replace(' ', '_')[:50]
-                            image_filename = f"{safe_name}_{book.id}.jpg"
-                            image_path = os.path.join(media_path, image_filename)
-                            
-                            with open(image_path, 'wb') as f:
-                                f.write(response.content)
-                            
-                            # Update book with image
-                            from django.core.files import File
-                            with open(image_path, 'rb') as f:
-                                book.cover_image.save(image_filename, File(f), save=True)
-                            
-                            self.stdout.write(self.style.SUCCESS(f'Downloaded image for: {book.name}'))
+                    content = future.result()
                 except Exception as e:
                     self.stdout.write(self.style.WARNING(f'Could not download image for {book.name}: {str(e)}'))
+                    continue
                 
-                self.stdout.write(self.style.SUCCESS(f'Created book: {book.name}'))
-        
+                # Generate safe filename
+                safe_name = "".join(c for c in book.name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+                safe_name = safe_name.replace(' ', '_')[:50]
+                image_filename = f"{safe_name}_{book.id}.jpg"
+                
+                # فایل فقط یک بار، مستقیماً از حافظه نوشته می‌شود
+                book.cover_image.save(image_filename, ContentFile(content), save=False)
+                book.save(update_fields=['cover_image'])
+                self.stdout.write(self.style.SUCCESS(f'Downloaded image for: {book.name}'))
+
+    def create_sample_users(self):
         # Create sample users
         users_data = [
             {'username': 'admin', 'email': 'admin@library.com', 'is_admin': True},
@@ -337,9 +400,140 @@ class Command(BaseCommand):
                     phone=1234567890,
                 )
                 self.stdout.write(self.style.SUCCESS(f'Created user: {user.username}'))
+
+    def seed_synthetic(self, categories, options):
+        """
+        داده مصنوعی بدون شبکه برای تست بار: کاربران، کتاب‌ها و امانت‌ها با bulk_create
+        در دسته‌های batch_size ساخته و سپس شمارنده‌ها و ایندکس جستجو بازسازی می‌شوند.
+        امانت‌های باز همان قواعد برنامه را رعایت می‌کنند: حداکثر borrow_limit برای هر کاربر،
+        یک امانت باز برای هر کاربر و کتاب، و نه بیشتر از نسخه‌های هر کتاب؛ موجودی کتاب‌ها
+        از همین امانت‌ها محاسبه می‌شود.
+        """
+        books_count = options['synthetic']
+        if books_count < 1:
+            raise CommandError('--synthetic must be at least 1')
+        users_count = options['users'] if options['users'] is not None else max(10, books_count // 20)
+        borrows_count = options['borrows'] if options['borrows'] is not None else books_count * 10
+        batch_size = options['batch_size']
+        rng = random.Random(options['seed'])
+        # برچسب اجرا تا اجرای دوباره با username و isbn تکراری برخورد نکند
+        run = timezone.now().strftime('%Y%m%d%H%M%S')
+        started = time.perf_counter()
         
-        self.stdout.write(self.style.SUCCESS('\nDatabase seeded successfully!'))
-        self.stdout.write(self.style.SUCCESS(f'Created {Category.objects.count()} categories'))
-        self.stdout.write(self.style.SUCCESS(f'Created {Book.objects.count()} books'))
-        self.stdout.write(self.style.SUCCESS(f'Created {User.objects.count()} users'))
+        covers = self.create_placeholder_covers(options['covers'])
+        
+        # یک بار هش رمز؛ همه کاربران مصنوعی رمز password123 دارند
+        password = make_password('password123')
+        borrow_limit = 5
+        user_ids = []
+        for offset in range(0, users_count, batch_size):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f'synthetic_{run}_{i}', email=f'synthetic_{run}_{i}@example.com', password=password)
+                    for i in range(offset, min(offset + batch_size, users_count))
+                ])
+                Profile.objects.bulk_create([
+                    Profile(user=user, borrow_limit=borrow_limit, warning=0, address='', phone=0)
+                    for user in users
+                ])
+            user_ids.extend(user.id for user in users)
+        self.stdout.write(f'Created {len(user_ids)} users')
+        
+        category_ids = list(categories.values())
+        book_ids = []
+        # تعداد کل نسخه‌های هر کتاب؛ available_copy بعد از ساخت امانت‌ها از آن کم می‌شود
+        copies = {}
+        today = timezone.localdate()
+        for offset in range(0, books_count, batch_size):
+            with transaction.atomic():
+                books = Book.objects.bulk_create([
+                    Book(
+                        name=f'Synthetic Book {i}',
+                        author=f'Author {rng.randrange(max(1, books_count // 10))}',
+                        isbn=f'synthetic-{run}-{i}',
+                        price=rng.randrange(50, 500) * 1000,
+                        sell=rng.random() < 0.5,
+                        available_copy=rng.randint(0, 10),
+                        date=today - timedelta(days=rng.randrange(365 * 50)),
+                        description=f'Synthetic description {i}',
+                        cover_image=covers[i % len(covers)] if covers else None,
+                    )
+                    for i in range(offset, min(offset + batch_size, books_count))
+                ])
+                Book.category.through.objects.bulk_create([
+                    Book.category.through(book_id=book.id, category_id=category_id)
+                    for book in books
+                    for category_id in rng.sample(category_ids, rng.randint(1, 3))
+                ])
+            book_ids.extend(book.id for book in books)
+            copies.update((book.id, book.available_copy) for book in books)
+        self.stdout.write(f'Created {len(book_ids)} books')
+        
+        now = timezone.now()
+        open_books = {}
+        on_loan = {}
+        for offset in range(0, borrows_count, batch_size):
+            rows = []
+            for _ in range(offset, min(offset + batch_size, borrows_count)):
+                user_id = rng.choice(user_ids)
+                book_id = rng.choice(book_ids)
+                borrow_date = now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+                return_date = borrow_date + timedelta(days=14)
+                returned_at = borrow_date + timedelta(days=rng.uniform(1, 21))
+                # بیشتر امانت‌های گذشته بازگردانده شده‌اند؛ بخشی باز و بخشی سررسیده می‌مانند
+                is_return = returned_at < now and rng.random() < 0.95
+                held = open_books.setdefault(user_id, set())
+                if not is_return and (
+                    len(held) >= borrow_limit or book_id in held or on_loan.get(book_id, 0) >= copies[book_id]
+                ):
+                    # امانتی که برنامه اجازه باز ماندنش را نمی‌دهد بازگردانده‌شده ساخته می‌شود
+                    is_return = True
+                    returned_at = borrow_date + (min(returned_at, now) - borrow_date) * rng.random()
+                if not is_return:
+                    held.add(book_id)
+                    on_loan[book_id] = on_loan.get(book_id, 0) + 1
+                rows.append(Borrow(
+                    user_id=user_id,
+                    book_id=book_id,
+                    borrow_date=borrow_date,
+                    return_date=return_date,
+                    is_return=is_return,
+                    returned_at=returned_at if is_return else None,
+                    # مثل مسیر بازگشت، بازگشت با تاخیر penalized است
+                    penalized=is_return and returned_at > return_date,
+                ))
+            with transaction.atomic():
+                Borrow.objects.bulk_create(rows)
+        self.stdout.write(f'Created {borrows_count} borrows')
+        
+        # نسخه‌های امانت‌رفته از موجودی کم می‌شوند
+        loaned = list(on_loan.items())
+        for offset in range(0, len(loaned), batch_size):
+            with transaction.atomic():
+                Book.objects.bulk_update([
+                    Book(id=book_id, available_copy=copies[book_id] - count)
+                    for book_id, count in loaned[offset:offset + batch_size]
+                ], ['available_copy'])
+        
+        # شمارنده‌ها و ایندکس جستجو از روی داده‌های واقعی جدول‌ها ساخته می‌شوند
+        call_command('rebuild_borrow_counts', batch_size=batch_size, stdout=self.stdout)
+        call_command('reconcile_profile_counters', batch_size=batch_size, stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        invalidate_home()
+        bump_versions('book', 'category', 'borrow')
+        
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {books_count} books, {len(user_ids)} users and {borrows_count} borrows in {elapsed:.2f}s'
+        ))
 
+    def create_placeholder_covers(self, count):
+        """چند جلد جایگزین که بین کتاب‌های مصنوعی مشترک است (به همراه نسخه‌های کوچک‌شده)"""
+        names = []
+        for index in range(count):
+            name = f'book_covers/synthetic_{index}.jpg'
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(draw_cover(index)))
+            generate_variants(name)
+            names.append(name)
+        return names
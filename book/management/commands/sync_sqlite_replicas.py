@@ -0,0 +1,43 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from shopweb.db_router import PRIMARY, get_replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database onto every SQLite replica in REPLICA_DATABASES '
+        '(a stand-in for replication when testing the replica router locally)'
+    )
+
+    def handle(self, *args, **options):
+        replicas = get_replicas()
+        if not replicas:
+            raise CommandError('REPLICA_DATABASES is empty')
+        aliases = [PRIMARY, *replicas]
+        for alias in aliases:
+            if settings.DATABASES[alias]['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError(f'{alias} is not a SQLite database')
+
+        started = time.perf_counter()
+        source = sqlite3.connect(str(settings.DATABASES[PRIMARY]['NAME']))
+        try:
+            for alias in replicas:
+                # اتصال باز Django به replica قبل از بازنویسی فایل بسته می‌شود
+                connections[alias].close()
+                target = sqlite3.connect(str(settings.DATABASES[alias]['NAME']))
+                try:
+                    # backup API یک کپی سازگار حتی در حین نوشتن روی primary می‌سازد
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'Copied {PRIMARY} to {alias}')
+        finally:
+            source.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Synced {len(replicas)} replicas in {elapsed:.2f}s'))
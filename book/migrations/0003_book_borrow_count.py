@@ -0,0 +1,38 @@
+# Generated by Django 5.1.5 on 2026-10-18 06:46
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_borrow_count(apps, schema_editor):
+    Book = apps.get_model('book', 'Book')
+    Borrow = apps.get_model('book', 'Borrow')
+    counts = (
+        Borrow.objects.filter(book=OuterRef('pk'))
+        .order_by()
+        .values('book')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    Book.objects.update(borrow_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0002_banner_book_author'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='borrow_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-borrow_count', '-date'], name='book_popular_idx'),
+        ),
+        migrations.RunPython(populate_borrow_count, migrations.RunPython.noop),
+    ]
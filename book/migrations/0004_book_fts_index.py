@@ -0,0 +1,57 @@
+# Generated by Django 5.1.5 on 2026-10-18 06:48
+
+from django.db import migrations
+
+
+# نسخه ثابت book.search در زمان این migration؛ تغییر بعدی کد برنامه تاریخچه را عوض نمی‌کند
+FTS_TABLE = 'book_book_fts'
+
+_NORMALIZE_MAP = {
+    'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا', 'ؤ': 'و',
+    '\u200c': ' ', '\u200d': '', 'ـ': '',
+}
+_NORMALIZE_MAP.update({chr(code): None for code in range(0x064B, 0x0653)})
+_NORMALIZE_MAP.update({chr(0x06F0 + i): str(i) for i in range(10)})
+_NORMALIZE_MAP.update({chr(0x0660 + i): str(i) for i in range(10)})
+_NORMALIZE_TABLE = str.maketrans(_NORMALIZE_MAP)
+
+
+def normalize_text(text):
+    return (text or '').translate(_NORMALIZE_TABLE).lower()
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "name, author, description, isbn, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    Book = apps.get_model('book', 'Book')
+    rows = [
+        (book.id, normalize_text(book.name), normalize_text(book.author),
+         normalize_text(book.description), normalize_text(book.isbn))
+        for book in Book.objects.all().iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, author, description, isbn) VALUES (%s, %s, %s, %s, %s)',
+            rows
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0003_book_borrow_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
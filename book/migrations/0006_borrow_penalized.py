@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0005_daily_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrow',
+            name='penalized',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['is_return', 'return_date'], name='borrow_open_due_idx'),
+        ),
+    ]
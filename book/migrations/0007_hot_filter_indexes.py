@@ -0,0 +1,43 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0006_borrow_penalized'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('available_copy__gt', 0)), fields=['-date'], name='book_available_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('available_copy__gt', 0), ('sell', True)), fields=['-date'], name='book_for_sale_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['author'], name='book_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(condition=models.Q(('is_return', False)), fields=['user', 'book'], name='borrow_user_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(condition=models.Q(('is_return', False)), fields=['user', '-borrow_date'], name='borrow_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['user', '-borrow_date', '-id'], name='borrow_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['-borrow_date', '-id'], name='borrow_recent_idx'),
+        ),
+    ]
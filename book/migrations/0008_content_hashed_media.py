@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:23
+
+import shopweb.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0007_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='banner',
+            name='image',
+            field=shopweb.fields.ContentHashedImageField(upload_to='banners/'),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='cover_image',
+            field=shopweb.fields.ContentHashedImageField(blank=True, null=True, upload_to='book_covers/'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 07:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0008_content_hashed_media'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='borrowdailystats',
+            name='purchases',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='borrowdailystats',
+            name='revenue',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 08:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0009_daily_purchase_totals'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('available_copy__gt', 0)), fields=['price'], name='book_available_price_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
+from django.utils import timezone
 from account.models import User
+from shopweb.fields import ContentHashedImageField
 
 # Create your models here.
 
@@ -15,8 +17,25 @@ class Book(models.Model):
     date = models.DateField()
     isbn = models.CharField(max_length=250, unique=True)
     available_copy = models.IntegerField(default=1)
-    cover_image = models.ImageField(upload_to='book_covers/', blank=True, null=True)
+    cover_image = ContentHashedImageField(upload_to='book_covers/', blank=True, null=True)
     description = models.TextField(blank=True, null=True)
+    # تعداد کل امانت‌ها؛ در BorrowCreateView به‌روز و با rebuild_borrow_counts بازسازی می‌شود
+    borrow_count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-borrow_count', '-date'], name='book_popular_idx'),
+            # کتاب‌های جدید و ویژه صفحه اصلی و فیلتر available/sell لیست کتاب‌ها
+            models.Index(fields=['-date'], name='book_available_date_idx', condition=models.Q(available_copy__gt=0)),
+            models.Index(
+                fields=['-date'],
+                name='book_for_sale_date_idx',
+                condition=models.Q(sell=True, available_copy__gt=0)
+            ),
+            # مرتب‌سازی order_by=price با فیلتر available
+            models.Index(fields=['price'], name='book_available_price_idx', condition=models.Q(available_copy__gt=0)),
+            models.Index(fields=['author'], name='book_author_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -28,13 +47,63 @@ class Borrow(models.Model):
     borrow_date = models.DateTimeField()
     return_date = models.DateTimeField()
     is_return = models.BooleanField(default = False)
+    returned_at = models.DateTimeField(blank=True, null=True)
+    # هشدار تاخیر این امانت قبلاً (با process_overdue یا هنگام بازگشت) اعمال شده است
+    penalized = models.BooleanField(default=False)
+    
+    class Meta:
+        # is_return=False روی SQLite به NOT is_return ترجمه می‌شود؛ برای امانت‌های باز
+        # ایندکس جزئی (partial) به جای ستون is_return در ایندکس ترکیبی استفاده شده است
+        indexes = [
+            models.Index(fields=['is_return', 'return_date'], name='borrow_open_due_idx'),
+            models.Index(fields=['user', 'book'], name='borrow_user_open_idx', condition=models.Q(is_return=False)),
+            models.Index(fields=['user', '-borrow_date'], name='borrow_user_active_idx', condition=models.Q(is_return=False)),
+            models.Index(fields=['user', '-borrow_date', '-id'], name='borrow_user_recent_idx'),
+            models.Index(fields=['-borrow_date', '-id'], name='borrow_recent_idx'),
+        ]
+
+
+class Purchase(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    price = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
 
 
 class Banner(models.Model):
     title = models.CharField(max_length=250, blank=True)
-    image = models.ImageField(upload_to='banners/')
+    image = ContentHashedImageField(upload_to='banners/')
     order = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
     
     def __str__(self):
-        return self.title or f"Banner {self.pk}"
\ No newline at end of file
+        return self.title or f"Banner {self.pk}"
+
+
+# جداول rollup روزانه؛ با دستور rollup_stats از آخرین watermark پر می‌شوند
+
+class BorrowDailyStats(models.Model):
+    date = models.DateField(unique=True)
+    borrows = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+    overdue_returns = models.PositiveIntegerField(default=0)
+    # کل خریدهای روز بدون join دسته‌ها؛ PurchaseDailyStats کتاب چنددسته‌ای را در هر دسته می‌شمارد
+    purchases = models.PositiveIntegerField(default=0)
+    revenue = models.PositiveBigIntegerField(default=0)
+
+
+class PurchaseDailyStats(models.Model):
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, blank=True, null=True)
+    purchases = models.PositiveIntegerField(default=0)
+    revenue = models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'category'], name='purchase_daily_idx'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    last_date = models.DateField()
@@ -0,0 +1,67 @@
+"""صفحه‌بندی کلیدی (keyset) با cursorهای امضا شده"""
+from django.core import signing
+from django.db.models import Q
+
+
+CURSOR_SALT = 'book.pagination.cursor'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _serialize_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(ordering, obj):
+    field = ordering.lstrip('-')
+    payload = {
+        'o': ordering,
+        'v': _serialize_value(getattr(obj, field)),
+        'id': obj.pk,
+    }
+    return signing.dumps(payload, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor, ordering):
+    try:
+        payload = signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        raise InvalidCursor('cursor نامعتبر است')
+    if not isinstance(payload, dict) or payload.get('o') != ordering:
+        raise InvalidCursor('cursor با ترتیب درخواست شده همخوانی ندارد')
+    return payload['v'], payload['id']
+
+
+def cursor_paginate(queryset, ordering, cursor, page_size):
+    """
+    برگرداندن یک صفحه از queryset بر اساس کلید مرتب‌سازی و id به عنوان
+    کلید دوم. خروجی: (لیست اشیا، cursor صفحه بعد یا None)
+    """
+    field = ordering.lstrip('-')
+    descending = ordering.startswith('-')
+    lookup = 'lt' if descending else 'gt'
+
+    if field == 'id':
+        queryset = queryset.order_by(ordering)
+    else:
+        queryset = queryset.order_by(ordering, '-id' if descending else 'id')
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, ordering)
+        if field == 'id':
+            queryset = queryset.filter(**{f'id__{lookup}': last_id})
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value}) |
+                Q(**{field: value, f'id__{lookup}': last_id})
+            )
+
+    items = list(queryset[:page_size + 1])
+    if len(items) > page_size:
+        items = items[:page_size]
+        return items, encode_cursor(ordering, items[-1])
+    return items, None
@@ -0,0 +1,79 @@
+"""نمونه‌گیری تصادفی کتاب‌ها بدون ORDER BY RANDOM()"""
+import random
+
+from django.conf import settings
+
+from .models import Book
+
+
+class BookSampler:
+    """
+    انتخاب N کتاب تصادفی با نمونه‌گیری از بازه شناسه‌ها.
+
+    به جای مرتب‌سازی کل جدول، شناسه‌های تصادفی بین کمترین و بیشترین id
+    انتخاب و با یک جستجوی id__in روی کلید اصلی خوانده می‌شوند. اگر شناسه‌ها
+    خیلی پراکنده باشند، باقی‌مانده از یک نقطه تصادفی به ترتیب id خوانده می‌شود.
+    """
+
+    def __init__(self, queryset=None, seed=None, oversample=3, max_rounds=3):
+        if queryset is None:
+            queryset = Book.objects.filter(available_copy__gt=0)
+        if seed is None:
+            seed = getattr(settings, 'BOOK_SAMPLER_SEED', None)
+        self.queryset = queryset
+        self.random = random.Random(seed)
+        self.oversample = oversample
+        self.max_rounds = max_rounds
+
+    def get_bounds(self):
+        # دو جستجوی جدا تا هر کدام فقط یک seek روی کلید اصلی باشد
+        ids = Book.objects.order_by('id').values_list('id', flat=True)
+        return ids.first(), ids.last()
+
+    def sample(self, count, exclude_ids=()):
+        if count <= 0:
+            return []
+
+        low, high = self.get_bounds()
+        if low is None:
+            return []
+
+        excluded = set(exclude_ids)
+        picked = {}
+        span = high - low + 1
+
+        for _ in range(self.max_rounds):
+            needed = count - len(picked)
+            if needed <= 0:
+                break
+            size = min(span, needed * self.oversample)
+            candidates = [
+                book_id for book_id in self.random.sample(range(low, high + 1), size)
+                if book_id not in excluded and book_id not in picked
+            ]
+            if not candidates:
+                continue
+            found = sorted(self.queryset.filter(id__in=candidates), key=lambda book: book.id)
+            for book in self.random.sample(found, min(needed, len(found))):
+                picked[book.id] = book
+            if size == span:
+                break
+
+        needed = count - len(picked)
+        if needed > 0:
+            # شناسه‌های پراکنده: خواندن ترتیبی از یک نقطه تصادفی روی ایندکس id
+            pivot = self.random.randint(low, high)
+            remaining = self.queryset.exclude(id__in=excluded | set(picked))
+            books = list(remaining.filter(id__gte=pivot).order_by('id')[:needed])
+            if len(books) < needed:
+                books += list(remaining.filter(id__lt=pivot).order_by('id')[:needed - len(books)])
+            for book in books:
+                picked[book.id] = book
+
+        books = list(picked.values())
+        self.random.shuffle(books)
+        return books[:count]
+
+
+def sample_available_books(count, exclude_ids=(), queryset=None):
+    return BookSampler(queryset=queryset).sample(count, exclude_ids=exclude_ids)
@@ -0,0 +1,140 @@
+"""جستجوی متن کامل کتاب‌ها (نام، نویسنده، توضیحات و ISBN)"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Book
+
+
+FTS_TABLE = 'book_book_fts'
+
+# یکسان‌سازی حروف عربی/فارسی، ارقام و نیم‌فاصله تا «كتاب» و «کتاب» یکی شوند
+_NORMALIZE_MAP = {
+    'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا', 'ؤ': 'و',
+    '‌': ' ', '‍': '', 'ـ': '',
+}
+_NORMALIZE_MAP.update({chr(code): None for code in range(0x064B, 0x0653)})  # اعراب
+_NORMALIZE_MAP.update({chr(0x06F0 + i): str(i) for i in range(10)})  # ارقام فارسی
+_NORMALIZE_MAP.update({chr(0x0660 + i): str(i) for i in range(10)})  # ارقام عربی
+_NORMALIZE_TABLE = str.maketrans(_NORMALIZE_MAP)
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize_text(text):
+    return (text or '').translate(_NORMALIZE_TABLE).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize_text(text))
+
+
+class BaseSearchBackend:
+
+    def search(self, queryset, query, ordered=True):
+        raise NotImplementedError
+
+    def index_books(self, books):
+        pass
+
+    def remove_books(self, book_ids):
+        pass
+
+    def rebuild(self, batch_size=1000):
+        return 0
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """جستجوی ساده با icontains برای دیتابیس‌هایی که ایندکس متن کامل ندارند"""
+
+    def search(self, queryset, query, ordered=True):
+        condition = Q()
+        for token in query.split():
+            condition &= (
+                Q(name__icontains=token) | Q(author__icontains=token) |
+                Q(description__icontains=token) | Q(isbn__icontains=token)
+            )
+        return queryset.filter(condition)
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """جستجو با جدول مجازی FTS5 که از طریق سیگنال‌ها با Book همگام می‌ماند"""
+
+    # وزن ستون‌ها در bm25: name, author, description, isbn
+    weights = (10.0, 5.0, 1.0, 3.0)
+
+    def build_match(self, query):
+        # هر کلمه به صورت پیشوندی جستجو می‌شود: "کتا"* همه «کتاب»ها را پیدا می‌کند
+        return ' '.join(f'"{token}"*' for token in tokenize(query))
+
+    def search(self, queryset, query, ordered=True):
+        match = self.build_match(query)
+        if not match:
+            return queryset.none()
+        # join با خود جدول FTS به جای لیست id محدود: COUNT و صفحه‌بندی همه نتایج را می‌بینند
+        table = queryset.model._meta.db_table
+        extra = {
+            'tables': [FTS_TABLE],
+            'where': [f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+            'params': [match],
+        }
+        if ordered:
+            weights = ', '.join(str(weight) for weight in self.weights)
+            extra['select'] = {'search_rank': f'bm25({FTS_TABLE}, {weights})'}
+        queryset = queryset.extra(**extra)
+        if ordered:
+            queryset = queryset.order_by('search_rank')
+        return queryset
+
+    def index_books(self, books):
+        books = list(books)
+        if not books:
+            return
+        rows = [
+            (
+                book.id,
+                normalize_text(book.name),
+                normalize_text(book.author),
+                normalize_text(book.description),
+                normalize_text(book.isbn),
+            )
+            for book in books
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, author, description, isbn) VALUES (%s, %s, %s, %s, %s)',
+                rows
+            )
+
+    def remove_books(self, book_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(book_id,) for book_id in book_ids])
+
+    def rebuild(self, batch_size=1000):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        count = 0
+        fields = ('id', 'name', 'author', 'description', 'isbn')
+        batch = []
+        for book in Book.objects.only(*fields).order_by('id').iterator(chunk_size=batch_size):
+            batch.append(book)
+            if len(batch) >= batch_size:
+                self.index_books(batch)
+                count += len(batch)
+                batch = []
+        self.index_books(batch)
+        return count + len(batch)
+
+
+def get_search_backend():
+    backend_path = getattr(settings, 'BOOK_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTSBackend()
+    return DatabaseSearchBackend()
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import *
+from .thumbnails import get_srcset
 from account.serializers import UserSerializer
 
 
@@ -19,11 +20,12 @@ class BookSerializer(serializers.ModelSerializer):
         required=False
     )
     cover_image_url = serializers.SerializerMethodField()
+    cover_image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Book
         fields = '__all__'
-        read_only_fields = ['id']
+        read_only_fields = ['id', 'borrow_count']
     
     def get_cover_image_url(self, obj):
         if obj.cover_image:
@@ -32,16 +34,20 @@ class BookSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.cover_image.url)
             return obj.cover_image.url
         return None
+    
+    def get_cover_image_srcset(self, obj):
+        return get_srcset(obj.cover_image, self.context.get('request'))
 
 
 class BookListSerializer(serializers.ModelSerializer):
     """Serializer برای لیست کتاب‌ها (بدون جزئیات کامل)"""
     category = CategorySerializer(many=True, read_only=True)
     cover_image_url = serializers.SerializerMethodField()
+    cover_image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Book
-        fields = ['id', 'name', 'price', 'sell', 'available_copy', 'category', 'date', 'cover_image', 'cover_image_url', 'description']
+        fields = ['id', 'name', 'price', 'sell', 'available_copy', 'category', 'date', 'cover_image', 'cover_image_url', 'cover_image_srcset', 'description']
     
     def get_cover_image_url(self, obj):
         if obj.cover_image:
@@ -50,6 +56,10 @@ class BookListSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.cover_image.url)
             return obj.cover_image.url
         return None
+    
+    def get_cover_image_srcset(self, obj):
+        # لیست‌ها به جای فایل اصلی از نسخه‌های کوچک‌شده (96/240/480) استفاده کنند
+        return get_srcset(obj.cover_image, self.context.get('request'))
 
 
 class BorrowSerializer(serializers.ModelSerializer):
@@ -64,10 +74,22 @@ class BorrowSerializer(serializers.ModelSerializer):
     class Meta:
         model = Borrow
         fields = '__all__'
-        read_only_fields = ['id', 'user', 'is_return']
+        read_only_fields = ['id', 'user', 'is_return', 'returned_at', 'penalized']
 
 
 class BorrowCreateSerializer(serializers.Serializer):
     """Serializer برای ایجاد امانت"""
     book_id = serializers.IntegerField(required=True)
-    return_date = serializers.DateTimeField(required=True)
\ No newline at end of file
+    return_date = serializers.DateTimeField(required=True)
+
+
+class BorrowBatchCreateSerializer(serializers.Serializer):
+    """Serializer برای امانت گروهی چند کتاب در یک درخواست"""
+    MAX_ITEMS = 20
+    
+    items = BorrowCreateSerializer(many=True, allow_empty=False)
+    
+    def validate_items(self, value):
+        if len(value) > self.MAX_ITEMS:
+            raise serializers.ValidationError(f'حداکثر {self.MAX_ITEMS} کتاب در هر درخواست مجاز است')
+        return value
\ No newline at end of file
@@ -0,0 +1,131 @@
+import logging
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+
+from account.models import Profile
+from .cache import invalidate_home
+from .models import Book, Category, Borrow, Banner
+from .search import get_search_backend
+from .thumbnails import delete_variants, generate_variants
+from .versions import bump_versions
+
+
+logger = logging.getLogger(__name__)
+
+
+def invalidate_home_cache(sender, **kwargs):
+    invalidate_home()
+
+
+def invalidate_home_cache_m2m(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_home()
+
+
+for model in (Book, Category, Borrow, Banner):
+    post_save.connect(invalidate_home_cache, sender=model, dispatch_uid=f'home_cache_save_{model.__name__}')
+    post_delete.connect(invalidate_home_cache, sender=model, dispatch_uid=f'home_cache_delete_{model.__name__}')
+
+m2m_changed.connect(invalidate_home_cache_m2m, sender=Book.category.through, dispatch_uid='home_cache_book_category')
+
+
+# نام شمارنده هر مدل در TableVersion (برای ETag)
+VERSIONED_TABLES = {Book: 'book', Category: 'category', Borrow: 'borrow', Banner: 'banner'}
+
+
+def bump_table_version(sender, **kwargs):
+    bump_versions(VERSIONED_TABLES[sender])
+
+
+def bump_table_version_m2m(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_versions('book')
+
+
+for model in VERSIONED_TABLES:
+    post_save.connect(bump_table_version, sender=model, dispatch_uid=f'table_version_save_{model.__name__}')
+    post_delete.connect(bump_table_version, sender=model, dispatch_uid=f'table_version_delete_{model.__name__}')
+
+m2m_changed.connect(bump_table_version_m2m, sender=Book.category.through, dispatch_uid='table_version_book_category')
+
+
+def index_book(sender, instance, **kwargs):
+    get_search_backend().index_books([instance])
+
+
+def unindex_book(sender, instance, **kwargs):
+    get_search_backend().remove_books([instance.pk])
+
+
+post_save.connect(index_book, sender=Book, dispatch_uid='search_index_book')
+post_delete.connect(unindex_book, sender=Book, dispatch_uid='search_unindex_book')
+
+
+# فیلد تصویری هر مدل که نسخه‌های کوچک‌شده برایش ساخته می‌شود
+THUMBNAIL_FIELDS = {Book: 'cover_image', Banner: 'image', Profile: 'avatar'}
+
+
+def generate_thumbnails(sender, instance, **kwargs):
+    image = getattr(instance, THUMBNAIL_FIELDS[sender])
+    if not image:
+        return
+    
+    def generate():
+        # تصویر خراب نباید ذخیره مدل را از کار بیندازد؛ build_thumbnails بعداً دوباره می‌سازد
+        try:
+            generate_variants(image.name, image.storage)
+        except Exception:
+            logger.warning('Could not build thumbnails for %s', image.name, exc_info=True)
+    
+    transaction.on_commit(generate)
+
+
+def remember_thumbnail_source(sender, instance, update_fields=None, **kwargs):
+    # نام تصویر قبلی برای پاک کردن نسخه‌هایش بعد از جایگزینی
+    field = THUMBNAIL_FIELDS[sender]
+    instance._previous_thumbnail_source = None
+    if instance.pk is None or (update_fields is not None and field not in update_fields):
+        return
+    instance._previous_thumbnail_source = (
+        sender._base_manager.filter(pk=instance.pk).values_list(field, flat=True).first()
+    )
+
+
+def release_thumbnails(sender, name, storage):
+    """
+    پاک کردن نسخه‌های تصویری که دیگر استفاده نمی‌شود، بعد از commit. نام فایل‌ها از hash محتوا
+    ساخته می‌شود و چند ردیف می‌توانند به یک فایل اشاره کنند، پس اگر ردیف دیگری هنوز همین
+    تصویر را دارد نسخه‌ها می‌مانند.
+    """
+    field = THUMBNAIL_FIELDS[sender]
+    
+    def delete():
+        if sender._base_manager.filter(**{field: name}).exists():
+            return
+        try:
+            delete_variants(name, storage)
+        except Exception:
+            logger.warning('Could not delete thumbnails for %s', name, exc_info=True)
+    
+    transaction.on_commit(delete)
+
+
+def replace_thumbnails(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_thumbnail_source', None)
+    image = getattr(instance, THUMBNAIL_FIELDS[sender])
+    if previous and previous != image.name:
+        release_thumbnails(sender, previous, image.storage)
+
+
+def delete_thumbnails(sender, instance, **kwargs):
+    image = getattr(instance, THUMBNAIL_FIELDS[sender])
+    if image:
+        release_thumbnails(sender, image.name, image.storage)
+
+
+for model in THUMBNAIL_FIELDS:
+    pre_save.connect(remember_thumbnail_source, sender=model, dispatch_uid=f'thumbnails_source_{model.__name__}')
+    post_save.connect(generate_thumbnails, sender=model, dispatch_uid=f'thumbnails_{model.__name__}')
+    post_save.connect(replace_thumbnails, sender=model, dispatch_uid=f'thumbnails_replace_{model.__name__}')
+    post_delete.connect(delete_thumbnails, sender=model, dispatch_uid=f'thumbnails_delete_{model.__name__}')
@@ -1,3 +1,1358 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
+from datetime import date, datetime, timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import User, Profile
+from account.tokens import ACCESS, issue_token
+from shopweb.db_router import ReplicaRouter, ReplicaRoutingMiddleware, use_primary
+from .checks import check_shared_cache
+from .cache import get_home_cache_stats
+from .inventory import take_copy
+from .models import Book, Borrow, BorrowDailyStats, Category, Purchase, PurchaseDailyStats, RollupWatermark
+from .sampling import BookSampler
+from .search import get_search_backend
+from .serializers import BookListSerializer
+from .thumbnails import variant_name
+from .versions import versioned_etag
+from .views import Home
+
+
+logger = logging.getLogger(__name__)
+
+
+def create_book(index, **kwargs):
+    defaults = {
+        'name': f'Book {index}',
+        'author': f'Author {index % 5}',
+        'isbn': f'isbn-{index}',
+        'date': date(2020, 1, 1),
+        'available_copy': 3,
+    }
+    defaults.update(kwargs)
+    return Book.objects.create(**defaults)
+
+
+def create_user(username, is_admin=False, borrow_limit=2):
+    user = User.objects.create_user(username, f'{username}@example.com', 'password123')
+    if is_admin:
+        user.is_admin = True
+        user.save()
+    Profile.objects.create(user=user, borrow_limit=borrow_limit, warning=0, address='', phone=0)
+    return user
+
+
+class HomeCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Fiction')
+        for i in range(10):
+            create_book(i).category.add(self.category)
+
+    def test_second_request_is_served_from_cache(self):
+        url = reverse('allbook:home')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.json(), second.json())
+        stats = get_home_cache_stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 2)
+
+    def test_book_change_invalidates_cache(self):
+        url = reverse('allbook:home')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_book(100, name='Brand New', date=date(2030, 1, 1))
+            # تا commit نسخه کش عوض نمی‌شود
+            new_books = [book['name'] for book in self.client.get(url).json()['data']['new_books']]
+            self.assertNotIn('Brand New', new_books)
+        response = self.client.get(url)
+        new_books = [book['name'] for book in response.json()['data']['new_books']]
+        self.assertIn('Brand New', new_books)
+
+    def test_category_m2m_change_invalidates_cache(self):
+        url = reverse('allbook:home')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Category.objects.create(name='Science')
+            Book.objects.first().category.add(other)
+        response = self.client.get(url)
+        counts = {cat['name']: cat['count'] for cat in response.json()['data']['categories']}
+        self.assertEqual(counts['Science'], 1)
+
+    def test_user_fragment_is_separate(self):
+        user = create_user('reader')
+        url = reverse('allbook:home')
+        self.client.get(url)
+        self.client.force_login(user)
+        response = self.client.get(url)
+        self.assertEqual(response.json()['data']['previous_reading'], [])
+
+
+class BookSamplerTests(TestCase):
+
+    def setUp(self):
+        self.books = [create_book(i, available_copy=i % 3) for i in range(30)]
+
+    def test_samples_only_available_books(self):
+        sample = BookSampler(seed=1).sample(8)
+        self.assertEqual(len(sample), 8)
+        self.assertEqual(len({book.id for book in sample}), 8)
+        self.assertTrue(all(book.available_copy > 0 for book in sample))
+
+    def test_seed_is_deterministic(self):
+        first = [book.id for book in BookSampler(seed=42).sample(5)]
+        second = [book.id for book in BookSampler(seed=42).sample(5)]
+        self.assertEqual(first, second)
+
+    def test_exclude_ids(self):
+        excluded = [book.id for book in self.books if book.available_copy > 0][:10]
+        sample = BookSampler(seed=3).sample(10, exclude_ids=excluded)
+        self.assertFalse({book.id for book in sample} & set(excluded))
+
+    def test_sparse_ids_fall_back_to_index_scan(self):
+        Book.objects.exclude(id__in=[self.books[1].id, self.books[-1].id]).delete()
+        sample = BookSampler(seed=5).sample(5)
+        self.assertEqual({book.id for book in sample}, {self.books[1].id, self.books[-1].id})
+
+
+class BorrowCountTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user('reader')
+        self.book = create_book(1)
+
+    def test_borrow_create_increments_counter(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('allbook:borrow-create'), {
+            'book_id': self.book.id,
+            'return_date': (timezone.now() + timedelta(days=7)).isoformat(),
+        })
+        self.assertEqual(response.status_code, 201)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.borrow_count, 1)
+        self.assertEqual(self.book.available_copy, 2)
+
+    def test_rebuild_command_recomputes_counts(self):
+        other = create_book(2, borrow_count=7)
+        for _ in range(3):
+            Borrow.objects.create(
+                user=self.user, book=self.book,
+                borrow_date=timezone.now(), return_date=timezone.now(), is_return=True
+            )
+        call_command('rebuild_borrow_counts', batch_size=1, stdout=StringIO())
+        self.book.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.book.borrow_count, 3)
+        self.assertEqual(other.borrow_count, 0)
+
+
+class CursorPaginationTests(TestCase):
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Fiction')
+        # نام‌های تکراری برای بررسی کلید دوم (id)
+        for i in range(25):
+            create_book(i, name=f'Title {i % 4}', price=i % 3).category.add(self.category)
+
+    def collect(self, url, params, key='data'):
+        seen = []
+        cursor = ''
+        while cursor is not None:
+            response = self.client.get(url, {**params, 'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            seen.extend(item['id'] for item in body[key])
+            cursor = body['next_cursor']
+        return seen
+
+    def test_walks_every_book_once_in_order(self):
+        ids = self.collect(reverse('allbook:book-list'), {'order_by': 'name', 'limit': 4})
+        expected = list(Book.objects.order_by('name', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_category_books(self):
+        url = reverse('allbook:category-books', args=[self.category.id])
+        ids = self.collect(url, {'limit': 10}, key='books')
+        self.assertEqual(ids, sorted(Book.objects.values_list('id', flat=True)))
+
+    def test_borrows_descending_by_date(self):
+        user = create_user('reader')
+        now = timezone.now()
+        for i, book in enumerate(Book.objects.all()[:7]):
+            Borrow.objects.create(
+                user=user, book=book,
+                borrow_date=now - timedelta(days=i % 3), return_date=now, is_return=False
+            )
+        self.client.force_login(user)
+        ids = self.collect(reverse('allbook:borrow-list'), {'limit': 3})
+        expected = list(Borrow.objects.order_by('-borrow_date', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_tampered_or_mismatched_cursor_is_rejected(self):
+        url = reverse('allbook:book-list')
+        cursor = self.client.get(url, {'order_by': 'price', 'limit': 2, 'cursor': ''}).json()['next_cursor']
+        self.assertEqual(self.client.get(url, {'order_by': 'price', 'cursor': cursor + 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'order_by': 'name', 'cursor': cursor}).status_code, 400)
+
+    def test_page_number_mode_is_unchanged(self):
+        body = self.client.get(reverse('allbook:book-list'), {'page': 2}).json()
+        self.assertEqual(body['count'], 25)
+        self.assertEqual(body['total_pages'], 3)
+        self.assertEqual(body['current_page'], 2)
+
+
+class QueryBudgetTests(TestCase):
+    """
+    تعداد کوئری هر endpoint لیستی نباید به اندازه صفحه وابسته باشد.
+    بودجه‌ها شامل کوئری‌های session و user برای درخواست‌های لاگین شده است.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = [Category.objects.create(name=f'Category {i}') for i in range(3)]
+        cls.category = categories[0]
+        cls.admin = create_user('admin', is_admin=True)
+        cls.reader = create_user('reader')
+        now = timezone.now()
+        for i in range(120):
+            book = create_book(i, sell=i % 2 == 0, date=date(2000 + i % 20, 1, 1))
+            book.category.add(*categories[:1 + i % 3])
+            Borrow.objects.create(
+                user=cls.reader, book=book,
+                borrow_date=now - timedelta(hours=i), return_date=now + timedelta(days=7),
+                is_return=False
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertBudget(self, budget, url, user=None, **params):
+        if user is not None:
+            self.client.force_login(user)
+        for limit in (10, 100):
+            with self.subTest(url=url, limit=limit):
+                with self.assertNumQueries(budget):
+                    response = self.client.get(url, {'limit': limit, **params})
+                self.assertEqual(response.status_code, 200)
+
+    def test_book_list(self):
+        self.assertBudget(3, reverse('allbook:book-list'))
+
+    def test_book_list_cursor(self):
+        self.assertBudget(2, reverse('allbook:book-list'), cursor='')
+
+    def test_category_books(self):
+        self.assertBudget(4, reverse('allbook:category-books', args=[self.category.id]))
+
+    def test_category_list(self):
+        self.assertBudget(1, reverse('allbook:category-list'))
+
+    def test_borrow_list(self):
+        self.assertBudget(5, reverse('allbook:borrow-list'), user=self.admin)
+
+    def test_borrow_list_cursor(self):
+        self.assertBudget(4, reverse('allbook:borrow-list'), user=self.reader, cursor='')
+
+    def test_my_active_borrows(self):
+        self.assertBudget(4, reverse('allbook:my-active-borrows'), user=self.reader)
+
+    def test_home(self):
+        # کش سرد: تعداد کوئری ثابت؛ کش گرم: فقط احراز هویت
+        url = reverse('allbook:home')
+        with self.assertNumQueries(13):
+            self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.client.force_login(self.reader)
+        with self.assertNumQueries(4):
+            self.client.get(url)
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+
+class BookSearchTests(TestCase):
+
+    def setUp(self):
+        create_book(1, name='The Hobbit', author='J. R. R. Tolkien', description='A fantasy adventure')
+        create_book(2, name='Adventure Time', author='Someone', isbn='978-0062457714')
+        create_book(3, name='كتاب فارسي', author='نويسنده', description='داستان‌های کوتاه')
+        self.url = reverse('allbook:book-list')
+
+    def names(self, query):
+        response = self.client.get(self.url, {'search': query})
+        return [book['name'] for book in response.json()['data']]
+
+    def test_ranks_name_above_description(self):
+        self.assertEqual(self.names('adventure'), ['Adventure Time', 'The Hobbit'])
+
+    def test_prefix_author_and_isbn(self):
+        self.assertEqual(self.names('tolk'), ['The Hobbit'])
+        self.assertEqual(self.names('0062457'), ['Adventure Time'])
+
+    def test_persian_normalization(self):
+        # «ي» و «ك» عربی با «ی» و «ک» فارسی یکی است و نیم‌فاصله جداکننده است
+        self.assertEqual(self.names('کتاب'), ['كتاب فارسي'])
+        self.assertEqual(self.names('نویسنده'), ['كتاب فارسي'])
+        self.assertEqual(self.names('کوتاه'), ['كتاب فارسي'])
+
+    def test_index_follows_updates_and_deletes(self):
+        book = Book.objects.get(name='The Hobbit')
+        book.name = 'Silmarillion'
+        book.save()
+        self.assertEqual(self.names('hobbit'), [])
+        self.assertEqual(self.names('silmar'), ['Silmarillion'])
+        book.delete()
+        self.assertEqual(self.names('silmar'), [])
+
+    def test_count_covers_every_match(self):
+        books = Book.objects.bulk_create([
+            Book(name=f'Adventure {i}', isbn=f'bulk-{i}', date=date(2020, 1, 1)) for i in range(600)
+        ])
+        get_search_backend().index_books(books)
+        body = self.client.get(self.url, {'search': 'adventure', 'page': 61}).json()
+        self.assertEqual((body['count'], body['total_pages']), (602, 61))
+        self.assertEqual(len(body['data']), 2)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM book_book_fts')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.names('hobbit'), ['The Hobbit'])
+
+
+class InventoryContentionTests(TransactionTestCase):
+    """چند thread همزمان یک کتاب را می‌خرند/امانت می‌گیرند؛ موجودی نباید منفی یا اشتباه شود"""
+
+    threads = 8
+    requests_per_thread = 10
+
+    def hammer(self, users, make_request):
+        outcomes = []
+        lock = threading.Lock()
+
+        def worker(client):
+            results = []
+            for _ in range(self.requests_per_thread):
+                results.append(make_request(client).status_code)
+            connection.close()
+            with lock:
+                outcomes.extend(results)
+
+        clients = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+
+        workers = [threading.Thread(target=worker, args=(client,)) for client in clients]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        logger.info(
+            'inventory contention: %d requests in %.2fs (%.1f req/s)',
+            len(outcomes), elapsed, len(outcomes) / elapsed
+        )
+        self.assertEqual(len(outcomes), self.threads * self.requests_per_thread)
+        return outcomes
+
+    def test_concurrent_purchases(self):
+        book = create_book(1, sell=True, available_copy=20)
+        users = [create_user(f'buyer{i}') for i in range(self.threads)]
+        url = reverse('allbook:book-purchase', args=[book.id])
+        outcomes = self.hammer(users, lambda client: client.post(url))
+
+        book.refresh_from_db()
+        sold = outcomes.count(200)
+        self.assertEqual(sold, 20)
+        self.assertEqual(outcomes.count(400), len(outcomes) - 20)
+        self.assertEqual(book.available_copy, 0)
+
+    def test_concurrent_borrows(self):
+        book = create_book(1, available_copy=5)
+        users = [create_user(f'reader{i}', borrow_limit=100) for i in range(self.threads)]
+        url = reverse('allbook:borrow-create')
+        return_date = (timezone.now() + timedelta(days=7)).isoformat()
+        outcomes = self.hammer(users, lambda client: client.post(url, {'book_id': book.id, 'return_date': return_date}))
+
+        book.refresh_from_db()
+        borrowed = Borrow.objects.filter(book=book).count()
+        self.assertEqual(borrowed, 5)
+        self.assertEqual(outcomes.count(201), 5)
+        self.assertEqual(book.available_copy, 0)
+        self.assertEqual(book.borrow_count, 5)
+
+
+class BorrowBatchCreateTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user('reader', borrow_limit=3)
+        self.client.force_login(self.user)
+        self.books = [create_book(i) for i in range(5)]
+        self.url = reverse('allbook:borrow-batch-create')
+        self.return_date = (timezone.now() + timedelta(days=7)).isoformat()
+
+    def post(self, book_ids):
+        items = [{'book_id': book_id, 'return_date': self.return_date} for book_id in book_ids]
+        return self.client.post(self.url, {'items': items}, content_type='application/json')
+
+    def test_borrows_whole_cart(self):
+        response = self.post([book.id for book in self.books[:3]])
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(all(result['success'] for result in response.json()['results']))
+        self.assertEqual(Borrow.objects.filter(user=self.user).count(), 3)
+        for book in self.books[:3]:
+            book.refresh_from_db()
+            self.assertEqual((book.available_copy, book.borrow_count), (2, 1))
+
+    def test_reports_per_item_failures(self):
+        empty = create_book(99, available_copy=0)
+        Borrow.objects.create(
+            user=self.user, book=self.books[0],
+            borrow_date=timezone.now(), return_date=timezone.now(), is_return=False
+        )
+        Profile.objects.filter(user=self.user).update(active_borrows=1, total_borrows=1)
+        response = self.post([self.books[0].id, empty.id, self.books[1].id, self.books[1].id, 12345, self.books[2].id, self.books[3].id])
+        self.assertEqual(response.status_code, 201)
+        success = [result['success'] for result in response.json()['results']]
+        # یک امانت فعال + دو امانت جدید = سقف 3
+        self.assertEqual(success, [False, False, True, False, False, True, False])
+        self.assertEqual(Borrow.objects.filter(user=self.user, is_return=False).count(), 3)
+        empty.refresh_from_db()
+        self.assertEqual(empty.available_copy, 0)
+
+    def test_nothing_borrowed_returns_400(self):
+        response = self.post([12345])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['results'][0]['success'])
+
+
+class ImportBooksTests(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        Category.objects.create(name='Fiction')
+        create_book(1, isbn='111', name='Old Name', borrow_count=4)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_csv_upsert_with_categories_and_errors(self):
+        path = self.write('books.csv', (
+            'isbn,name,author,price,sell,available_copy,date,categories\n'
+            '111,New Name,Someone,100,true,4,2020-01-01,Fiction\n'
+            '222,Second,Other,50,false,1,2021-05-05,Fiction|Poetry\n'
+            ',Missing Isbn,,0,false,1,2021-05-05,\n'
+            '333,Bad Date,,0,false,1,yesterday,\n'
+        ))
+        errors = os.path.join(self.tmp.name, 'errors.jsonl')
+        call_command('import_books', path, batch_size=1, errors=errors, create_categories=True, stdout=StringIO())
+
+        updated = Book.objects.get(isbn='111')
+        self.assertEqual((updated.name, updated.price, updated.sell, updated.borrow_count), ('New Name', 100, True, 4))
+        # موجودی کتاب موجود بازنویسی نمی‌شود، فقط کتاب جدید مقدار فایل را می‌گیرد
+        self.assertEqual(updated.available_copy, 3)
+        second = Book.objects.get(isbn='222')
+        self.assertEqual(sorted(second.category.values_list('name', flat=True)), ['Fiction', 'Poetry'])
+        with open(errors, encoding='utf-8') as f:
+            rejected = [json.loads(line) for line in f]
+        self.assertEqual([item['line'] for item in rejected], [4, 5])
+
+    def test_rows_without_categories_keep_existing_links(self):
+        book = Book.objects.get(isbn='111')
+        book.category.add(Category.objects.get(name='Fiction'))
+        path = self.write('books.csv', 'isbn,name,date\n111,Renamed,2020-01-01\n')
+        call_command('import_books', path, stdout=StringIO())
+        path = self.write('books.jsonl', json.dumps({'isbn': '111', 'name': 'Renamed', 'date': '2020-01-01'}))
+        call_command('import_books', path, stdout=StringIO())
+        self.assertEqual(list(book.category.values_list('name', flat=True)), ['Fiction'])
+
+        # فهرست خالی صریح دسته‌ها را پاک می‌کند
+        path = self.write('books.jsonl', json.dumps({'isbn': '111', 'name': 'Renamed', 'date': '2020-01-01', 'categories': []}))
+        call_command('import_books', path, stdout=StringIO())
+        self.assertFalse(book.category.exists())
+
+    def test_jsonl_unknown_category_is_rejected(self):
+        path = self.write('books.jsonl', '\n'.join([
+            json.dumps({'isbn': '444', 'name': 'Fourth', 'date': '2019-01-01', 'categories': ['Fiction']}),
+            json.dumps({'isbn': '555', 'name': 'Fifth', 'date': '2019-01-01', 'categories': ['Unknown']}),
+            '{not json',
+            '123',
+            'null',
+            json.dumps({'isbn': '666', 'name': 'Sixth', 'date': '2019-01-01', 'invalid_json': 'data'}),
+        ]))
+        errors = os.path.join(self.tmp.name, 'errors.jsonl')
+        call_command('import_books', path, errors=errors, stdout=StringIO())
+        with open(errors, encoding='utf-8') as f:
+            rejected = [json.loads(line) for line in f]
+        self.assertEqual([item['line'] for item in rejected], [2, 3, 4, 5])
+        self.assertEqual(rejected[1]['row'], '{not json')
+        self.assertTrue(rejected[1]['error'].startswith('invalid JSON'))
+        self.assertTrue(Book.objects.filter(isbn='444', category__name='Fiction').exists())
+        self.assertTrue(Book.objects.filter(isbn='666').exists())
+        self.assertFalse(Book.objects.filter(isbn='555').exists())
+        # ایندکس جستجو هم به‌روز شده است
+        response = self.client.get(reverse('allbook:book-list'), {'search': 'fourth'})
+        self.assertEqual([book['name'] for book in response.json()['data']], ['Fourth'])
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.admin = create_user('admin', is_admin=True)
+        self.reader = create_user('reader')
+        category = Category.objects.create(name='Fiction')
+        now = timezone.now()
+        for i in range(5):
+            book = create_book(i, sell=i % 2 == 0)
+            book.category.add(category)
+            Borrow.objects.create(
+                user=self.reader, book=book,
+                borrow_date=now - timedelta(days=i), return_date=now, is_return=i < 2
+            )
+        self.client.force_login(self.admin)
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_books_csv_respects_filters(self):
+        response = self.client.get(reverse('allbook:book-export'), {'sell': 'true'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(self.content(response).decode())))
+        self.assertEqual([row['name'] for row in rows], ['Book 0', 'Book 2', 'Book 4'])
+        self.assertEqual(rows[0]['categories'], 'Fiction')
+
+    def test_borrows_ndjson_gzip(self):
+        response = self.client.get(reverse('allbook:borrow-export'), {
+            'output': 'ndjson', 'gzip': 'true', 'is_return': 'false'
+        })
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('borrows.ndjson.gz', response['Content-Disposition'])
+        lines = gzip.decompress(self.content(response)).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(row['username'] == 'reader' and not row['is_return'] for row in rows))
+
+    def test_admin_only_and_format_validation(self):
+        self.assertEqual(self.client.get(reverse('allbook:book-export'), {'output': 'xml'}).status_code, 400)
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(reverse('allbook:borrow-export')).status_code, 403)
+
+
+class LibraryStatsSnapshotTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = create_user('admin', is_admin=True)
+        self.client.force_login(self.admin)
+        self.url = reverse('allbook:library-stats')
+        book = create_book(1)
+        create_book(2, available_copy=0)
+        now = timezone.now()
+        Borrow.objects.create(user=self.admin, book=book, borrow_date=now, return_date=now - timedelta(days=1))
+        Borrow.objects.create(user=self.admin, book=book, borrow_date=now, return_date=now, is_return=True)
+
+    def test_counts_in_few_queries_then_served_from_snapshot(self):
+        # session + user + کتاب‌ها + امانت‌ها + کاربران + دسته‌ها + محبوب‌ها (با prefetch)
+        with self.assertNumQueries(8):
+            body = self.client.get(self.url).json()
+        self.assertEqual(
+            (body['total_books'], body['available_books'], body['total_borrows'],
+             body['active_borrows'], body['overdue_borrows'], body['total_users']),
+            (2, 1, 2, 1, 1, 1)
+        )
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    @override_settings(LIBRARY_STATS_TTL=0, LIBRARY_STATS_STALE_TTL=60)
+    def test_stale_snapshot_is_served_while_refreshing(self):
+        refreshes = []
+        with mock.patch('book.cache._start_background', lambda target, *args: refreshes.append((target, args))):
+            self.assertEqual(self.client.get(self.url).json()['total_books'], 2)
+            create_book(3)
+            # مقدار کهنه برگردانده و فقط یک بازسازی زمان‌بندی می‌شود
+            self.assertEqual(self.client.get(self.url).json()['total_books'], 2)
+            self.assertEqual(self.client.get(self.url).json()['total_books'], 2)
+        self.assertEqual(len(refreshes), 1)
+
+        target, args = refreshes[0]
+        with mock.patch('book.cache.connections'):
+            target(*args)
+        self.assertEqual(self.client.get(self.url).json()['total_books'], 3)
+
+
+class DailyRollupTests(TestCase):
+
+    def setUp(self):
+        self.admin = create_user('admin', is_admin=True)
+        self.client.force_login(self.admin)
+        self.fiction = Category.objects.create(name='Fiction')
+        self.book = create_book(1, price=100)
+        self.poetry = Category.objects.create(name='Poetry')
+        self.book.category.add(self.fiction, self.poetry)
+        self.today = timezone.localdate()
+        self.at = lambda days_ago, hour=12: timezone.make_aware(
+            datetime.combine(self.today - timedelta(days=days_ago), datetime.min.time())
+        ) + timedelta(hours=hour)
+
+        # سه روز پیش: دو امانت؛ دیروز: یک بازگشت به‌موقع و یک بازگشت با تاخیر
+        Borrow.objects.create(
+            user=self.admin, book=self.book, borrow_date=self.at(3), return_date=self.at(2),
+            is_return=True, returned_at=self.at(1)
+        )
+        Borrow.objects.create(
+            user=self.admin, book=self.book, borrow_date=self.at(3), return_date=self.at(-5),
+            is_return=True, returned_at=self.at(1, hour=13)
+        )
+        Purchase.objects.create(user=self.admin, book=self.book, price=100, created_at=self.at(2))
+        Purchase.objects.create(user=self.admin, book=create_book(2), price=40, created_at=self.at(2))
+
+    def test_rollup_is_dense_and_idempotent(self):
+        call_command('rollup_stats', stdout=StringIO())
+        rows = {row.date: row for row in BorrowDailyStats.objects.all()}
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[self.today - timedelta(days=3)].borrows, 2)
+        yesterday = rows[self.today - timedelta(days=1)]
+        self.assertEqual((yesterday.returns, yesterday.overdue_returns), (2, 1))
+        self.assertEqual(
+            set(PurchaseDailyStats.objects.values_list('category_id', 'purchases', 'revenue')),
+            {(self.fiction.id, 1, 100), (self.poetry.id, 1, 100), (None, 1, 40)}
+        )
+        # کتاب دو دسته‌ای در جمع روز یک بار شمرده می‌شود
+        two_days_ago = rows[self.today - timedelta(days=2)]
+        self.assertEqual((two_days_ago.purchases, two_days_ago.revenue), (2, 140))
+        self.assertEqual(RollupWatermark.objects.get().last_date, self.today - timedelta(days=1))
+
+        # اجرای دوباره از watermark کاری انجام نمی‌دهد و --since همان نتیجه را بازسازی می‌کند
+        call_command('rollup_stats', stdout=StringIO())
+        call_command('rollup_stats', since=self.today - timedelta(days=3), stdout=StringIO())
+        self.assertEqual(BorrowDailyStats.objects.count(), 3)
+        self.assertEqual(PurchaseDailyStats.objects.count(), 3)
+
+    def test_include_today_keeps_watermark(self):
+        Borrow.objects.create(user=self.admin, book=self.book, borrow_date=timezone.now(), return_date=timezone.now())
+        call_command('rollup_stats', include_today=True, stdout=StringIO())
+        self.assertEqual(BorrowDailyStats.objects.get(date=self.today).borrows, 1)
+        self.assertEqual(RollupWatermark.objects.get().last_date, self.today - timedelta(days=1))
+
+    def test_timeseries_reads_only_rollups(self):
+        call_command('rollup_stats', stdout=StringIO())
+        url = reverse('allbook:library-timeseries')
+        # session + user + امانت‌ها + خریدها + watermark
+        with self.assertNumQueries(5):
+            body = self.client.get(url, {'days': 7}).json()
+        self.assertEqual(len(body['series']), 7)
+        yesterday = body['series'][-1]
+        self.assertEqual((yesterday['returns'], yesterday['overdue_rate']), (2, 0.5))
+        self.assertEqual((body['series'][-2]['purchases'], body['series'][-2]['revenue']), (2, 140))
+        self.assertEqual(len(body['series'][-2]['categories']), 3)
+        self.assertEqual(body['rolled_up_to'], (self.today - timedelta(days=1)).isoformat())
+
+    def test_timeseries_validates_range(self):
+        url = reverse('allbook:library-timeseries')
+        self.assertEqual(self.client.get(url, {'days': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'from': '2024-02-01', 'to': '2024-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'days': 1000}).status_code, 400)
+
+
+class OverdueProcessingTests(TestCase):
+
+    def setUp(self):
+        self.reader = create_user('reader', borrow_limit=5)
+        self.other = create_user('other')
+        self.book = create_book(1)
+        now = timezone.now()
+        self.overdue = [
+            Borrow.objects.create(user=self.reader, book=self.book, borrow_date=now, return_date=now - timedelta(days=days))
+            for days in (1, 2)
+        ]
+        Borrow.objects.create(user=self.other, book=self.book, borrow_date=now, return_date=now - timedelta(days=3))
+        Borrow.objects.create(user=self.other, book=self.book, borrow_date=now, return_date=now + timedelta(days=3))
+        Borrow.objects.create(user=self.other, book=self.book, borrow_date=now, return_date=now - timedelta(days=3), is_return=True)
+        Profile.objects.filter(user=self.reader).update(active_borrows=2, total_borrows=2)
+
+    def warnings(self):
+        return dict(Profile.objects.values_list('user__username', 'warning'))
+
+    def test_penalizes_each_overdue_borrow_once(self):
+        call_command('process_overdue', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.warnings(), {'reader': 2, 'other': 1})
+        self.assertEqual(Borrow.objects.filter(penalized=True).count(), 3)
+        self.assertEqual(Profile.objects.get(user=self.reader).overdue_borrows, 2)
+
+        call_command('process_overdue', stdout=StringIO())
+        self.assertEqual(self.warnings(), {'reader': 2, 'other': 1})
+
+    def test_return_after_penalty_does_not_warn_again(self):
+        call_command('process_overdue', stdout=StringIO())
+        self.client.force_login(self.reader)
+        self.client.post(reverse('allbook:borrow-return', args=[self.overdue[0].id]))
+        profile = Profile.objects.get(user=self.reader)
+        self.assertEqual((profile.warning, profile.overdue_returns, profile.active_borrows), (2, 1, 1))
+        self.assertEqual(self.client.get(reverse('allbook:user-stats')).json()['overdue_borrows'], 1)
+
+    def test_late_return_without_job_warns_and_marks_penalized(self):
+        self.client.force_login(self.reader)
+        self.client.post(reverse('allbook:borrow-return', args=[self.overdue[0].id]))
+        self.assertTrue(Borrow.objects.get(pk=self.overdue[0].id).penalized)
+        call_command('process_overdue', stdout=StringIO())
+        self.assertEqual(self.warnings(), {'reader': 2, 'other': 1})
+
+
+class QueryPlanTests(TestCase):
+    """
+    هر کوئری endpointهای پرتکرار با EXPLAIN QUERY PLAN بررسی می‌شود؛
+    پیمایش کامل جدول‌های بزرگ (کتاب، امانت، کاربر و پروفایل) یعنی ایندکس مناسب وجود ندارد.
+    """
+    LARGE_TABLES = {'book_book', 'book_borrow', 'book_book_category', 'account_user', 'account_profile', 'book_purchase'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Fiction')
+        cls.admin = create_user('admin', is_admin=True)
+        cls.reader = create_user('reader', borrow_limit=5)
+        now = timezone.now()
+        cls.books = []
+        for i in range(5):
+            book = create_book(i, sell=i % 2 == 0)
+            book.category.add(cls.category)
+            cls.books.append(book)
+        cls.borrow = Borrow.objects.create(
+            user=cls.reader, book=cls.books[0],
+            borrow_date=now, return_date=now - timedelta(days=1)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def full_scans(self, queries):
+        scans = []
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+            sorts = any(step.startswith('USE TEMP B-TREE') for step in plan)
+            # پیمایش بدون شرط با LIMIT و بدون مرتب‌سازی جداگانه پس از چند ردیف متوقف می‌شود
+            bounded = ' WHERE ' not in sql and ' LIMIT ' in sql and not sorts
+            for step in plan:
+                words = step.split()
+                if words[0] != 'SCAN' or words[1] not in self.LARGE_TABLES or bounded:
+                    continue
+                # پیمایش کل جدول، یا پیمایش کل یک ایندکس و سپس مرتب‌سازی همه ردیف‌ها
+                if 'INDEX' not in step or sorts:
+                    scans.append((sql, plan))
+        return scans
+
+    def assertNoFullScan(self, method, url, user=None, data=None):
+        if user is not None:
+            self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, content_type='application/json') if method == 'post' \
+                else self.client.get(url, data)
+        self.assertLess(response.status_code, 500)
+        scans = self.full_scans(ctx.captured_queries)
+        self.assertEqual(scans, [], f'{url}: full table scan')
+
+    def test_home(self):
+        self.assertNoFullScan('get', reverse('allbook:home'))
+        cache.clear()
+        self.assertNoFullScan('get', reverse('allbook:home'), user=self.reader)
+
+    def test_book_list(self):
+        url = reverse('allbook:book-list')
+        self.assertNoFullScan('get', url)
+        self.assertNoFullScan('get', url, data={'available': 'true', 'sell': 'true', 'order_by': 'date'})
+        self.assertNoFullScan('get', url, data={'available': 'true', 'order_by': 'date'})
+        self.assertNoFullScan('get', url, data={'available': 'true', 'order_by': 'price'})
+        self.assertNoFullScan('get', url, data={'available': 'true', 'order_by': 'price', 'cursor': ''})
+        self.assertNoFullScan('get', url, data={'available': 'true', 'sell': 'true', 'order_by': 'price'})
+        self.assertNoFullScan('get', url, data={'cursor': ''})
+
+    def test_category_books(self):
+        self.assertNoFullScan('get', reverse('allbook:category-books', args=[self.category.id]))
+
+    def test_borrow_lists(self):
+        url = reverse('allbook:borrow-list')
+        self.assertNoFullScan('get', url, user=self.reader, data={'is_return': 'false'})
+        self.assertNoFullScan('get', url, user=self.reader, data={'cursor': ''})
+        self.assertNoFullScan('get', url, user=self.admin, data={'cursor': ''})
+        self.assertNoFullScan('get', reverse('allbook:my-active-borrows'), user=self.reader)
+
+    def test_borrow_and_return(self):
+        return_date = (timezone.now() + timedelta(days=7)).isoformat()
+        self.assertNoFullScan('post', reverse('allbook:borrow-create'), user=self.reader,
+                              data={'book_id': self.books[1].id, 'return_date': return_date})
+        self.assertNoFullScan('post', reverse('allbook:borrow-batch-create'), user=self.reader,
+                              data={'items': [{'book_id': self.books[2].id, 'return_date': return_date}]})
+        self.assertNoFullScan('post', reverse('allbook:borrow-return', args=[self.borrow.id]), user=self.reader)
+
+    def test_stats(self):
+        self.assertNoFullScan('get', reverse('allbook:user-stats'), user=self.reader)
+        self.assertNoFullScan('get', reverse('allbook:library-timeseries'), user=self.admin)
+
+    def test_process_overdue(self):
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('process_overdue', stdout=StringIO())
+        self.assertEqual(self.full_scans(ctx.captured_queries), [])
+
+
+def create_image(name='cover.jpg', size=(800, 1200), mode='RGB', image_format='JPEG'):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new(mode, size, 'red').save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class TempMediaMixin:
+    """MEDIA_ROOT در یک پوشه موقت که بعد از هر تست پاک می‌شود"""
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+class ThumbnailTests(TempMediaMixin, TestCase):
+
+    def image_size(self, name):
+        from PIL import Image
+        with default_storage.open(name) as f:
+            return Image.open(f).size
+
+    def test_variants_are_built_on_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book = create_book(1, cover_image=create_image())
+        for size in (96, 240, 480):
+            self.assertEqual(self.image_size(variant_name(book.cover_image.name, size, 'webp')), (size, size * 3 // 2))
+            self.assertTrue(default_storage.exists(variant_name(book.cover_image.name, size, 'jpeg')))
+
+        srcset = BookListSerializer(book).data['cover_image_srcset']
+        self.assertEqual(set(srcset), {'webp', 'jpeg'})
+        self.assertEqual(srcset['jpeg']['240'], default_storage.url(variant_name(book.cover_image.name, 240, 'jpeg')))
+
+    def test_srcset_waits_for_variants(self):
+        book = create_book(1)
+        name = default_storage.save('book_covers/old.jpg', create_image())
+        Book.objects.filter(pk=book.pk).update(cover_image=name)
+        book.refresh_from_db()
+        self.assertIsNone(BookListSerializer(book).data['cover_image_srcset'])
+
+    def test_variants_are_deleted_with_their_image(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book = create_book(1, cover_image=create_image())
+            other = create_book(2, cover_image=create_image())
+        old = book.cover_image.name
+        # هر دو کتاب به یک فایل (hash یکسان) اشاره می‌کنند
+        self.assertEqual(other.cover_image.name, old)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book.cover_image = create_image('new.jpg', (300, 450))
+            book.save()
+        self.assertTrue(default_storage.exists(variant_name(old, 96, 'jpeg')))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertFalse(any(default_storage.exists(variant_name(old, size, 'webp')) for size in (96, 240, 480)))
+        self.assertTrue(default_storage.exists(variant_name(book.cover_image.name, 96, 'jpeg')))
+
+        new = book.cover_image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            book.cover_image = None
+            book.save()
+        self.assertFalse(default_storage.exists(variant_name(new, 96, 'jpeg')))
+
+    def test_small_and_transparent_images_are_not_upscaled(self):
+        from book.models import Banner
+        with self.captureOnCommitCallbacks(execute=True):
+            banner = Banner.objects.create(image=create_image('banner.png', (200, 100), 'RGBA', 'PNG'))
+        self.assertEqual(self.image_size(variant_name(banner.image.name, 480, 'jpeg')), (200, 100))
+        self.assertEqual(self.image_size(variant_name(banner.image.name, 96, 'jpeg')), (96, 48))
+
+    def test_backfill_command(self):
+        book = create_book(1)
+        name = default_storage.save('book_covers/old.jpg', create_image())
+        Book.objects.filter(pk=book.pk).update(cover_image=name)
+        out = StringIO()
+        call_command('build_thumbnails', workers=2, stdout=out)
+        self.assertIn('built variants for 1 (6 files, 0 failed)', out.getvalue())
+        self.assertTrue(default_storage.exists(variant_name(name, 96, 'webp')))
+
+        out = StringIO()
+        call_command('build_thumbnails', workers=1, stdout=out)
+        self.assertIn('built variants for 0', out.getvalue())
+
+
+class SyntheticSeedTests(TempMediaMixin, TestCase):
+
+    def test_synthetic_mode_builds_consistent_dataset(self):
+        call_command('seed_data', synthetic=30, users=4, borrows=200, covers=3, batch_size=7, seed=1, stdout=StringIO())
+        self.assertEqual((Book.objects.count(), User.objects.count(), Borrow.objects.count()), (30, 4, 200))
+        self.assertEqual(Category.objects.count(), 10)
+        self.assertEqual(Book.objects.values('cover_image').distinct().count(), 3)
+        self.assertTrue(default_storage.exists(variant_name('book_covers/synthetic_0.jpg', 96, 'webp')))
+
+        # شمارنده‌ها با جدول امانت‌ها یکی هستند
+        book = Book.objects.order_by('-borrow_count').first()
+        self.assertEqual(book.borrow_count, Borrow.objects.filter(book=book).count())
+        profile = Profile.objects.order_by('-active_borrows').first()
+        self.assertEqual(profile.active_borrows, Borrow.objects.filter(user=profile.user, is_return=False).count())
+        self.assertEqual(profile.total_borrows, Borrow.objects.filter(user=profile.user).count())
+
+        # امانت‌های باز در سقف هر کاربر، بدون امانت باز تکراری و بدون موجودی منفی
+        open_borrows = Borrow.objects.filter(is_return=False)
+        self.assertTrue(open_borrows.exists())
+        per_user = open_borrows.values('user').annotate(total=Count('id'), books=Count('book', distinct=True))
+        for row in per_user:
+            self.assertLessEqual(row['total'], 5)
+            self.assertEqual(row['total'], row['books'])
+        self.assertFalse(Book.objects.filter(available_copy__lt=0).exists())
+
+
+class EndpointBenchmarkTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Fiction')
+        for i in range(3):
+            create_book(i, sell=True).category.add(category)
+
+    def test_reports_latency_and_queries_as_json(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'bench.json')
+        call_command(
+            'benchmark_endpoints', use_current_db=True, iterations=3, warmup=0,
+            only=['category-list', 'borrow-return', 'my-active', 'book-export'], output=path,
+            stdout=StringIO(), stderr=StringIO()
+        )
+        with open(path) as f:
+            report = json.load(f)
+        self.assertEqual(
+            set(report['endpoints']),
+            {'category-list', 'category-list (304)', 'borrow-return', 'my-active-borrows', 'book-export'}
+        )
+        # بدنه streaming مصرف می‌شود: session + user + کتاب‌ها + دسته‌ها
+        self.assertEqual(report['endpoints']['book-export']['queries'], 4)
+        category_list = report['endpoints']['category-list']
+        self.assertEqual((category_list['status'], category_list['queries'], category_list['iterations']), (200, 1, 3))
+        self.assertLessEqual(category_list['p50_ms'], category_list['p99_ms'])
+        self.assertEqual(report['endpoints']['category-list (304)']['status'], 304)
+        # درخواست‌های تغییردهنده rollback می‌شوند و هر بار موفق‌اند
+        self.assertEqual(report['endpoints']['borrow-return']['status'], 200)
+        self.assertEqual(Borrow.objects.filter(is_return=True).count(), 0)
+
+
+class ServerTimingTests(TestCase):
+
+    def setUp(self):
+        for i in range(3):
+            create_book(i)
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_header_and_log_line(self):
+        with self.assertLogs('shopweb.timing', 'INFO') as logs:
+            response = self.client.get(reverse('allbook:book-list'), HTTP_ORIGIN='http://localhost:3000')
+        metrics = {part.split(';')[0]: part for part in response['Server-Timing'].split(', ')}
+        self.assertEqual(set(metrics), {'db', 'view', 'ser', 'render', 'total'})
+        self.assertIn('desc="3 queries"', metrics['db'])
+        self.assertEqual(response['Timing-Allow-Origin'], 'http://localhost:3000')
+
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((line['path'], line['status'], line['queries']), ('/books/', 200, 3))
+        self.assertGreaterEqual(line['view_ms'], line['ser_ms'])
+        self.assertGreaterEqual(line['total_ms'], line['view_ms'])
+
+    def test_header_only_for_staff(self):
+        url = reverse('allbook:book-list')
+        with self.assertLogs('shopweb.timing', 'INFO'):
+            response = self.client.get(url, HTTP_ORIGIN='http://localhost:3000')
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('Timing-Allow-Origin', response)
+        self.client.force_login(create_user('reader'))
+        self.assertNotIn('Server-Timing', self.client.get(reverse('allbook:user-stats')))
+        self.client.force_login(create_user('admin', is_admin=True))
+        self.assertIn('Server-Timing', self.client.get(reverse('allbook:user-stats')))
+
+    def test_streaming_response_has_no_render_phase(self):
+        admin = create_user('admin', is_admin=True)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('allbook:book-export'))
+        self.assertNotIn('render;', response['Server-Timing'])
+        self.assertIn('view;', response['Server-Timing'])
+
+    @override_settings(SERVER_TIMING_ENABLED=False)
+    def test_disabled_by_setting(self):
+        response = Client().get(reverse('allbook:book-list'))
+        self.assertNotIn('Server-Timing', response)
+
+
+class ProfilerTests(TestCase):
+
+    def setUp(self):
+        self.profiles = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profiles.cleanup)
+        override = override_settings(PROFILER_DIR=self.profiles.name, PROFILER_MIN_INTERVAL=0, PROFILER_KEEP=2)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.admin = create_user('admin', is_admin=True)
+        self.reader = create_user('reader')
+        create_book(1)
+
+    def test_admin_request_with_flag_is_profiled(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('allbook:borrow-list'), HTTP_X_PROFILE='1')
+        name = response['X-Profile-Id']
+        self.assertTrue(os.path.exists(os.path.join(self.profiles.name, name)))
+
+        page = self.client.get(reverse('admin-profiles'), {'name': name, 'sort': 'tottime'})
+        self.assertEqual(page.status_code, 200)
+        self.assertContains(page, 'borrow_views.py')
+        self.assertEqual(self.client.get(reverse('admin-profiles'), {'name': '../db.sqlite3'}).status_code, 404)
+
+    def test_only_flagged_admin_requests_and_rotation(self):
+        url = reverse('allbook:book-list')
+        self.assertNotIn('X-Profile-Id', self.client.get(url, {'profile': '1'}))
+        self.client.force_login(self.reader)
+        self.assertNotIn('X-Profile-Id', self.client.get(url, {'profile': '1'}))
+        self.client.force_login(self.admin)
+        self.assertNotIn('X-Profile-Id', self.client.get(url))
+        for _ in range(3):
+            self.assertIn('X-Profile-Id', self.client.get(url, {'profile': '1'}))
+        self.assertEqual(len(os.listdir(self.profiles.name)), 2)
+
+    @override_settings(PROFILER_SAMPLE_RATE=0)
+    def test_sampling(self):
+        self.client.force_login(self.admin)
+        self.assertNotIn('X-Profile-Id', self.client.get(reverse('allbook:book-list'), {'profile': '1'}))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Fiction')
+        self.book = create_book(1)
+        self.book.category.add(self.category)
+        self.reader = create_user('reader')
+
+    def revalidate(self, url, etag):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return response, len(ctx)
+
+    def test_unchanged_book_returns_304_without_serializing(self):
+        url = reverse('allbook:book-detail', args=[self.book.id])
+        etag = self.client.get(url)['ETag']
+        with mock.patch('book.views.book_views.BookSerializer') as serializer:
+            response, queries = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(queries, 0)
+        serializer.assert_not_called()
+
+        # update() داخل take_copy سیگنال ندارد ولی نسخه جدول را (بعد از commit) بالا می‌برد
+        with self.captureOnCommitCallbacks(execute=True):
+            take_copy(self.book.id)
+            self.assertEqual(self.revalidate(url, etag)[0].status_code, 304)
+        response, queries = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_follows_query_string_and_related_tables(self):
+        url = reverse('allbook:book-list')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'page': 2})['ETag'], etag)
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.category.add(Category.objects.create(name='History'))
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 200)
+
+        url = reverse('allbook:category-list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 200)
+
+    def test_home_etag_is_per_user(self):
+        url = reverse('allbook:home')
+        anonymous = self.client.get(url)['ETag']
+        self.client.force_login(self.reader)
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(etag, anonymous)
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 304)
+
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            Borrow.objects.create(user=self.reader, book=self.book, borrow_date=now, return_date=now + timedelta(days=7))
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 200)
+
+
+class DeployCheckTests(TestCase):
+
+    def test_deploy_check_requires_shared_cache(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['book.E001'])
+        shared = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379'}
+        with override_settings(CACHES={'default': shared}):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class MediaServingTests(TempMediaMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.book = create_book(1, cover_image=create_image())
+        with default_storage.open(self.book.cover_image.name) as f:
+            self.content = f.read()
+
+    def test_uploads_get_content_hashed_immutable_names(self):
+        name = self.book.cover_image.name
+        self.assertRegex(name, r'^book_covers/cover\.[0-9a-f]{12}\.jpg$')
+        # همان محتوا دوباره ذخیره نمی‌شود
+        self.assertEqual(create_book(2, cover_image=create_image()).cover_image.name, name)
+
+        response = self.client.get(self.book.cover_image.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+        plain = default_storage.save('book_covers/plain.jpg', create_image())
+        self.assertEqual(self.client.get(default_storage.url(plain))['Cache-Control'], 'public, max-age=3600')
+        self.assertEqual(self.client.get('/media/../db.sqlite3').status_code, 404)
+        self.assertEqual(self.client.get('/media/book_covers/').status_code, 404)
+
+    def test_conditional_requests(self):
+        url = self.book.cover_image.url
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['Cache-Control'], response['Cache-Control'])
+
+    def test_byte_ranges(self):
+        url = self.book.cover_image.url
+        size = len(self.content)
+        response = self.client.get(url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{size}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-5:])
+        response = self.client.get(url, HTTP_RANGE=f'bytes={size}-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, f'bytes */{size}'))
+
+        # فایل بعد از If-Range تغییر کرده: کل فایل
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"').status_code, 200)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag).status_code, 206)
+
+    def test_sendfile_modes(self):
+        name = self.book.cover_image.name
+        with override_settings(MEDIA_SENDFILE='x-accel-redirect'):
+            response = self.client.get(self.book.cover_image.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{name}')
+        self.assertEqual((response.content, response['Content-Type']), (b'', 'image/jpeg'))
+        self.assertIn('immutable', response['Cache-Control'])
+
+        with override_settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.client.get(self.book.cover_image.url)
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media.name, name))
+
+
+class AsyncViewTests(TransactionTestCase):
+    # بخش‌ها در threadهای جدا با اتصال خودشان اجرا می‌شوند و داده باید commit شده باشد
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Fiction')
+        for i in range(10):
+            create_book(i, sell=i % 2 == 0, borrow_count=i).category.add(category)
+        self.admin = create_user('admin', is_admin=True)
+        self.reader = create_user('reader')
+        now = timezone.now()
+        Borrow.objects.create(user=self.reader, book_id=Book.objects.first().id, borrow_date=now, return_date=now)
+
+    def get_both(self, sync_name, async_name):
+        sync_response = self.client.get(reverse(sync_name))
+        cache.clear()
+        async_response = self.client.get(reverse(async_name))
+        cache.clear()
+        return sync_response, async_response
+
+    def test_async_home_matches_sync_home(self):
+        self.client.force_login(self.reader)
+        sync_response, async_response = self.get_both('allbook:home', 'allbook:home-async')
+        self.assertEqual(async_response.status_code, 200)
+        self.assertEqual(async_response.json(), sync_response.json())
+        self.assertEqual(len(async_response.json()['data']['previous_reading']), 1)
+
+        url = reverse('allbook:home-async')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_async_home_accepts_bearer_token(self):
+        url = reverse('allbook:home-async')
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {issue_token(self.reader, ACCESS)}'}
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['data']['previous_reading']), 1)
+        self.assertIn('Authorization', response['Vary'])
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer invalid')
+        self.assertEqual((response.status_code, response['WWW-Authenticate']), (401, 'Bearer'))
+
+    async def test_async_middleware_chain_counts_thread_queries(self):
+        profiles = tempfile.TemporaryDirectory()
+        self.addCleanup(profiles.cleanup)
+        await self.async_client.aforce_login(self.admin)
+        with override_settings(PROFILER_DIR=profiles.name, PROFILER_MIN_INTERVAL=0):
+            response = await self.async_client.get(reverse('allbook:home-async'), headers={'X-Profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        # کوئری‌های بخش‌ها در threadهای sync_to_async اجرا شده‌اند و باز هم شمرده می‌شوند
+        queries = int(re.search(r'desc="(\d+) queries"', response['Server-Timing']).group(1))
+        self.assertGreaterEqual(queries, len(Home.SHARED_SECTIONS))
+        self.assertTrue(os.path.exists(os.path.join(profiles.name, response['X-Profile-Id'])))
+
+    def test_benchmark_counts_async_section_queries(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'bench.json')
+        call_command(
+            'benchmark_endpoints', use_current_db=True, iterations=1, warmup=0,
+            only=['home (cold cache)', 'home (async, cold cache)'], output=path,
+            stdout=StringIO(), stderr=StringIO()
+        )
+        with open(path) as f:
+            endpoints = json.load(f)['endpoints']
+        self.assertGreater(endpoints['home (async, cold cache)']['queries'], 0)
+        self.assertEqual(endpoints['home (async, cold cache)']['queries'], endpoints['home (cold cache)']['queries'])
+
+    def test_async_library_stats_matches_sync_and_requires_admin(self):
+        url = reverse('allbook:library-stats-async')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(self.admin)
+        sync_response, async_response = self.get_both('allbook:library-stats', 'allbook:library-stats-async')
+        self.assertEqual(async_response.status_code, 200)
+        stats = async_response.json()
+        self.assertEqual((stats['total_books'], stats['overdue_borrows'], stats['total_users']), (10, 1, 2))
+        for data in (stats, sync_response.json()):
+            data.pop('home_cache')
+        self.assertEqual(stats, sync_response.json())
+
+
+@override_settings(REPLICA_DATABASES=['replica_a', 'replica_b'], REPLICA_STICKY_SECONDS=10)
+class ReplicaRouterTests(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def route(self, request):
+        """alias خواندن Book در حین پردازش درخواست"""
+        seen = []
+
+        def get_response(request):
+            seen.append(self.router.db_for_read(Book))
+            with use_primary():
+                seen.append(self.router.db_for_read(Book))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return seen[0], seen[1], response
+
+    def test_safe_requests_read_from_a_replica(self):
+        read, primary_read, response = self.route(self.factory.get('/books/'))
+        self.assertIn(read, ('replica_a', 'replica_b'))
+        self.assertEqual(primary_read, 'default')
+        self.assertNotIn('primary_until', response.cookies)
+        # بیرون از درخواست همه چیز روی primary است
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+        self.assertEqual(self.router.db_for_write(Book), 'default')
+        self.assertFalse(self.router.allow_migrate('replica_a', 'book'))
+
+    def test_writers_stick_to_primary(self):
+        read, _, response = self.route(self.factory.post('/borrows/create/'))
+        self.assertEqual(read, 'default')
+        cookie = response.cookies['primary_until']
+        self.assertEqual(cookie['max-age'], 10)
+
+        request = self.factory.get('/books/')
+        request.COOKIES['primary_until'] = cookie.value
+        self.assertEqual(self.route(request)[0], 'default')
+
+        # امضای کوکی بعد از پنجره منقضی می‌شود
+        with mock.patch('django.core.signing.time.time', return_value=time.time() + 11):
+            self.assertIn(self.route(request)[0], ('replica_a', 'replica_b'))
+        request.COOKIES['primary_until'] = 'forged'
+        self.assertIn(self.route(request)[0], ('replica_a', 'replica_b'))
+
+    def test_token_writers_stick_to_primary(self):
+        cache.clear()
+        writer = {'HTTP_AUTHORIZATION': f'Bearer {issue_token(create_user("writer"), ACCESS)}'}
+        other = {'HTTP_AUTHORIZATION': f'Bearer {issue_token(create_user("other"), ACCESS)}'}
+        self.route(self.factory.post('/borrows/create/', **writer))
+        self.assertEqual(self.route(self.factory.get('/books/', **writer))[0], 'default')
+        self.assertIn(self.route(self.factory.get('/books/', **other))[0], ('replica_a', 'replica_b'))
+
+    def test_versioned_etag_views_read_from_primary(self):
+        seen = []
+
+        @versioned_etag('book')
+        def view(request):
+            seen.append(self.router.db_for_read(Book))
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(self.factory.get('/books/'))
+        self.assertEqual(seen, ['default'])
+
+    def test_related_objects_follow_their_instance(self):
+        book = create_book(1)
+        book._state.db = 'replica_b'
+        self.assertEqual(self.router.db_for_read(Category, instance=book), 'replica_b')
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas_everything_uses_primary(self):
+        read, _, response = self.route(self.factory.post('/borrows/create/'))
+        self.assertEqual(read, 'default')
+        self.assertNotIn('primary_until', response.cookies)
+        self.assertEqual(self.route(self.factory.get('/'))[0], 'default')
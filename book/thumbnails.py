@@ -0,0 +1,112 @@
+"""
+نسخه‌های کوچک‌شده تصاویر (جلد کتاب، بنر، آواتار) در چند عرض و دو فرمت WebP و JPEG.
+نام هر نسخه از نام فایل اصلی ساخته می‌شود، پس برای پیدا کردن آن به دیتابیس نیازی نیست:
+book_covers/x.jpg -> thumbnails/book_covers/x_240.webp
+"""
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+THUMBNAIL_DIR = 'thumbnails'
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def get_sizes():
+    return tuple(sorted(getattr(settings, 'THUMBNAIL_SIZES', (96, 240, 480))))
+
+
+def variant_name(name, size, fmt):
+    root, _ = posixpath.splitext(name)
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    return posixpath.join(THUMBNAIL_DIR, f'{root}_{size}.{extension}')
+
+
+def variant_names(name):
+    return [variant_name(name, size, fmt) for size in get_sizes() for fmt in FORMATS]
+
+
+def has_variants(name, storage=None):
+    """
+    نسخه‌های تصویر کامل ساخته شده‌اند؛ generate_variants کوچک‌ترین JPEG را آخر از همه می‌نویسد،
+    پس اگر ساخت نیمه‌کاره مانده باشد این فایل وجود ندارد.
+    """
+    storage = storage or default_storage
+    return storage.exists(variant_name(name, get_sizes()[0], 'jpeg'))
+
+
+def get_srcset(image_field, request=None):
+    """
+    دیکشنری آدرس نسخه‌ها برای srcset، مثلاً {'webp': {'96': url, ...}, 'jpeg': {...}}.
+    برای فیلد خالی و برای تصویری که نسخه‌هایش هنوز ساخته نشده (پیش از build_thumbnails
+    یا بعد از خطای ساخت) None برمی‌گرداند تا کلاینت از خود تصویر اصلی استفاده کند.
+    """
+    if not image_field:
+        return None
+    storage = image_field.storage
+    if not has_variants(image_field.name, storage):
+        return None
+    srcset = {}
+    for fmt in FORMATS:
+        urls = {}
+        for size in get_sizes():
+            url = storage.url(variant_name(image_field.name, size, fmt))
+            urls[str(size)] = request.build_absolute_uri(url) if request else url
+        srcset[fmt] = urls
+    return srcset
+
+
+def _flatten(image):
+    # JPEG کانال شفافیت ندارد؛ پس‌زمینه سفید
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def generate_variants(name, storage=None, force=False):
+    """
+    ساخت همه نسخه‌های یک تصویر. اگر نسخه‌ها از قبل وجود داشته باشند (و force نباشد)
+    کاری انجام نمی‌شود. تعداد فایل‌های نوشته‌شده را برمی‌گرداند.
+    """
+    storage = storage or default_storage
+    sizes = get_sizes()
+    if not force and has_variants(name, storage):
+        return 0
+
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        # رمزگشایی JPEG با مقیاس کوچک‌تر؛ برای فایل‌های چند مگابایتی بیشترین صرفه‌جویی همین‌جاست
+        image.draft('RGB', (sizes[-1], sizes[-1]))
+        image = _flatten(ImageOps.exif_transpose(image))
+
+    written = 0
+    # از بزرگ به کوچک؛ هر نسخه از نسخه قبلی ساخته می‌شود
+    for size in reversed(sizes):
+        if image.width > size:
+            image = image.resize((size, max(1, round(image.height * size / image.width))), Image.LANCZOS)
+        for fmt, (pil_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            image.save(buffer, pil_format, **options)
+            path = variant_name(name, size, fmt)
+            if storage.exists(path):
+                storage.delete(path)
+            storage.save(path, ContentFile(buffer.getvalue()))
+            written += 1
+    return written
+
+
+def delete_variants(name, storage=None):
+    storage = storage or default_storage
+    for path in variant_names(name):
+        if storage.exists(path):
+            storage.delete(path)
@@ -10,6 +10,7 @@ from .views import (
     BorrowListView,
     BorrowDetailView,
     BorrowCreateView,
+    BorrowBatchCreateView,
     BorrowReturnView,
     MyActiveBorrowsView,
     CategoryListView,
@@ -20,6 +21,11 @@ from .views import (
     CategoryBooksView,
     UserStatsView,
     LibraryStatsView,
+    LibraryTimeseriesView,
+    BookExportView,
+    BorrowExportView,
+    async_home,
+    async_library_stats,
 )
 
 app_name = 'book'
@@ -27,6 +33,8 @@ app_name = 'book'
 urlpatterns = [
     # Home
     path('', Home.as_view(), name='home'),
+    # نسخه async برای اجرا زیر ASGI
+    path('async/', async_home, name='home-async'),
     
     # Book CRUD
     path('books/', BookListView.as_view(), name='book-list'),
@@ -35,13 +43,16 @@ urlpatterns = [
     path('books/<int:book_id>/update/', BookUpdateView.as_view(), name='book-update'),
     path('books/<int:book_id>/delete/', BookDeleteView.as_view(), name='book-delete'),
     path('books/<int:book_id>/purchase/', BookPurchaseView.as_view(), name='book-purchase'),
+    path('books/export/', BookExportView.as_view(), name='book-export'),
     
     # Borrow
     path('borrows/', BorrowListView.as_view(), name='borrow-list'),
     path('borrows/<int:borrow_id>/', BorrowDetailView.as_view(), name='borrow-detail'),
     path('borrows/create/', BorrowCreateView.as_view(), name='borrow-create'),
+    path('borrows/batch-create/', BorrowBatchCreateView.as_view(), name='borrow-batch-create'),
     path('borrows/<int:borrow_id>/return/', BorrowReturnView.as_view(), name='borrow-return'),
     path('borrows/my-active/', MyActiveBorrowsView.as_view(), name='my-active-borrows'),
+    path('borrows/export/', BorrowExportView.as_view(), name='borrow-export'),
     
     # Category
     path('categories/', CategoryListView.as_view(), name='category-list'),
@@ -54,4 +65,6 @@ urlpatterns = [
     # Stats
     path('stats/', UserStatsView.as_view(), name='user-stats'),
     path('stats/admin/', LibraryStatsView.as_view(), name='library-stats'),
+    path('stats/admin/async/', async_library_stats, name='library-stats-async'),
+    path('stats/admin/timeseries/', LibraryTimeseriesView.as_view(), name='library-timeseries'),
 ]
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+شمارنده تغییرات جداول و ETag پاسخ‌های GET.
+هر تغییر در کتاب‌ها، دسته‌بندی‌ها، بنرها و امانت‌ها شمارنده جدول خودش را در کش یکی زیاد می‌کند
+(سیگنال‌ها و هر جا که با update()/bulk_create سیگنالی فرستاده نمی‌شود)، مثل نسخه کش صفحه اصلی.
+ETag از همین شمارنده‌ها و آدرس درخواست ساخته می‌شود، پس برای پاسخ تغییرنکرده
+بدون اجرای serializer و کوئری‌های اصلی 304 برگردانده می‌شود.
+
+شمارنده‌ها باید در کش مشترک همه workerها باشند (VERSIONS_CACHE، پیش‌فرض default)؛ با کش per-process
+تغییر در یک worker شمارنده بقیه را عوض نمی‌کند و آن‌ها برای داده تغییرکرده 304 می‌دهند.
+check --deploy با کش per-process خطای book.E001 می‌دهد.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+
+from shopweb.db_router import primary_reads
+
+
+def _version_key(name):
+    return f'table:{name}:version'
+
+
+def get_versions_cache():
+    return caches[getattr(settings, 'VERSIONS_CACHE', 'default')]
+
+
+def _bump(names):
+    cache = get_versions_cache()
+    for name in names:
+        try:
+            cache.incr(_version_key(name))
+        except ValueError:
+            cache.set(_version_key(name), time.time_ns(), None)
+
+
+def bump_versions(*names):
+    """
+    افزایش شمارنده‌ها بعد از commit تراکنش جاری (بیرون از تراکنش بلافاصله).
+    افزایش زودتر ETag جدید را با بدنه قبل از commit جفت می‌کند و آن بدنه کهنه تا تغییر بعدی 304 می‌گیرد.
+    """
+    transaction.on_commit(lambda: _bump(names))
+
+
+def get_versions(names):
+    cache = get_versions_cache()
+    keys = [_version_key(name) for name in names]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        # مقدار اولیه یکتا تا بعد از خالی شدن کش ETagهای قبلی دوباره معتبر نشوند
+        for key, version in missing.items():
+            cache.add(key, version, None)
+        versions.update(cache.get_many(list(missing)))
+    return [versions.get(key) for key in keys]
+
+
+def make_etag(request, tables, per_user=False):
+    parts = [request.get_host(), request.get_full_path()]
+    if per_user:
+        parts.append(str(request.user.pk) if request.user.is_authenticated else 'anonymous')
+    parts.extend(f'{name}:{version}' for name, version in zip(tables, get_versions(tables)))
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+
+def versioned_etag(*tables, per_user=False):
+    """
+    دکوریتور متد get یک APIView (با method_decorator):
+    ETag از شمارنده جداول داده‌شده، آدرس کامل درخواست و (در صورت per_user) کاربر ساخته می‌شود.
+    بررسی دسترسی‌های DRF قبل از آن انجام شده است.
+    """
+    conditional = condition(etag_func=lambda request, *args, **kwargs: make_etag(request, tables, per_user))
+
+    def decorator(view):
+        # شمارنده‌ها نسخه primary را نشان می‌دهند، پس بدنه هم باید از primary باشد نه replica
+        view = primary_reads(conditional(view))
+        if per_user:
+            # پاسخ به کاربر بستگی دارد و کاربر می‌تواند از توکن هدر Authorization بیاید
+            view = vary_on_headers('Authorization')(view)
+        return view
+    return decorator
@@ -8,6 +8,7 @@ from .book_views import (
 )
 from .borrow_views import (
     BorrowCreateView,
+    BorrowBatchCreateView,
     BorrowReturnView,
     BorrowListView,
     BorrowDetailView,
@@ -22,7 +23,9 @@ from .category_views import (
     CategoryBooksView
 )
 from .purchase_views import BookPurchaseView
-from .stats_views import LibraryStatsView, UserStatsView
+from .export_views import BookExportView, BorrowExportView
+from .stats_views import LibraryStatsView, LibraryTimeseriesView, UserStatsView
+from .async_views import async_home, async_library_stats
 
 __all__ = [
     'BookListView',
@@ -32,6 +35,7 @@ __all__ = [
     'BookDeleteView',
     'Home',
     'BorrowCreateView',
+    'BorrowBatchCreateView',
     'BorrowReturnView',
     'BorrowListView',
     'BorrowDetailView',
@@ -44,6 +48,11 @@ __all__ = [
     'CategoryBooksView',
     'BookPurchaseView',
     'LibraryStatsView',
+    'LibraryTimeseriesView',
     'UserStatsView',
+    'BookExportView',
+    'BorrowExportView',
+    'async_home',
+    'async_library_stats',
 ]
 
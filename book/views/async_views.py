@@ -0,0 +1,141 @@
+"""
+نسخه async صفحه اصلی و آمار ادمین برای اجرا زیر ASGI (uvicorn shopweb.asgi:application).
+بخش‌های مستقل با asyncio.gather همزمان اجرا می‌شوند.
+
+ORM async جنگو (acount، aget و async for) هر کوئری را با sync_to_async روی یک thread مشترک
+اجرا می‌کند، پس gather روی آن‌ها به تنهایی همزمانی واقعی ندارد. بخش‌های سنگین با run_in_thread
+در thread جدا و با اتصال دیتابیس خودشان اجرا می‌شوند و کوئری‌های کوچک با ORM async.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, PermissionDenied
+
+from account.authentication import SignedTokenAuthentication, get_bearer_token
+from account.models import User
+from ..cache import aget_home_fragment, aget_snapshot, get_home_cache_stats
+from ..models import Borrow, Category
+from ..serializers import BookListSerializer
+from ..versions import versioned_etag
+from .book_views import Home
+from .stats_views import LibraryStatsView
+
+
+async def run_in_thread(func, *args):
+    def call():
+        # مثل شروع و پایان هر درخواست: اتصال خراب یا قدیمی‌تر از CONN_MAX_AGE بسته می‌شود.
+        # با CONN_MAX_AGE > 0 اتصال هر thread executor بین بخش‌ها دوباره استفاده می‌شود.
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return await sync_to_async(call, thread_sensitive=False)()
+
+
+def with_user(view):
+    """
+    request.user تنبل است و در context async نمی‌تواند کوئری بزند؛ کاربر از قبل خوانده می‌شود.
+    مثل DEFAULT_AUTHENTICATION_CLASSES توکن Bearer هم پذیرفته می‌شود.
+    """
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated and get_bearer_token(request) is not None:
+            try:
+                # وضعیت توکن در کش است ولی روی کش خالی یک کوئری می‌زند
+                user, _ = await sync_to_async(SignedTokenAuthentication().authenticate)(request)
+            except AuthenticationFailed as exc:
+                return unauthorized(exc.detail)
+        request.user = user
+        return await view(request, *args, **kwargs)
+    return inner
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+def unauthorized(detail):
+    # مثل DRF با SignedTokenAuthentication: 401 و هدر WWW-Authenticate
+    response = json_response({'detail': str(detail)}, status=401)
+    response['WWW-Authenticate'] = SignedTokenAuthentication.keyword
+    return response
+
+
+@require_safe
+@with_user
+@versioned_etag('book', 'category', 'banner', 'borrow', per_user=True)
+async def async_home(request):
+    """صفحه اصلی (async) - همان خروجی Home"""
+    home = Home()
+    host = request.build_absolute_uri('/')
+
+    async def build_shared():
+        sections = await asyncio.gather(*(
+            run_in_thread(getattr(home, f'get_{name}'), request) for name in Home.SHARED_SECTIONS
+        ))
+        return {name: data for name, data in zip(Home.SHARED_SECTIONS, sections) if data is not None}
+
+    async def build_user():
+        if not request.user.is_authenticated:
+            # کتاب‌های تصادفی از sampler (sync)
+            return await run_in_thread(home.get_user_data, request)
+        user_borrows = Borrow.objects.filter(
+            user=request.user,
+            is_return=False
+        ).select_related('book').prefetch_related('book__category')[:5]
+        previous_reading = [borrow.book async for borrow in user_borrows]
+        return {'previous_reading': BookListSerializer(previous_reading, many=True, context={'request': request}).data}
+
+    if request.user.is_authenticated:
+        user_fragment = f'user:{request.user.pk}:{host}'
+    else:
+        user_fragment = f'anonymous:{host}'
+    shared_data, user_data = await asyncio.gather(
+        aget_home_fragment(f'shared:{host}', build_shared),
+        aget_home_fragment(user_fragment, build_user),
+    )
+    return json_response({
+        'message': 'به کتابخانه خوش آمدید',
+        'data': {**user_data, **shared_data}
+    })
+
+
+@require_safe
+@with_user
+async def async_library_stats(request):
+    """آمار کلی کتابخانه (async، فقط ادمین)"""
+    if not request.user.is_authenticated:
+        return unauthorized(NotAuthenticated.default_detail)
+    if not request.user.is_staff:
+        return json_response({'detail': str(PermissionDenied.default_detail)}, status=403)
+
+    view = LibraryStatsView()
+
+    async def build_stats():
+        book_stats, borrow_stats, total_users, total_categories, popular_books = await asyncio.gather(
+            run_in_thread(view.get_book_stats),
+            run_in_thread(view.get_borrow_stats),
+            User.objects.acount(),
+            Category.objects.acount(),
+            run_in_thread(view.get_popular_books),
+        )
+        return view.format_stats(book_stats, borrow_stats, total_users, total_categories, popular_books)
+
+    stats, age = await aget_snapshot(
+        'library_stats',
+        build_stats,
+        ttl=getattr(settings, 'LIBRARY_STATS_TTL', 30),
+        stale_ttl=getattr(settings, 'LIBRARY_STATS_STALE_TTL', 300)
+    )
+    return json_response({
+        **stats,
+        'snapshot_age': round(age, 1),
+        'home_cache': get_home_cache_stats()
+    })
@@ -3,52 +3,57 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.db.models import Q, Count, prefetch_related_objects
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from datetime import datetime, timedelta
 
 from ..serializers import *
 from ..models import *
+from ..cache import get_home_fragment
+from ..pagination import cursor_paginate, InvalidCursor
+from ..sampling import sample_available_books
+from ..filters import filter_books
+from ..thumbnails import get_srcset
+from ..versions import versioned_etag
 
 
 class BookListView(APIView):
     """لیست تمام کتاب‌ها با امکان جستجو و فیلتر"""
     
+    @method_decorator(versioned_etag('book', 'category'))
     def get(self, request):
-        books = Book.objects.all()
+        books = Book.objects.prefetch_related('category')
         
-        # جستجو بر اساس نام
-        search = request.query_params.get('search', None)
-        if search:
-            books = books.filter(name__icontains=search)
-        
-        # فیلتر بر اساس دسته‌بندی
-        category_id = request.query_params.get('category', None)
-        if category_id:
-            books = books.filter(category__id=category_id)
-        
-        # فیلتر بر اساس قابل فروش بودن
-        sell = request.query_params.get('sell', None)
-        if sell is not None:
-            sell_bool = sell.lower() == 'true'
-            books = books.filter(sell=sell_bool)
-        
-        # فیلتر بر اساس موجود بودن
-        available = request.query_params.get('available', None)
-        if available is not None:
-            available_bool = available.lower() == 'true'
-            if available_bool:
-                books = books.filter(available_copy__gt=0)
-            else:
-                books = books.filter(available_copy=0)
+        # جستجو و فیلترها (دسته‌بندی، فروش، موجودی)
+        books = filter_books(books, request.query_params)
         
         # مرتب‌سازی
         order_by = request.query_params.get('order_by', 'id')
         if order_by in ['name', 'price', 'date', 'available_copy']:
             books = books.order_by(order_by)
+        else:
+            order_by = 'id'
         
-        # Pagination
         page_size = int(request.query_params.get('limit', 10))
+        
+        # Cursor pagination (اختیاری) - بدون COUNT و OFFSET
+        if 'cursor' in request.query_params:
+            try:
+                page, next_cursor = cursor_paginate(
+                    books, order_by, request.query_params['cursor'], page_size
+                )
+            except InvalidCursor as e:
+                return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            serializer = BookListSerializer(page, many=True, context={'request': request})
+            return Response({
+                'data': serializer.data,
+                'next_cursor': next_cursor,
+                'next_page': next_cursor is not None
+            }, status=status.HTTP_200_OK)
+        
+        # Pagination
         page_number = int(request.query_params.get('page', 1))
         
         paginator = Paginator(books, page_size)
@@ -69,6 +74,7 @@ class BookListView(APIView):
 class BookDetailView(APIView):
     """جزئیات یک کتاب"""
     
+    @method_decorator(versioned_etag('book', 'category'))
     def get(self, request, book_id):
         book = get_object_or_404(Book, id=book_id)
         serializer = BookSerializer(book, context={'request': request})
@@ -130,27 +136,70 @@ class BookDeleteView(APIView):
 class Home(APIView):
     """صفحه اصلی - داده‌های کامل برای صفحه هوم"""
     
+    # بخش کاربر (امانت‌های باز) به کاربر وابسته است
+    @method_decorator(versioned_etag('book', 'category', 'banner', 'borrow', per_user=True))
     def get(self, request):
+        # بخش‌های مشترک برای همه کاربران و بخش مخصوص هر کاربر جداگانه کش می‌شوند
+        host = request.build_absolute_uri('/')
+        shared_data = get_home_fragment(
+            f'shared:{host}',
+            lambda: self.get_shared_data(request)
+        )
+        if request.user.is_authenticated:
+            user_fragment = f'user:{request.user.pk}:{host}'
+        else:
+            user_fragment = f'anonymous:{host}'
+        user_data = get_home_fragment(
+            user_fragment,
+            lambda: self.get_user_data(request)
+        )
+        
+        response_data = {
+            'message': 'به کتابخانه خوش آمدید',
+            'data': {**user_data, **shared_data}
+        }
+        return Response(response_data, status=status.HTTP_200_OK)
+    
+    def get_user_data(self, request):
+        """بخش وابسته به کاربر: کتاب‌های در حال مطالعه"""
         # Previous Reading - کتاب‌های امانت گرفته شده (اگر کاربر لاگین باشد)
         previous_reading = []
         if request.user.is_authenticated:
-            from account.models import User
             user_borrows = Borrow.objects.filter(
                 user=request.user,
                 is_return=False
-            ).select_related('book')[:5]
+            ).select_related('book').prefetch_related('book__category')[:5]
             previous_reading = [borrow.book for borrow in user_borrows]
         else:
             # اگر لاگین نباشد، کتاب‌های تصادفی نشان می‌دهیم
-            previous_reading = Book.objects.filter(available_copy__gt=0).order_by('?')[:5]
+            previous_reading = sample_available_books(5)
+            prefetch_related_objects(previous_reading, 'category')
         
+        previous_reading_serializer = BookListSerializer(previous_reading, many=True, context={'request': request})
+        return {'previous_reading': previous_reading_serializer.data}
+    
+    # بخش‌های مستقل داده مشترک؛ نسخه async (async_views) آن‌ها را همزمان اجرا می‌کند
+    SHARED_SECTIONS = ('new_books', 'popular_books', 'special_books', 'categories', 'authors', 'banners')
+    
+    def get_shared_data(self, request):
+        """بخش مشترک صفحه اصلی برای همه کاربران"""
+        data = {}
+        for name in self.SHARED_SECTIONS:
+            section = getattr(self, f'get_{name}')(request)
+            if section is not None:
+                data[name] = section
+        return data
+    
+    def get_new_books(self, request):
         # New Books - کتاب‌های جدید (بر اساس تاریخ)
-        new_books = Book.objects.filter(available_copy__gt=0).order_by('-date')[:6]
-        
+        new_books = Book.objects.filter(available_copy__gt=0).prefetch_related('category').order_by('-date')[:6]
+        return BookListSerializer(new_books, many=True, context={'request': request}).data
+    
+    def get_popular_books(self, request):
         # Popular Books - کتاب‌های محبوب (بر اساس تعداد امانت)
-        popular_books_qs = Book.objects.annotate(
-            borrow_count=Count('borrow')
-        ).filter(available_copy__gt=0).order_by('-borrow_count', '-date')
+        popular_books_qs = Book.objects.filter(
+            available_copy__gt=0
+        ).order_by('-borrow_count', '-date')
         
         popular_books_list = list(popular_books_qs[:8])
         
@@ -158,24 +207,37 @@ class Home(APIView):
         if len(popular_books_list) < 8:
             remaining = 8 - len(popular_books_list)
             popular_ids = [book.id for book in popular_books_list]
-            additional = Book.objects.filter(
-                available_copy__gt=0
-            ).exclude(id__in=popular_ids).order_by('?')[:remaining]
-            popular_books_list.extend(list(additional))
+            additional = sample_available_books(remaining, exclude_ids=popular_ids)
+            popular_books_list.extend(additional)
         
         popular_books = popular_books_list
-        
-        # Categories with count
-        categories = Category.objects.annotate(
-            book_count=Count('book')
-        ).order_by('-book_count')
-        
+        prefetch_related_objects(popular_books, 'category')
+        return BookListSerializer(popular_books, many=True, context={'request': request}).data
+    
+    def get_special_books(self, request):
         # Special Books - کتاب‌های ویژه (کتاب‌های قابل فروش)
         special_books = Book.objects.filter(
             sell=True,
             available_copy__gt=0
-        ).order_by('-date')[:6]
+        ).prefetch_related('category').order_by('-date')[:6]
+        return BookListSerializer(special_books, many=True, context={'request': request}).data
+    
+    def get_categories(self, request):
+        # Categories with count
+        categories = Category.objects.annotate(
+            book_count=Count('book')
+        ).order_by('-book_count')
         
+        categories_data = []
+        for cat in categories:
+            categories_data.append({
+                'id': cat.id,
+                'name': cat.name,
+                'count': cat.book_count
+            })
+        return categories_data
+    
+    def get_authors(self, request):
         # Authors - استخراج از فیلد author خود کتاب‌ها
         authors_data = []
         author_names = (
@@ -186,33 +248,9 @@ class Home(APIView):
         )
         for i, author_name in enumerate(author_names, start=1):
             authors_data.append({'id': i, 'name': author_name})
-        
-        # Serialize data
-        previous_reading_serializer = BookListSerializer(previous_reading, many=True, context={'request': request})
-        new_books_serializer = BookListSerializer(new_books, many=True, context={'request': request})
-        popular_books_serializer = BookListSerializer(popular_books, many=True, context={'request': request})
-        special_books_serializer = BookListSerializer(special_books, many=True, context={'request': request})
-        
-        categories_data = []
-        for cat in categories:
-            categories_data.append({
-                'id': cat.id,
-                'name': cat.name,
-                'count': cat.book_count
-            })
-        
-        response_data = {
-            'message': 'به کتابخانه خوش آمدید',
-            'data': {
-                'previous_reading': previous_reading_serializer.data,
-                'new_books': new_books_serializer.data,
-                'popular_books': popular_books_serializer.data,
-                'special_books': special_books_serializer.data,
-                'categories': categories_data,
-                'authors': authors_data
-            }
-        }
-        
+        return authors_data
+    
+    def get_banners(self, request):
         # Optional: include banners if model exists
         try:
             from ..models import Banner
@@ -228,12 +266,10 @@ class Home(APIView):
                             'id': banner.id,
                             'title': banner.title,
                             'image_url': img_url,
+                            'image_srcset': get_srcset(banner.image, request),
                         }
                     )
-            response_data['data']['banners'] = banners_data
+            return banners_data
         except Exception:
             # اگر به هر دلیلی Banner در دسترس نبود، صفحه همچنان کار کند
-            pass
-        
-        return Response(response_data, status=status.HTTP_200_OK)
-
+            return None
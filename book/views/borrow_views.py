@@ -3,12 +3,17 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from datetime import timedelta
 
-from ..serializers import BorrowSerializer, BorrowCreateSerializer
+from ..serializers import BorrowSerializer, BorrowCreateSerializer, BorrowBatchCreateSerializer
 from ..models import Borrow, Book
+from ..pagination import cursor_paginate, InvalidCursor
+from ..inventory import take_copy, release_copy
+from ..filters import filter_borrows
+from ..versions import bump_versions
 from account.models import Profile
 
 
@@ -39,13 +44,8 @@ class BorrowCreateView(APIView):
         # بررسی پروفایل کاربر
         profile, created = Profile.objects.get_or_create(user=user)
         
-        # بررسی تعداد امانت‌های فعال کاربر
-        active_borrows = Borrow.objects.filter(
-            user=user,
-            is_return=False
-        ).count()
-        
-        if active_borrows >= profile.borrow_limit:
+        # بررسی تعداد امانت‌های فعال کاربر (از شمارنده پروفایل)
+        if profile.active_borrows >= profile.borrow_limit:
             return Response({
                 'message': f'شما به حداکثر تعداد امانت ({profile.borrow_limit}) رسیده‌اید'
             }, status=status.HTTP_400_BAD_REQUEST)
@@ -62,19 +62,30 @@ class BorrowCreateView(APIView):
                 'message': 'شما قبلاً این کتاب را امانت گرفته‌اید و هنوز برنگردانده‌اید'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # ایجاد امانت
-        borrow = Borrow.objects.create(
-            user=user,
-            book=book,
-            borrow_date=timezone.now(),
-            return_date=return_date,
-            is_return=False
-        )
-        
-        # کاهش تعداد نسخه موجود
-        book.available_copy -= 1
-        book.save()
+        with transaction.atomic():
+            # کاهش شرطی موجودی و افزایش شمارنده محبوبیت در یک دستور
+            if not take_copy(book.id, borrowed=True):
+                return Response({
+                    'message': 'این کتاب در حال حاضر موجود نیست'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # رزرو شرطی سهمیه کاربر (امن در برابر درخواست‌های همزمان)
+            if not Profile.objects.reserve_borrows(profile.pk):
+                transaction.set_rollback(True)
+                return Response({
+                    'message': f'شما به حداکثر تعداد امانت ({profile.borrow_limit}) رسیده‌اید'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # ایجاد امانت
+            borrow = Borrow.objects.create(
+                user=user,
+                book=book,
+                borrow_date=timezone.now(),
+                return_date=return_date,
+                is_return=False
+            )
         
+        book.refresh_from_db(fields=['available_copy', 'borrow_count'])
         serializer = BorrowSerializer(borrow)
         return Response({
             'message': 'کتاب با موفقیت امانت گرفته شد',
@@ -82,6 +93,103 @@ class BorrowCreateView(APIView):
         }, status=status.HTTP_201_CREATED)
 
 
+class BorrowBatchCreateView(APIView):
+    """امانت گرفتن چند کتاب در یک تراکنش (سبد امانت)"""
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        serializer = BorrowBatchCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'message': 'خطا در اعتبارسنجی داده‌ها',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        items = serializer.validated_data['items']
+        user = request.user
+        book_ids = [item['book_id'] for item in items]
+        
+        # قوانین امانت فقط یک بار برای کل سبد بررسی می‌شوند
+        profile, created = Profile.objects.get_or_create(user=user)
+        remaining = profile.borrow_limit - profile.active_borrows
+        
+        already_borrowed = set(Borrow.objects.filter(
+            user=user,
+            book_id__in=book_ids,
+            is_return=False
+        ).values_list('book_id', flat=True))
+        
+        results = []
+        borrows = []
+        seen = set()
+        now = timezone.now()
+        
+        with transaction.atomic():
+            # قفل ردیف کتاب‌ها به ترتیب id (در SQLite بی‌اثر است)
+            books = {
+                book.id: book
+                for book in Book.objects.select_for_update().filter(id__in=book_ids).order_by('id')
+            }
+            
+            for item in items:
+                book_id = item['book_id']
+                result = {'book_id': book_id, 'success': False}
+                results.append(result)
+                
+                if book_id not in books:
+                    result['message'] = 'کتاب یافت نشد'
+                elif book_id in seen:
+                    result['message'] = 'این کتاب بیش از یک بار در درخواست آمده است'
+                elif book_id in already_borrowed:
+                    result['message'] = 'شما قبلاً این کتاب را امانت گرفته‌اید و هنوز برنگردانده‌اید'
+                elif len(borrows) >= remaining:
+                    result['message'] = f'شما به حداکثر تعداد امانت ({profile.borrow_limit}) رسیده‌اید'
+                elif not take_copy(book_id, borrowed=True):
+                    result['message'] = 'این کتاب در حال حاضر موجود نیست'
+                else:
+                    borrows.append(Borrow(
+                        user=user,
+                        book_id=book_id,
+                        borrow_date=now,
+                        return_date=item['return_date'],
+                        is_return=False
+                    ))
+                    result['success'] = True
+                seen.add(book_id)
+            
+            # رزرو سهمیه کل سبد در یک UPDATE شرطی
+            if borrows and not Profile.objects.reserve_borrows(profile.pk, len(borrows)):
+                transaction.set_rollback(True)
+                return Response({
+                    'message': f'شما به حداکثر تعداد امانت ({profile.borrow_limit}) رسیده‌اید'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            created_borrows = Borrow.objects.bulk_create(borrows)
+            # bulk_create و update() سیگنال نمی‌فرستند
+            bump_versions('borrow')
+        
+        # داده نهایی کتاب‌ها (موجودی به‌روز شده) برای پاسخ
+        books = Book.objects.prefetch_related('category').in_bulk([borrow.book_id for borrow in created_borrows])
+        created_iter = iter(created_borrows)
+        for result in results:
+            if result['success']:
+                borrow = next(created_iter)
+                borrow.book = books[borrow.book_id]
+                result['message'] = 'کتاب با موفقیت امانت گرفته شد'
+                result['data'] = BorrowSerializer(borrow).data
+        
+        if not created_borrows:
+            return Response({
+                'message': 'هیچ کتابی امانت گرفته نشد',
+                'results': results
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'message': f'{len(created_borrows)} کتاب از {len(items)} کتاب با موفقیت امانت گرفته شد',
+            'results': results
+        }, status=status.HTTP_201_CREATED)
+
+
 class BorrowReturnView(APIView):
     """بازگرداندن کتاب"""
     permission_classes = [IsAuthenticated]
@@ -101,20 +209,47 @@ class BorrowReturnView(APIView):
                 'message': 'این کتاب قبلاً بازگردانده شده است'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # بازگرداندن کتاب
-        borrow.is_return = True
-        borrow.save()
+        with transaction.atomic():
+            # بازگرداندن کتاب (شرطی تا درخواست‌های همزمان دو بار برنگردانند)
+            # شرط penalized مشخص می‌کند process_overdue قبلاً برای این امانت هشدار داده یا نه
+            returned_at = timezone.now()
+            late = returned_at > borrow.return_date
+            penalized = False
+            returned = Borrow.objects.filter(pk=borrow.pk, is_return=False, penalized=False).update(
+                is_return=True,
+                returned_at=returned_at,
+                penalized=late
+            )
+            if not returned:
+                penalized = True
+                returned = Borrow.objects.filter(pk=borrow.pk, is_return=False, penalized=True).update(
+                    is_return=True,
+                    returned_at=returned_at
+                )
+            if not returned:
+                return Response({
+                    'message': 'این کتاب قبلاً بازگردانده شده است'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            borrow.is_return = True
+            borrow.returned_at = returned_at
+            borrow.penalized = late or penalized
+            bump_versions('borrow')
+            
+            # افزایش تعداد نسخه موجود
+            release_copy(borrow.book_id)
+            
+            # به‌روزرسانی شمارنده‌های پروفایل (و هشدار در صورت تاخیر)
+            Profile.objects.release_borrow(borrow.user_id, late=late, penalized=penalized)
         
-        # افزایش تعداد نسخه موجود
-        borrow.book.available_copy += 1
-        borrow.book.save()
+        borrow.book.refresh_from_db(fields=['available_copy'])
         
         # بررسی تاخیر در بازگرداندن
-        if timezone.now() > borrow.return_date:
-            profile, created = Profile.objects.get_or_create(user=borrow.user)
-            profile.warning += 1
-            profile.save()
-            
+        if late and penalized:
+            return Response({
+                'message': 'کتاب با تاخیر بازگردانده شد. هشدار این تاخیر قبلاً به حساب شما اضافه شده بود',
+                'data': BorrowSerializer(borrow).data
+            }, status=status.HTTP_200_OK)
+        if late:
             return Response({
                 'message': 'کتاب با تاخیر بازگردانده شد. یک هشدار به حساب شما اضافه شد',
                 'data': BorrowSerializer(borrow).data
@@ -139,18 +274,32 @@ class BorrowListView(APIView):
             borrows = Borrow.objects.all()
         else:
             borrows = Borrow.objects.filter(user=user)
+        borrows = borrows.select_related('user', 'book').prefetch_related('book__category')
         
         # فیلتر بر اساس وضعیت بازگشت
-        is_return = request.query_params.get('is_return', None)
-        if is_return is not None:
-            is_return_bool = is_return.lower() == 'true'
-            borrows = borrows.filter(is_return=is_return_bool)
+        borrows = filter_borrows(borrows, request.query_params)
         
         # مرتب‌سازی
         borrows = borrows.order_by('-borrow_date')
         
-        # Pagination
         page_size = int(request.query_params.get('limit', 10))
+        
+        # Cursor pagination (اختیاری) - بدون COUNT و OFFSET
+        if 'cursor' in request.query_params:
+            try:
+                page, next_cursor = cursor_paginate(
+                    borrows, '-borrow_date', request.query_params['cursor'], page_size
+                )
+            except InvalidCursor as e:
+                return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            serializer = BorrowSerializer(page, many=True)
+            return Response({
+                'data': serializer.data,
+                'next_cursor': next_cursor
+            }, status=status.HTTP_200_OK)
+        
+        # Pagination
         page_number = int(request.query_params.get('page', 1))
         
         paginator = Paginator(borrows, page_size)
@@ -194,12 +343,13 @@ class MyActiveBorrowsView(APIView):
         active_borrows = Borrow.objects.filter(
             user=user,
             is_return=False
-        ).order_by('-borrow_date')
+        ).select_related('user', 'book').prefetch_related('book__category').order_by('-borrow_date')
         
         serializer = BorrowSerializer(active_borrows, many=True)
+        data = serializer.data
         
         return Response({
-            'data': serializer.data,
-            'count': active_borrows.count()
+            'data': data,
+            'count': len(data)
         }, status=status.HTTP_200_OK)
 
@@ -4,14 +4,18 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 
 from ..serializers import CategorySerializer
 from ..models import Category
+from ..pagination import cursor_paginate, InvalidCursor
+from ..versions import versioned_etag
 
 
 class CategoryListView(APIView):
     """لیست تمام دسته‌بندی‌ها"""
     
+    @method_decorator(versioned_etag('category'))
     def get(self, request):
         categories = Category.objects.all().order_by('name')
         serializer = CategorySerializer(categories, many=True)
@@ -24,6 +28,7 @@ class CategoryListView(APIView):
 class CategoryDetailView(APIView):
     """جزئیات یک دسته‌بندی"""
     
+    @method_decorator(versioned_etag('category'))
     def get(self, request, category_id):
         category = get_object_or_404(Category, id=category_id)
         serializer = CategorySerializer(category)
@@ -94,18 +99,35 @@ class CategoryDeleteView(APIView):
 class CategoryBooksView(APIView):
     """لیست کتاب‌های یک دسته‌بندی"""
     
+    @method_decorator(versioned_etag('book', 'category'))
     def get(self, request, category_id):
         category = get_object_or_404(Category, id=category_id)
-        books = category.book_set.all()
+        books = category.book_set.prefetch_related('category').order_by('id')
         
-        # Pagination
+        from ..serializers import BookListSerializer
         page_size = int(request.query_params.get('limit', 10))
+        
+        # Cursor pagination (اختیاری) - بدون COUNT و OFFSET
+        if 'cursor' in request.query_params:
+            try:
+                page, next_cursor = cursor_paginate(
+                    books, 'id', request.query_params['cursor'], page_size
+                )
+            except InvalidCursor as e:
+                return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            return Response({
+                'category': CategorySerializer(category).data,
+                'books': BookListSerializer(page, many=True).data,
+                'next_cursor': next_cursor
+            }, status=status.HTTP_200_OK)
+        
+        # Pagination
         page_number = int(request.query_params.get('page', 1))
         
         paginator = Paginator(books, page_size)
         page_obj = paginator.get_page(page_number)
         
-        from ..serializers import BookListSerializer
         serializer = BookListSerializer(page_obj, many=True)
         
         return Response({
@@ -0,0 +1,99 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+
+from ..models import Book, Borrow
+from ..filters import filter_books, filter_borrows
+from ..export import export_response, EXPORT_FORMATS
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+BOOK_COLUMNS = [
+    'id', 'isbn', 'name', 'author', 'price', 'sell', 'available_copy',
+    'borrow_count', 'date', 'categories', 'description',
+]
+
+BORROW_COLUMNS = [
+    'id', 'user_id', 'username', 'book_id', 'book_name', 'book_isbn',
+    'borrow_date', 'return_date', 'is_return', 'returned_at',
+]
+
+
+class ExportMixin:
+    """پارامترهای مشترک خروجی: ?output=csv|ndjson و ?gzip=true"""
+    
+    def get_export_options(self, request):
+        export_format = request.query_params.get('output', 'csv')
+        compress = request.query_params.get('gzip', 'false').lower() == 'true'
+        return export_format, compress
+    
+    def invalid_format_response(self):
+        return Response({
+            'message': f'فرمت خروجی باید یکی از {", ".join(EXPORT_FORMATS)} باشد'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class BookExportView(ExportMixin, APIView):
+    """خروجی کامل کاتالوگ کتاب‌ها (فقط ادمین)"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    def get(self, request):
+        export_format, compress = self.get_export_options(request)
+        if export_format not in EXPORT_FORMATS:
+            return self.invalid_format_response()
+        
+        books = filter_books(Book.objects.prefetch_related('category'), request.query_params)
+        if not request.query_params.get('search'):
+            books = books.order_by('id')
+        
+        rows = (
+            {
+                'id': book.id,
+                'isbn': book.isbn,
+                'name': book.name,
+                'author': book.author,
+                'price': book.price,
+                'sell': book.sell,
+                'available_copy': book.available_copy,
+                'borrow_count': book.borrow_count,
+                'date': book.date.isoformat(),
+                'categories': '|'.join(category.name for category in book.category.all()),
+                'description': book.description or '',
+            }
+            for book in books.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        return export_response(rows, BOOK_COLUMNS, export_format, 'books', compress)
+
+
+class BorrowExportView(ExportMixin, APIView):
+    """خروجی تاریخچه امانت‌ها برای حسابرسی (فقط ادمین)"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    def get(self, request):
+        export_format, compress = self.get_export_options(request)
+        if export_format not in EXPORT_FORMATS:
+            return self.invalid_format_response()
+        
+        borrows = filter_borrows(
+            Borrow.objects.select_related('user', 'book'),
+            request.query_params
+        ).order_by('-borrow_date', '-id')
+        
+        rows = (
+            {
+                'id': borrow.id,
+                'user_id': borrow.user_id,
+                'username': borrow.user.username,
+                'book_id': borrow.book_id,
+                'book_name': borrow.book.name,
+                'book_isbn': borrow.book.isbn,
+                'borrow_date': borrow.borrow_date.isoformat(),
+                'return_date': borrow.return_date.isoformat(),
+                'is_return': borrow.is_return,
+                'returned_at': borrow.returned_at.isoformat() if borrow.returned_at else '',
+            }
+            for borrow in borrows.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        return export_response(rows, BORROW_COLUMNS, export_format, 'borrows', compress)
@@ -2,10 +2,12 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 
-from ..models import Book
+from ..models import Book, Purchase
 from ..serializers import BookSerializer
+from ..inventory import take_copy
 
 
 class BookPurchaseView(APIView):
@@ -27,9 +29,17 @@ class BookPurchaseView(APIView):
                 'message': 'این کتاب در حال حاضر موجود نیست'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # کاهش تعداد نسخه موجود
-        book.available_copy -= 1
-        book.save()
+        with transaction.atomic():
+            # کاهش شرطی تعداد نسخه موجود (امن در برابر درخواست‌های همزمان)
+            if not take_copy(book.id):
+                return Response({
+                    'message': 'این کتاب در حال حاضر موجود نیست'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # ثبت خرید برای گزارش‌های روزانه
+            Purchase.objects.create(user=request.user, book=book, price=book.price)
+        
+        book.refresh_from_db(fields=['available_copy'])
         
         return Response({
             'message': 'خرید با موفقیت انجام شد',
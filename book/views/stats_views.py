@@ -2,11 +2,16 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from django.conf import settings
 from django.db.models import Count, Q
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, timedelta
 
-from ..models import Book, Borrow, Category
+from ..models import (
+    Book, Borrow, Category,
+    BorrowDailyStats, PurchaseDailyStats, RollupWatermark
+)
+from ..cache import get_home_cache_stats, get_snapshot
 from account.models import User, Profile
 
 
@@ -15,39 +20,153 @@ class LibraryStatsView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     
     def get(self, request):
-        total_books = Book.objects.count()
-        available_books = Book.objects.filter(available_copy__gt=0).count()
-        total_borrows = Borrow.objects.count()
-        active_borrows = Borrow.objects.filter(is_return=False).count()
-        total_users = User.objects.count()
-        total_categories = Category.objects.count()
+        # داشبورد ادمین مرتب درخواست می‌دهد؛ آمار از snapshot خوانده می‌شود
+        stats, age = get_snapshot(
+            'library_stats',
+            self.build_stats,
+            ttl=getattr(settings, 'LIBRARY_STATS_TTL', 30),
+            stale_ttl=getattr(settings, 'LIBRARY_STATS_STALE_TTL', 300)
+        )
         
+        return Response({
+            **stats,
+            'snapshot_age': round(age, 1),
+            'home_cache': get_home_cache_stats()
+        }, status=status.HTTP_200_OK)
+    
+    def build_stats(self):
+        return self.format_stats(
+            self.get_book_stats(),
+            self.get_borrow_stats(),
+            User.objects.count(),
+            Category.objects.count(),
+            self.get_popular_books()
+        )
+    
+    # هر جدول فقط یک بار با شمارش‌های شرطی خوانده می‌شود؛ نسخه async بخش‌ها را همزمان اجرا می‌کند
+    
+    def get_book_stats(self):
+        return Book.objects.aggregate(
+            total=Count('id'),
+            available=Count('id', filter=Q(available_copy__gt=0))
+        )
+    
+    def get_borrow_stats(self):
+        return Borrow.objects.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_return=False)),
+            # امانت‌های با تاخیر
+            overdue=Count('id', filter=Q(is_return=False, return_date__lt=timezone.now()))
+        )
+    
+    def get_popular_books(self):
         # کتاب‌های محبوب (بیشترین امانت)
-        popular_books = Book.objects.annotate(
-            borrow_count=Count('borrow')
-        ).order_by('-borrow_count')[:5]
+        popular_books = Book.objects.prefetch_related('category').order_by('-borrow_count', '-date')[:5]
         
         from ..serializers import BookListSerializer
-        popular_books_data = BookListSerializer(popular_books, many=True).data
-        
-        # امانت‌های با تاخیر
-        overdue_borrows = Borrow.objects.filter(
-            is_return=False,
-            return_date__lt=timezone.now()
-        ).count()
-        
-        return Response({
-            'total_books': total_books,
-            'available_books': available_books,
-            'unavailable_books': total_books - available_books,
-            'total_borrows': total_borrows,
-            'active_borrows': active_borrows,
-            'returned_borrows': total_borrows - active_borrows,
-            'overdue_borrows': overdue_borrows,
+        return BookListSerializer(popular_books, many=True).data
+    
+    @staticmethod
+    def format_stats(book_stats, borrow_stats, total_users, total_categories, popular_books_data):
+        return {
+            'total_books': book_stats['total'],
+            'available_books': book_stats['available'],
+            'unavailable_books': book_stats['total'] - book_stats['available'],
+            'total_borrows': borrow_stats['total'],
+            'active_borrows': borrow_stats['active'],
+            'returned_borrows': borrow_stats['total'] - borrow_stats['active'],
+            'overdue_borrows': borrow_stats['overdue'],
             'total_users': total_users,
             'total_categories': total_categories,
             'popular_books': popular_books_data
+        }
+
+
+class LibraryTimeseriesView(APIView):
+    """روند روزانه امانت، بازگشت و خرید (فقط ادمین)"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    MAX_DAYS = 366
+    
+    def get(self, request):
+        try:
+            start, end = self.get_range(request.query_params)
+        except ValueError as e:
+            return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # فقط جداول rollup خوانده می‌شوند؛ هزینه متناسب با تعداد روزهاست
+        borrow_rows = {
+            row.date: row
+            for row in BorrowDailyStats.objects.filter(date__range=(start, end))
+        }
+        purchase_rows = {}
+        categories = {}
+        for row in PurchaseDailyStats.objects.filter(date__range=(start, end)).values(
+            'date', 'category_id', 'category__name', 'purchases', 'revenue'
+        ).order_by('date', 'category_id'):
+            purchase_rows.setdefault(row['date'], []).append({
+                'category_id': row['category_id'],
+                'category': row['category__name'],
+                'purchases': row['purchases'],
+                'revenue': row['revenue']
+            })
+            total = categories.setdefault(row['category_id'], {
+                'category_id': row['category_id'],
+                'category': row['category__name'],
+                'purchases': 0,
+                'revenue': 0
+            })
+            total['purchases'] += row['purchases']
+            total['revenue'] += row['revenue']
+        
+        series = []
+        day = start
+        while day <= end:
+            borrow_row = borrow_rows.get(day)
+            returns = borrow_row.returns if borrow_row else 0
+            overdue_returns = borrow_row.overdue_returns if borrow_row else 0
+            series.append({
+                'date': day.isoformat(),
+                'borrows': borrow_row.borrows if borrow_row else 0,
+                'returns': returns,
+                'overdue_returns': overdue_returns,
+                'overdue_rate': round(overdue_returns / returns, 4) if returns else 0,
+                # جمع روزانه از ردیف کل روز؛ جمع ردیف‌های دسته کتاب چنددسته‌ای را چند بار می‌شمارد
+                'purchases': borrow_row.purchases if borrow_row else 0,
+                'revenue': borrow_row.revenue if borrow_row else 0,
+                'categories': purchase_rows.get(day, [])
+            })
+            day += timedelta(days=1)
+        
+        rolled_up_to = RollupWatermark.objects.filter(name='daily_stats').values_list('last_date', flat=True).first()
+        
+        return Response({
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'rolled_up_to': rolled_up_to.isoformat() if rolled_up_to else None,
+            'series': series,
+            'categories': list(categories.values())
         }, status=status.HTTP_200_OK)
+    
+    def get_range(self, params):
+        """بازه از ?from=&to= (YYYY-MM-DD) یا ?days= (پیش‌فرض ۳۰ روز تا دیروز)"""
+        try:
+            end = date.fromisoformat(params['to']) if params.get('to') else timezone.localdate() - timedelta(days=1)
+            if params.get('from'):
+                start = date.fromisoformat(params['from'])
+            else:
+                days = int(params.get('days', 30))
+                if days < 1:
+                    raise ValueError
+                start = end - timedelta(days=days - 1)
+        except ValueError:
+            raise ValueError('بازه زمانی نامعتبر است')
+        
+        if start > end:
+            raise ValueError('تاریخ شروع باید قبل از تاریخ پایان باشد')
+        if (end - start).days + 1 > self.MAX_DAYS:
+            raise ValueError(f'بازه زمانی حداکثر {self.MAX_DAYS} روز است')
+        return start, end
 
 
 class UserStatsView(APIView):
@@ -58,14 +177,12 @@ class UserStatsView(APIView):
         user = request.user
         profile, created = Profile.objects.get_or_create(user=user)
         
-        total_borrows = Borrow.objects.filter(user=user).count()
-        active_borrows = Borrow.objects.filter(user=user, is_return=False).count()
+        # شمارنده‌ها از همان ردیف پروفایل خوانده می‌شوند
+        total_borrows = profile.total_borrows
+        active_borrows = profile.active_borrows
         returned_borrows = total_borrows - active_borrows
-        overdue_borrows = Borrow.objects.filter(
-            user=user,
-            is_return=False,
-            return_date__lt=timezone.now()
-        ).count()
+        # امانت‌های سررسیده تا آخرین اجرای process_overdue
+        overdue_borrows = profile.overdue_borrows
         
         return Response({
             'total_borrows': total_borrows,
@@ -74,6 +191,7 @@ class UserStatsView(APIView):
             'overdue_borrows': overdue_borrows,
             'borrow_limit': profile.borrow_limit,
             'remaining_borrow_limit': profile.borrow_limit - active_borrows,
+            'overdue_returns': profile.overdue_returns,
             'warnings': profile.warning
         }, status=status.HTTP_200_OK)
 
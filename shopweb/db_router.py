@@ -0,0 +1,157 @@
+"""
+ارسال خواندن‌های درخواست‌های GET/HEAD/OPTIONS به replicaها (REPLICA_DATABASES) و بقیه به default.
+
+- هر درخواست یک replica تصادفی می‌گیرد و همه خواندن‌هایش از همان replica است.
+- کاربری که درخواست تغییردهنده (POST/PUT/PATCH/DELETE) فرستاده، تا REPLICA_STICKY_SECONDS ثانیه
+  با یک کوکی امضاشده فقط از primary می‌خواند تا نوشته خودش را ببیند (read-your-writes).
+  کاربری که با توکن Bearer آمده کوکی را نمی‌فرستد؛ برای او همین پنجره با کلید کش روی شناسه کاربر نگه داشته می‌شود.
+- بیرون از درخواست (دستورات مدیریتی، threadهای پس‌زمینه) همه چیز روی primary است.
+- viewهای دارای ETag نسخه‌دار (primary_reads) از primary می‌خوانند: نسخه جدول همان لحظه روی primary
+  بالا رفته و بدنه replica عقب‌مانده با ETag جدید برای همیشه 304 می‌گرفت.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+
+PRIMARY = 'default'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# alias replica انتخاب‌شده برای درخواست جاری؛ None یعنی primary
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def get_replicas():
+    return list(getattr(settings, 'REPLICA_DATABASES', []))
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+def get_sticky_cookie():
+    return getattr(settings, 'REPLICA_STICKY_COOKIE', 'primary_until')
+
+
+@contextmanager
+def use_primary():
+    """خواندن‌های داخل این بلوک از primary (مثلاً ساختن داده‌ای که کش می‌شود)"""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def primary_reads(view):
+    """دکوریتور view (sync یا async) که همه خواندن‌هایش از primary است"""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def inner(*args, **kwargs):
+            with use_primary():
+                return await view(*args, **kwargs)
+    else:
+        @wraps(view)
+        def inner(*args, **kwargs):
+            with use_primary():
+                return view(*args, **kwargs)
+    return inner
+
+
+def _sticky_key(user_id):
+    return f'replica:sticky:{user_id}'
+
+
+def get_token_user_id(request):
+    """شناسه کاربر از access token هدر Authorization (فقط بررسی امضا، بدون کوئری)"""
+    # import داخل تابع: account.tokens خودش به این ماژول وابسته است
+    from account.authentication import get_bearer_token
+    from account.tokens import ACCESS, read_token
+
+    token = get_bearer_token(request)
+    if token is None:
+        return None
+    try:
+        return read_token(token, ACCESS)['uid']
+    except signing.BadSignature:
+        return None
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # اشیای مرتبط از همان دیتابیسی خوانده می‌شوند که خود شیء از آن آمده
+            return instance._state.db
+        return _read_alias.get() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicaها کپی همان دیتابیس‌اند
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicaها از طریق replication به‌روز می‌شوند، نه migrate
+        return db == PRIMARY
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _read_alias.set(self.choose_alias(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        # ContextVar به threadهای sync_to_async هم می‌رسد
+        token = _read_alias.set(self.choose_alias(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.finish(request, response)
+
+    def choose_alias(self, request):
+        replicas = get_replicas()
+        if replicas and request.method in SAFE_METHODS and not self.is_sticky(request):
+            return random.choice(replicas)
+        return None
+
+    def finish(self, request, response):
+        if get_replicas() and request.method not in SAFE_METHODS:
+            seconds = get_sticky_seconds()
+            response.set_signed_cookie(
+                get_sticky_cookie(), '1', max_age=seconds, httponly=True, samesite='Lax'
+            )
+            user_id = get_token_user_id(request)
+            if user_id is not None:
+                cache.set(_sticky_key(user_id), True, seconds)
+        return response
+
+    def is_sticky(self, request):
+        # امضای کوکی زمان دارد؛ بعد از max_age نامعتبر می‌شود حتی اگر مرورگر آن را بفرستد
+        if request.get_signed_cookie(get_sticky_cookie(), default=None, max_age=get_sticky_seconds()) is not None:
+            return True
+        user_id = get_token_user_id(request)
+        return user_id is not None and cache.get(_sticky_key(user_id)) is not None
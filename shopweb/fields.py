@@ -0,0 +1,44 @@
+"""
+فیلد تصویر با hash محتوا در نام فایل آپلودی: book_covers/x.jpg -> book_covers/x.3f2a9c1b7d4e.jpg
+نام هر فایل فقط با محتوای خودش عوض می‌شود، پس serve_media می‌تواند آن را immutable کش کند.
+آپلود دوباره همان محتوا به فایل موجود اشاره می‌کند و نسخه تکراری ذخیره نمی‌شود.
+"""
+import hashlib
+import posixpath
+import re
+
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+
+
+HASH_LENGTH = 12
+# نسخه‌های کوچک‌شده (thumbnails) پسوند _<عرض> دارند و از نام همان فایل ساخته می‌شوند
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{%d}(_\d+)?\.\w+$' % HASH_LENGTH)
+
+
+def is_hashed_name(name):
+    return HASHED_NAME_RE.search(name) is not None
+
+
+class ContentHashedFieldFile(ImageFieldFile):
+
+    def save(self, name, content, save=True):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        root, extension = posixpath.splitext(posixpath.basename(name))
+        name = f'{root}.{digest.hexdigest()[:HASH_LENGTH]}{extension.lower()}'
+
+        existing = self.field.generate_filename(self.instance, name)
+        if not self.storage.exists(existing):
+            return super().save(name, content, save)
+        self.name = existing
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+        if save:
+            self.instance.save()
+
+
+class ContentHashedImageField(models.ImageField):
+    attr_class = ContentHashedFieldFile
@@ -0,0 +1,145 @@
+"""
+سرو فایل‌های media (جلد کتاب، بنر، آواتار و thumbnailها) در production.
+- Range (یک بازه) برای دانلود ادامه‌دار و If-Range
+- ETag/Last-Modified و پاسخ 304 برای If-None-Match/If-Modified-Since
+- Cache-Control: immutable برای نام‌های دارای hash محتوا (shopweb.fields)
+- MEDIA_SENDFILE = 'x-accel-redirect' یا 'x-sendfile': فقط هدرها در پایتون ساخته می‌شوند
+  و خود فایل را nginx/Apache می‌فرستد.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .fields import is_hashed_name
+
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    بازه (start, end) شامل هر دو سر. برای هدر نامعتبر یا چندبازه‌ای None (کل فایل فرستاده می‌شود)
+    و برای بازه بیرون از فایل RangeNotSatisfiable.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        # bytes=-500: پانصد بایت آخر
+        length = int(end)
+        if not length:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size:
+        raise RangeNotSatisfiable
+    if start > end:
+        return None
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def get_cache_control(name):
+    if is_hashed_name(name):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)}"
+
+
+def sendfile_response(name, full_path, content_type):
+    mode = getattr(settings, 'MEDIA_SENDFILE', None)
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-accel-redirect':
+        # location داخلی nginx (internal) که به MEDIA_ROOT اشاره می‌کند
+        response['X-Accel-Redirect'] = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/') + quote(name)
+    else:
+        response['X-Sendfile'] = full_path
+    # Range و طول پاسخ را خود وب‌سرور از روی فایل تعیین می‌کند
+    return response
+
+
+def file_response(request, full_path, size, content_type, etag, last_modified):
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    # If-Range: اگر فایل از آن زمان تغییر کرده، بازه نادیده گرفته و کل فایل فرستاده می‌شود
+    if range_header and (not if_range or if_range in (etag, last_modified)):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(read_range(full_path, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    name = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(str(settings.MEDIA_ROOT), name)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': get_cache_control(name),
+    }
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_type, encoding = mimetypes.guess_type(full_path)
+        content_type = content_type or 'application/octet-stream'
+        if getattr(settings, 'MEDIA_SENDFILE', None):
+            response = sendfile_response(name, full_path, content_type)
+        else:
+            response = file_response(request, full_path, stat.st_size, content_type, etag, headers['Last-Modified'])
+
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -0,0 +1,223 @@
+"""
+اندازه‌گیری زمان هر درخواست به تفکیک دیتابیس، view، serializer و render.
+نتیجه در یک خط لاگ JSON (logger: shopweb.timing) و برای کاربران staff در هدر Server-Timing
+ثبت می‌شود (SERVER_TIMING_HEADER). با SERVER_TIMING_ENABLED = False میدلور اصلاً بارگذاری نمی‌شود.
+
+کوئری‌ها با یک execute_wrapper دائمی روی همه اتصال‌ها (از جمله اتصال threadهای sync_to_async در
+viewهای async) به QueryTrackerهای فعال context جاری اضافه می‌شوند، پس میدلور هم زیر WSGI و هم زیر ASGI
+همه کوئری‌های درخواست را می‌شمارد.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework.serializers import BaseSerializer
+
+
+logger = logging.getLogger('shopweb.timing')
+
+_current_timing = ContextVar('server_timing', default=None)
+# trackerهای فعال (تودرتو، مثلاً benchmark_endpoints بیرون از همین میدلور)
+_query_trackers = ContextVar('query_trackers', default=())
+
+
+class QueryTracker:
+    __slots__ = ('queries', 'db', 'lock')
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        # بخش‌های یک view async همزمان در چند thread کوئری می‌زنند
+        self.lock = threading.Lock()
+
+    def add_query(self, duration):
+        with self.lock:
+            self.queries += 1
+            self.db += duration
+
+
+def record_query(execute, sql, params, many, context):
+    trackers = _query_trackers.get()
+    if not trackers:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        for tracker in trackers:
+            tracker.add_query(duration)
+
+
+def install_query_tracking(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_tracking, dispatch_uid='shopweb_query_tracking')
+
+
+@contextmanager
+def track_queries(tracker):
+    """شمارش کوئری‌های این context در tracker، در هر threadی که context به آن برسد"""
+    # اتصال‌های همین thread که قبل از ثبت سیگنال باز شده‌اند
+    for connection in connections.all():
+        install_query_tracking(connection)
+    token = _query_trackers.set(_query_trackers.get() + (tracker,))
+    try:
+        yield tracker
+    finally:
+        _query_trackers.reset(token)
+
+
+class RequestTiming(QueryTracker):
+    __slots__ = ('started', 'view_started', 'view', 'serializer', 'serializer_depth', 'render_started', 'render')
+
+    def __init__(self):
+        super().__init__()
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view = None
+        self.serializer = 0.0
+        self.serializer_depth = 0
+        self.render_started = None
+        self.render = None
+
+    def metrics(self):
+        total = time.perf_counter() - self.started
+        metrics = [('db', self.db, f'{self.queries} queries')]
+        if self.view is not None:
+            metrics.append(('view', self.view, None))
+        if self.serializer:
+            metrics.append(('ser', self.serializer, None))
+        if self.render is not None:
+            metrics.append(('render', self.render, None))
+        metrics.append(('total', total, None))
+        return metrics
+
+
+def _timed_data(original):
+    """
+    زمان‌سنجی BaseSerializer.data؛ serializerهای تودرتو (Serializer.data -> BaseSerializer.data)
+    با شمارنده عمق فقط یک بار حساب می‌شوند.
+    """
+    def data(serializer):
+        timing = _current_timing.get()
+        if timing is None:
+            return original.fget(serializer)
+        timing.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return original.fget(serializer)
+        finally:
+            timing.serializer_depth -= 1
+            if not timing.serializer_depth:
+                timing.serializer += time.perf_counter() - started
+    data._server_timing = True
+    return property(data)
+
+
+def _install_serializer_timing():
+    if not getattr(BaseSerializer.data.fget, '_server_timing', False):
+        BaseSerializer.data = _timed_data(BaseSerializer.data)
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERVER_TIMING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _install_serializer_timing()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        try:
+            with track_queries(timing):
+                response = self.get_response(request)
+        finally:
+            _current_timing.reset(token)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        try:
+            with track_queries(timing):
+                response = await self.get_response(request)
+        finally:
+            _current_timing.reset(token)
+        return self.finish(request, response, timing)
+
+    def finish(self, request, response, timing):
+        if timing.view_started is not None and timing.view is None:
+            # پاسخ غیر template (مثلاً streaming): زمان view تا برگشت پاسخ
+            timing.view = time.perf_counter() - timing.view_started
+
+        metrics = timing.metrics()
+        if self.sends_header(request):
+            response['Server-Timing'] = ', '.join(
+                f'{name};dur={duration * 1000:.1f}' + (f';desc="{desc}"' if desc else '')
+                for name, duration, desc in metrics
+            )
+            origin = request.headers.get('Origin')
+            if origin and origin in getattr(settings, 'CORS_ALLOWED_ORIGINS', ()):
+                response['Timing-Allow-Origin'] = origin
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': timing.queries,
+                **{f'{name}_ms': round(duration * 1000, 2) for name, duration, desc in metrics},
+            }))
+        return response
+
+    def sends_header(self, request):
+        """
+        تعداد کوئری و زمان‌بندی داخلی فقط برای staff فرستاده می‌شود. کاربری که در طول درخواست
+        خوانده نشده (SimpleLazyObject ارزیابی‌نشده) staff حساب نمی‌شود تا این هدر کوئری اضافه نزند.
+        """
+        mode = getattr(settings, 'SERVER_TIMING_HEADER', 'staff')
+        if mode != 'staff':
+            return bool(mode)
+        user = getattr(request, 'user', None)
+        if user is None or (isinstance(user, SimpleLazyObject) and user._wrapped is empty):
+            return False
+        return user.is_authenticated and user.is_staff
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = _current_timing.get()
+        if timing is not None:
+            timing.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # پاسخ‌های DRF بعد از این مرحله render می‌شوند
+        timing = _current_timing.get()
+        if timing is not None:
+            now = time.perf_counter()
+            if timing.view_started is not None:
+                timing.view = now - timing.view_started
+            timing.render_started = now
+            response.add_post_render_callback(lambda rendered: self.rendered(timing))
+        return response
+
+    def rendered(self, timing):
+        timing.render = time.perf_counter() - timing.render_started
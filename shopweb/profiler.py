@@ -0,0 +1,161 @@
+"""
+پروفایل cProfile درخواست‌های ادمین با هدر X-Profile: 1 یا پارامتر ?profile=1.
+با نمونه‌برداری (PROFILER_SAMPLE_RATE)، فاصله حداقل بین دو پروفایل (PROFILER_MIN_INTERVAL)
+و حداکثر یک پروفایل همزمان، روشن ماندن آن در production بی‌خطر است.
+فایل‌ها در PROFILER_DIR ذخیره و فقط PROFILER_KEEP فایل آخر نگه داشته می‌شوند.
+"""
+import cProfile
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+
+
+PROFILE_NAME_RE = re.compile(r'^[\w.-]+\.prof$')
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+_profile_lock = threading.Lock()
+_last_profile = 0.0
+
+
+def get_profile_dir():
+    return str(getattr(settings, 'PROFILER_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def save_profile(profiler, request, elapsed):
+    directory = get_profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r'[^\w-]+', '-', request.path).strip('-')[:60] or 'root'
+    name = f'{datetime.now():%Y%m%d-%H%M%S-%f}_{request.method}_{slug}_{elapsed * 1000:.0f}ms.prof'
+    profiler.dump_stats(os.path.join(directory, name))
+
+    # چرخش: قدیمی‌ترین فایل‌ها (نام با زمان شروع می‌شود) حذف می‌شوند
+    keep = getattr(settings, 'PROFILER_KEEP', 50)
+    for old in list_profile_names()[keep:]:
+        os.remove(os.path.join(directory, old))
+    return name
+
+
+def list_profile_names():
+    directory = get_profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    return sorted((name for name in os.listdir(directory) if PROFILE_NAME_RE.match(name)), reverse=True)
+
+
+def get_profile_path(name):
+    if not PROFILE_NAME_RE.match(name) or name not in list_profile_names():
+        raise Http404
+    return os.path.join(get_profile_dir(), name)
+
+
+def top_functions(path, sort='cumulative', limit=40):
+    stats = pstats.Stats(path)
+    stats.sort_stats(sort)
+    rows = []
+    for func in stats.fcn_list[:limit]:
+        primitive_calls, calls, tottime, cumtime, callers = stats.stats[func]
+        filename, line, function = func
+        rows.append({
+            'calls': calls if calls == primitive_calls else f'{calls}/{primitive_calls}',
+            'tottime': tottime * 1000,
+            'cumtime': cumtime * 1000,
+            'function': f'{function} ({filename}:{line})' if line else function,
+        })
+    return stats.total_tt * 1000, rows
+
+
+class ProfilerMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILER_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not (self.is_requested(request) and self.should_profile(getattr(request, 'user', None))):
+            return self.get_response(request)
+        if not _profile_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profiler, started = self.start()
+            response = profiler.runcall(self.get_response, request)
+            name = save_profile(profiler, request, time.perf_counter() - started)
+        finally:
+            _profile_lock.release()
+        response['X-Profile-Id'] = name
+        return response
+
+    async def __acall__(self, request):
+        # request.user تنبل است و در context async نمی‌تواند کوئری بزند
+        if not (self.is_requested(request) and self.should_profile(await request.auser())):
+            return await self.get_response(request)
+        if not _profile_lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            profiler, started = self.start()
+            # فقط thread حلقه رویداد پروفایل می‌شود (نه کوئری‌های داخل sync_to_async) و
+            # درخواست‌های دیگری که همزمان روی همان حلقه اجرا می‌شوند هم در آن می‌آیند
+            profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profiler.disable()
+            name = save_profile(profiler, request, time.perf_counter() - started)
+        finally:
+            _profile_lock.release()
+        response['X-Profile-Id'] = name
+        return response
+
+    def start(self):
+        global _last_profile
+        _last_profile = time.monotonic()
+        return cProfile.Profile(), time.perf_counter()
+
+    def is_requested(self, request):
+        return request.headers.get('X-Profile') == '1' or request.GET.get('profile') == '1'
+
+    def should_profile(self, user):
+        if not (user and user.is_authenticated and user.is_admin):
+            return False
+        if time.monotonic() - _last_profile < getattr(settings, 'PROFILER_MIN_INTERVAL', 10):
+            return False
+        return random.random() < getattr(settings, 'PROFILER_SAMPLE_RATE', 1.0)
+
+
+def profile_list(request):
+    """صفحه ادمین: لیست پروفایل‌ها و پرهزینه‌ترین توابع پروفایل انتخاب‌شده"""
+    names = list_profile_names()
+    context = {
+        'title': 'Request profiles',
+        'profiles': names,
+        'sort_keys': SORT_KEYS,
+    }
+    selected = request.GET.get('name')
+    if selected:
+        sort = request.GET.get('sort', 'cumulative')
+        if sort not in SORT_KEYS:
+            sort = 'cumulative'
+        total, rows = top_functions(get_profile_path(selected), sort)
+        context.update({'selected': selected, 'sort': sort, 'total': total, 'rows': rows})
+    return render(request, 'admin/profiles.html', context)
+
+
+def profile_download(request, name):
+    # فایل خام برای snakeviz یا pstats
+    return FileResponse(open(get_profile_path(name), 'rb'), as_attachment=True, filename=name)
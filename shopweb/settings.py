@@ -39,11 +39,14 @@ INSTALLED_APPS = [
 ]
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'shopweb.middleware.ServerTimingMiddleware',
+    'shopweb.db_router.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'shopweb.profiler.ProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -53,7 +56,7 @@ ROOT_URLCONF = 'shopweb.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'shopweb' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -75,10 +78,70 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # اتصال‌ها (از جمله اتصال threadهای executor در viewهای async) بین درخواست‌ها دوباره استفاده می‌شوند
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        # دیتابیس تست روی فایل تا تست‌های همزمانی به جای خطای قفل، منتظر بمانند
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+# replicaهای فقط‌خواندنی برای درخواست‌های GET/HEAD (shopweb.db_router). مثال محلی با دو فایل SQLite:
+# DATABASES['replica'] = {
+#     'ENGINE': 'django.db.backends.sqlite3',
+#     'NAME': BASE_DIR / 'db_replica.sqlite3',
+#     'TEST': {'MIRROR': 'default'},
+# }
+# REPLICA_DATABASES = ['replica']
+# و کپی primary روی replica با python manage.py sync_sqlite_replicas
+DATABASE_ROUTERS = ['shopweb.db_router.ReplicaRouter']
+REPLICA_DATABASES = []
+# بعد از هر درخواست تغییردهنده، کاربر این مدت (ثانیه) فقط از primary می‌خواند
+REPLICA_STICKY_SECONDS = 10
+
+
+# Cache
+# در حالت چند پروسه‌ای باید از یک کش مشترک (مثل Redis یا Memcached) استفاده شود
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# کش شمارنده‌های ETag (book/versions.py)؛ باید بین workerها مشترک باشد (check --deploy)
+VERSIONS_CACHE = 'default'
+
+# مدت اعتبار کش صفحه اصلی (ثانیه)
+HOME_CACHE_TIMEOUT = 300
 
+# seed ثابت برای نمونه‌گیری تصادفی کتاب‌ها (برای تست‌ها)، None یعنی تصادفی
+BOOK_SAMPLER_SEED = None
+
+# جستجوی کتاب‌ها: None یعنی FTS5 روی SQLite و icontains روی دیگر دیتابیس‌ها
+BOOK_SEARCH_BACKEND = None
+
+# snapshot آمار ادمین: تازه تا TTL، سپس تا STALE_TTL مقدار قبلی برگردانده و در پس‌زمینه بازسازی می‌شود
+LIBRARY_STATS_TTL = 30
+LIBRARY_STATS_STALE_TTL = 300
+
+# عرض نسخه‌های کوچک‌شده جلد، بنر و آواتار (WebP و JPEG)؛ با build_thumbnails برای فایل‌های قدیمی ساخته می‌شوند
+THUMBNAIL_SIZES = (96, 240, 480)
+
+# هدر Server-Timing (db/view/ser/render/total) و لاگ JSON هر درخواست در logger shopweb.timing؛
+# هزینه آن چند فراخوانی perf_counter است و می‌تواند در production روشن بماند
+SERVER_TIMING_ENABLED = True
+# چه کسی هدر را می‌گیرد: 'staff' (پیش‌فرض)، True برای همه (فقط محیط توسعه) یا False برای هیچ‌کس؛
+# خط لاگ در هر حالت برای همه درخواست‌ها نوشته می‌شود
+SERVER_TIMING_HEADER = 'staff'
+
+# پروفایل cProfile درخواست‌های ادمین با هدر X-Profile: 1 یا ?profile=1؛ لیست در /admin/profiles/
+PROFILER_ENABLED = True
+PROFILER_DIR = BASE_DIR / 'profiles'
+PROFILER_KEEP = 50
+PROFILER_SAMPLE_RATE = 1.0
+PROFILER_MIN_INTERVAL = 10
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -111,6 +174,12 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# max-age فایل‌هایی که نامشان hash محتوا ندارد (فایل‌های دارای hash یک سال و immutable)
+MEDIA_CACHE_MAX_AGE = 3600
+# None: سرو از پایتون؛ 'x-accel-redirect' (nginx) یا 'x-sendfile' (Apache/lighttpd)
+MEDIA_SENDFILE = None
+# location داخلی nginx برای X-Accel-Redirect
+MEDIA_ACCEL_PREFIX = '/protected-media/'
 
 AUTH_USER_MODEL = 'account.User'
 
@@ -124,7 +193,10 @@ CORS_ALLOW_CREDENTIALS = True
 
 # REST Framework settings
 REST_FRAMEWORK = {
+    # اولین کلاس هدر WWW-Authenticate را می‌سازد؛ با Bearer خطای احراز 401 است و کلاینت
+    # می‌فهمد باید access token را با refresh تازه کند (SessionAuthentication هدر ندارد و 403 می‌دهد)
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'account.authentication.SignedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -132,6 +204,12 @@ REST_FRAMEWORK = {
     ],
 }
 
+# مدت اعتبار توکن‌های امضاشده account/tokens.py (ثانیه)
+ACCESS_TOKEN_LIFETIME = 300
+REFRESH_TOKEN_LIFETIME = 7 * 24 * 3600
+# مدت کش وضعیت توکن کاربر؛ با کش per-process (LocMem) حداکثر تأخیر ابطال در workerهای دیگر
+TOKEN_STATE_CACHE_TIMEOUT = 30
+
 # Jazzmin settings
 JAZZMIN_SETTINGS = {
     "site_title": "Book Library Admin",
@@ -165,6 +243,10 @@ JAZZMIN_SETTINGS = {
             "url": "make_messages",
             "icon": "fas fa-comments",
             "permissions": ["books.view_book"]
+        }, {
+            "name": "Request profiles",
+            "url": "admin-profiles",
+            "icon": "fas fa-stopwatch",
         }]
     },
     "icons": {
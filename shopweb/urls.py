@@ -1,14 +1,23 @@
+import re
+from urllib.parse import urlsplit
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from .media import serve_media
+from .profiler import profile_list, profile_download
 
 urlpatterns = [
+    path('admin/profiles/', admin.site.admin_view(profile_list), name='admin-profiles'),
+    path('admin/profiles/<str:name>/download/', admin.site.admin_view(profile_download), name='admin-profile-download'),
     path('admin/', admin.site.urls),
     path('accounts/', include('account.urls', namespace='account')),
     path('', include('book.urls', namespace='allbook')),
 ]
 
-# Serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# فایل‌های media (در dev و production)؛ اگر MEDIA_URL روی دامنه دیگری (CDN) باشد سرو نمی‌شوند
+if not urlsplit(settings.MEDIA_URL).netloc:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
+    ]